@@ -5,9 +5,17 @@ import math
 import random
 import time
 from collections import Counter
-from typing import Any, Dict, List, Optional, Set, Tuple, Union, TYPE_CHECKING
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union, TYPE_CHECKING
 
-from .cache import property_cache_forever, property_cache_once_per_frame
+import numpy as np
+
+from .cache import (
+    cache_stats_report,
+    clear_method_cache,
+    method_cache_once_per_frame,
+    property_cache_forever,
+    property_cache_once_per_frame,
+)
 from .constants import (
     FakeEffectID,
     abilityid_to_unittypeid,
@@ -17,9 +25,13 @@ from .constants import (
     PROTOSS_TECH_REQUIREMENT,
     ZERG_TECH_REQUIREMENT,
     ALL_GAS,
+    IS_GATHERING,
+    IS_RETURNING,
 )
 from .data import ActionResult, Alert, Race, Result, Target, race_gas, race_townhalls, race_worker
 from .distances import DistanceCalculation
+from .engagement import EngagementMatrix
+from .frame_units import FrameUnits
 from .game_data import AbilityData, GameData
 
 from .dicts.unit_trained_from import UNIT_TRAINED_FROM
@@ -34,7 +46,9 @@ from .ids.unit_typeid import UnitTypeId
 from .ids.upgrade_id import UpgradeId
 from .pixel_map import PixelMap
 from .position import Point2, Point3
-from .unit import Unit
+from .unit import Unit, UnitTypeRecord
+from .unit_table import STATE_GATHERING, STATE_RETURNING
+from .unit_registry import UnitRegistry
 from .units import Units
 from .game_data import Cost
 
@@ -46,11 +60,125 @@ if TYPE_CHECKING:
     from .unit_command import UnitCommand
 
 
+# Unit type ids as ints, to classify raw units in BotAI._prepare_units without creating Unit objects
+ALL_GAS_IDS: Set[int] = {unit_type.value for unit_type in ALL_GAS}
+TECHLAB_IDS: Set[int] = {
+    unit_type.value
+    for unit_type in {
+        UnitTypeId.TECHLAB,
+        UnitTypeId.BARRACKSTECHLAB,
+        UnitTypeId.FACTORYTECHLAB,
+        UnitTypeId.STARPORTTECHLAB,
+    }
+}
+REACTOR_IDS: Set[int] = {
+    unit_type.value
+    for unit_type in {
+        UnitTypeId.REACTOR,
+        UnitTypeId.BARRACKSREACTOR,
+        UnitTypeId.FACTORYREACTOR,
+        UnitTypeId.STARPORTREACTOR,
+    }
+}
+
+
+def _frame_units_property(name: str, doc: str) -> property:
+    """ Property for a Units attribute of the bot, created from the units of the current frame, see FrameUnits. """
+
+    def getter(self) -> Units:
+        return self._frame_units.category(name)
+
+    def setter(self, units: Units):
+        self._frame_units.set_category(name, units)
+        self._clear_unit_method_caches()
+
+    return property(getter, setter, doc=doc)
+
+
 class BotAI(DistanceCalculation):
     """Base class for bots."""
 
     EXPANSION_GAP_THRESHOLD = 15
 
+    # Units attributes filled by self._prepare_units, all of them are views into self.all_units and self.unit_table
+    # The Units objects are created when they are accessed for the first time in a frame if self.lazy_unit_ingest is set
+    _unit_categories: Tuple[str, ...] = (
+        "units",
+        "structures",
+        "enemy_units",
+        "enemy_structures",
+        "resources",
+        "destructables",
+        "watchtowers",
+        "mineral_field",
+        "vespene_geyser",
+        "workers",
+        "townhalls",
+        "gas_buildings",
+        "larva",
+    )
+
+    # Methods cached with method_cache_once_per_frame that depend on the units and their orders,
+    # cleared when the units change or a command is issued, see self._clear_unit_method_caches
+    _unit_method_caches: Tuple[str, ...] = (
+        "already_pending",
+        "already_pending_upgrade",
+        "structure_type_build_progress",
+        "tech_requirement_progress",
+    )
+
+    all_units = _frame_units_property(
+        "all_units", "All units and structures, including neutral units like resources, rocks and watchtowers."
+    )
+    units = _frame_units_property("units", "Your units, without structures.")
+    structures = _frame_units_property("structures", "Your structures.")
+    enemy_units = _frame_units_property(
+        "enemy_units", "Visible enemy units and snapshots of enemy units (e.g. on high ground), without structures."
+    )
+    enemy_structures = _frame_units_property(
+        "enemy_structures", "Visible enemy structures and snapshots of scouted enemy structures in the fog of war."
+    )
+    resources = _frame_units_property("resources", "Mineral fields and vespene geysers.")
+    destructables = _frame_units_property("destructables", "Destructable rocks and other neutral units.")
+    watchtowers = _frame_units_property("watchtowers", "Xel'naga watchtowers.")
+    mineral_field = _frame_units_property("mineral_field", "Mineral fields.")
+    vespene_geyser = _frame_units_property("vespene_geyser", "Vespene geysers.")
+    workers = _frame_units_property("workers", "Your workers (SCVs, probes or drones).")
+    townhalls = _frame_units_property("townhalls", "Your townhalls.")
+    gas_buildings = _frame_units_property("gas_buildings", "Your refineries, assimilators or extractors.")
+    larva = _frame_units_property("larva", "Your larva.")
+
+    @property
+    def unit_table(self) -> np.ndarray:
+        """ Numpy structured array with one row per unit in self.all_units (in the same order), see unit_table.py for
+        the columns. Created the first time it is used in a frame. """
+        return self._frame_units.unit_table
+
+    @property
+    def _all_unit_positions(self) -> np.ndarray:
+        return self._frame_units.positions
+
+    @property
+    def _all_unit_tags(self) -> np.ndarray:
+        return self._frame_units.tags
+
+    @property
+    def _all_unit_alliance(self) -> np.ndarray:
+        return self._frame_units.alliance
+
+    @property
+    def _distance_frame_units(self) -> FrameUnits:
+        return self._frame_units
+
+    @property
+    def blips(self) -> Set[Blip]:
+        """ Set of enemy units detected by own sensor tower, as blips have less unit information than visible units """
+        return self._frame_units.blips
+
+    @blips.setter
+    def blips(self, blips: Set[Blip]):
+        self._frame_units.blips = blips
+
     def _initialize_variables(self):
         DistanceCalculation.__init__(self)
         # Specific opponent bot ID used in sc2ai ladder games http://sc2ai.net/ and on ai arena https://ai-arena.net
@@ -62,22 +190,22 @@ class BotAI(DistanceCalculation):
         # Select distance calculation method, see distances.py: _distances_override_functions function
         if not hasattr(self, "distance_calculation_method"):
             self.distance_calculation_method: int = 2
+        # The defaults of the settings distance_matrix_float32 and distance_matrix_memory_limit are defined in DistanceCalculation
+        # Select how often the pathing grid is requested from the game, see self._should_update_pathing_grid function
+        # 0: every step, N > 0: when structures, rocks or resources changed or at least every N game loops, None: only when those changed
+        if not hasattr(self, "pathing_grid_update_interval"):
+            self.pathing_grid_update_interval: Optional[int] = 0
+        # Send the actions, debug drawings, step, observation and game info requests at the end of a step back to back
+        # instead of waiting for the response of each, see main.py. Not used in realtime mode
+        if not hasattr(self, "pipeline_requests"):
+            self.pipeline_requests: bool = False
         # This value will be set to True by main.py in self._prepare_start if game is played in realtime (if true, the bot will have limited time per step)
         self.realtime: bool = False
-        self.all_units: Units = Units([], self)
-        self.units: Units = Units([], self)
-        self.workers: Units = Units([], self)
-        self.townhalls: Units = Units([], self)
-        self.structures: Units = Units([], self)
-        self.gas_buildings: Units = Units([], self)
-        self.enemy_units: Units = Units([], self)
-        self.enemy_structures: Units = Units([], self)
-        self.resources: Units = Units([], self)
-        self.destructables: Units = Units([], self)
-        self.watchtowers: Units = Units([], self)
-        self.mineral_field: Units = Units([], self)
-        self.vespene_geyser: Units = Units([], self)
-        self.larva: Units = Units([], self)
+        # Create Unit objects and Units objects like self.mineral_field only when they are first accessed in a frame
+        if not hasattr(self, "lazy_unit_ingest"):
+            self.lazy_unit_ingest: bool = False
+        # Units of the current frame, see self._prepare_units and the Units properties like self.units
+        self._frame_units: FrameUnits = FrameUnits.empty(self, self._unit_categories)
         self.techlab_tags: Set[int] = set()
         self.reactor_tags: Set[int] = set()
         self.minerals: int = None
@@ -92,13 +220,20 @@ class BotAI(DistanceCalculation):
         self.warp_gate_count: int = None
         self.larva_count: int = None
         self.actions: List[UnitCommand] = []
-        self.blips: Set[Blip] = set()
         self._unit_tags_seen_this_game: Set[int] = set()
-        self._units_previous_map: Dict[int, Unit] = dict()
-        self._structures_previous_map: Dict[int, Unit] = dict()
-        self._enemy_units_previous_map: Dict[int, Unit] = dict()
-        self._enemy_structures_previous_map: Dict[int, Unit] = dict()
+        # Units of the previous frame, used by self._units_previous_map and similar
+        self._previous_frame_units: FrameUnits = self._frame_units
+        # Which units were added, damaged, completed etc. since the previous frame, used by self.issue_events
+        self.unit_registry: UnitRegistry = UnitRegistry()
         self._previous_upgrades: Set[UpgradeId] = set()
+        # Units that block pathing (tag, unit type) at the time the pathing grid was last updated
+        self._pathing_grid_blockers: Optional[np.ndarray] = None
+        self._pathing_grid_game_loop: int = -1
+        self._pathing_grid_update_count: int = 0
+        # Updates whose request duration is known, see self._update_pathing_grid
+        self._pathing_grid_timed_update_count: int = 0
+        self._pathing_grid_skip_count: int = 0
+        self._total_time_pathing_grid_update: float = 0
         self._time_before_step: float = None
         self._time_after_step: float = None
         self._min_step_time: float = math.inf
@@ -106,6 +241,10 @@ class BotAI(DistanceCalculation):
         self._last_step_step_time: float = 0
         self._total_time_in_on_step: float = 0
         self._total_steps_iterations: int = 0
+        # Wall time of whole steps, including the requests to the game, measured by main.py
+        self._total_step_wall_time: float = 0
+        self._step_wall_time_count: int = 0
+        self._last_step_wall_time: float = 0
         # Internally used to keep track which units received an action in this frame, so that self.train() function does not give the same larva two orders - cleared every frame
         self.unit_tags_received_action: Set[int] = set()
 
@@ -138,6 +277,53 @@ class BotAI(DistanceCalculation):
             self._last_step_step_time * 1000,
         )
 
+    @property
+    def step_wall_time(self) -> Tuple[float, float]:
+        """ Returns a tuple of the wall time of a whole step in milliseconds, from receiving one observation to receiving the next.
+        Unlike self.step_time, this includes the time of the requests to the game, see self.pipeline_requests.
+        First value is the average step wall time
+        Second value is the step wall time of the last iteration """
+        avg_step_wall_time = (
+            (self._total_step_wall_time / self._step_wall_time_count) if self._step_wall_time_count else 0
+        )
+        return avg_step_wall_time * 1000, self._last_step_wall_time * 1000
+
+    def cache_stats(self) -> str:
+        """ Returns a table of how often each cached property and method was used, how often it had to be calculated again
+        and how long that took, the slowest first. The counts are only collected if the environment variable SC2CACHESTATS
+        was set before sc2 was imported, otherwise the caches are not changed. The counts are summed over all objects
+        of the process, e.g. over both bots if two bots play in the same process.
+
+        Example::
+
+            # Run the bot with SC2CACHESTATS=1
+            async def on_end(self, game_result):
+                print(self.cache_stats())
+        """
+        return cache_stats_report()
+
+    def _record_step_wall_time(self, duration: float):
+        """
+        :param duration: Wall time of the last step in seconds
+        """
+        self._total_step_wall_time += duration
+        self._step_wall_time_count += 1
+        self._last_step_wall_time = duration
+
+    @property
+    def pathing_grid_update_time(self) -> Tuple[int, int, float]:
+        """ Returns a tuple with information about the pathing grid requests sent by main.py.
+        First value is the amount of steps the pathing grid was requested and updated
+        Second value is the amount of steps where the request was skipped, see 'self.pathing_grid_update_interval'
+        Third value is the average duration of a request in milliseconds, so the saved time is roughly the second value times the third value.
+        Requests that were sent together with the step request (see self.pipeline_requests) are not included in the average """
+        avg_request_duration = (
+            (self._total_time_pathing_grid_update / self._pathing_grid_timed_update_count)
+            if self._pathing_grid_timed_update_count
+            else 0
+        )
+        return self._pathing_grid_update_count, self._pathing_grid_skip_count, avg_request_duration * 1000
+
     @property
     def game_info(self) -> GameInfo:
         """ See game_info.py """
@@ -511,6 +697,7 @@ class BotAI(DistanceCalculation):
 
         return owned
 
+    @method_cache_once_per_frame
     def calculate_supply_cost(self, unit_type: UnitTypeId) -> float:
         """
         This function calculates the required supply to train or morph a unit.
@@ -551,6 +738,7 @@ class BotAI(DistanceCalculation):
         # "required <= 0" in case self.supply_left is negative
         return required <= 0 or self.supply_left >= required
 
+    @method_cache_once_per_frame
     def calculate_cost(self, item_id: Union[UnitTypeId, UpgradeId, AbilityId]) -> Cost:
         """
         Calculate the required build, train or morph cost of a unit. It is recommended to use the UnitTypeId instead of the ability to create the unit.
@@ -805,7 +993,7 @@ class BotAI(DistanceCalculation):
                 return min(possible, key=lambda p: p.distance_to_point2(near))
         return None
 
-    # TODO: improve using cache per frame
+    @method_cache_once_per_frame
     def already_pending_upgrade(self, upgrade_type: UpgradeId) -> Union[int, float]:
         """ Check if an upgrade is being researched
 
@@ -837,6 +1025,18 @@ class BotAI(DistanceCalculation):
         return 0
 
     @property_cache_once_per_frame
+    def engagement(self) -> EngagementMatrix:
+        """ Which own units and structures and which enemy units and structures have each other in attack range,
+        calculated once per frame. See EngagementMatrix.
+
+        Example::
+
+            for unit in self.engagement.threatened_units():
+                attackers = self.engagement.threatened_by(unit)
+        """
+        return EngagementMatrix(self.units + self.structures, self.enemy_units + self.enemy_structures)
+
+    @property_cache_once_per_frame(frozen=True)
     def _abilities_all_units(self) -> Counter:
         """ Cache for the already_pending function, includes protoss units warping in,
         all units in production and all structures, and all morphs """
@@ -852,6 +1052,7 @@ class BotAI(DistanceCalculation):
 
         return abilities_amount
 
+    @method_cache_once_per_frame
     def already_pending(self, unit_type: Union[UpgradeId, UnitTypeId]) -> int:
         """
         Returns a number of buildings or units already in progress, or if a
@@ -1042,6 +1243,7 @@ class BotAI(DistanceCalculation):
                     return trained_amount
         return trained_amount
 
+    @method_cache_once_per_frame
     def structure_type_build_progress(self, structure_type: Union[UnitTypeId, int]) -> float:
         """
         Checks the build progress of a structure type
@@ -1077,6 +1279,7 @@ class BotAI(DistanceCalculation):
                         return_value = structure.build_progress
         return return_value
 
+    @method_cache_once_per_frame
     def tech_requirement_progress(self, structure_type: UnitTypeId) -> float:
         """ Returns the tech requirement progress for a specific building
 
@@ -1239,8 +1442,14 @@ class BotAI(DistanceCalculation):
                 self.larva_count -= 1
         self.actions.append(action)
         self.unit_tags_received_action.add(action.unit.tag)
+        self._clear_unit_method_caches()
         return True
 
+    def _clear_unit_method_caches(self):
+        """ Clears the cached values of the methods in self._unit_method_caches, so they are calculated again
+        in the same frame. """
+        clear_method_cache(self, *self._unit_method_caches)
+
     async def synchronous_do(self, action):
         """ Not recommended. Use self.do nstead to reduce lag:
         self.actions = []
@@ -1374,6 +1583,28 @@ class BotAI(DistanceCalculation):
         pos = pos.position.to2.rounded
         return self.state.creep[pos] == 1
 
+    def is_visible_batch(self, positions: Union[Units, Iterable[Union[Point2, Point3]], np.ndarray]) -> np.ndarray:
+        """ Returns a boolean array which is True for each position you have vision on.
+        Same as self.is_visible for each position, but in one numpy lookup.
+
+        :param positions: Units, positions or a numpy array of shape (n, 2) """
+        return self.state.visibility.values_at(self._positions_array(positions)) == 2
+
+    def has_creep_batch(self, positions: Union[Units, Iterable[Union[Point2, Point3]], np.ndarray]) -> np.ndarray:
+        """ Returns a boolean array which is True for each position that has creep.
+        Same as self.has_creep for each position, but in one numpy lookup.
+
+        :param positions: Units, positions or a numpy array of shape (n, 2) """
+        return self.state.creep.values_at(self._positions_array(positions)) == 1
+
+    def _positions_array(self, positions: Union[Units, Iterable[Union[Point2, Point3]], np.ndarray]) -> np.ndarray:
+        if isinstance(positions, np.ndarray):
+            return positions
+        if isinstance(positions, Units):
+            # Cached on the Units object, and taken from the current frame for its Units attributes like self.units
+            return positions.positions
+        return np.array([position[:2] for position in positions], dtype=float).reshape(-1, 2)
+
     def _prepare_start(self, client, player_id, game_info, game_data, realtime: bool = False):
         """
         Ran until game start to set game and player data.
@@ -1397,6 +1628,26 @@ class BotAI(DistanceCalculation):
 
         self._distances_override_functions(self.distance_calculation_method)
 
+    @property_cache_once_per_frame(frozen=True)
+    def _units_previous_map(self) -> Dict[int, Unit]:
+        """ Your units of the previous frame by tag. """
+        return {unit.tag: unit for unit in self._previous_frame_units.category("units")}
+
+    @property_cache_once_per_frame(frozen=True)
+    def _structures_previous_map(self) -> Dict[int, Unit]:
+        """ Your structures of the previous frame by tag. """
+        return {structure.tag: structure for structure in self._previous_frame_units.category("structures")}
+
+    @property_cache_once_per_frame(frozen=True)
+    def _enemy_units_previous_map(self) -> Dict[int, Unit]:
+        """ Enemy units of the previous frame by tag. """
+        return {unit.tag: unit for unit in self._previous_frame_units.category("enemy_units")}
+
+    @property_cache_once_per_frame(frozen=True)
+    def _enemy_structures_previous_map(self) -> Dict[int, Unit]:
+        """ Enemy structures of the previous frame by tag. """
+        return {structure.tag: structure for structure in self._previous_frame_units.category("enemy_structures")}
+
     def _prepare_first_step(self):
         """First step extra preparations. Must not be called before _prepare_step."""
         if self.townhalls:
@@ -1406,24 +1657,19 @@ class BotAI(DistanceCalculation):
         self._game_info.map_ramps, self._game_info.vision_blockers = self._game_info._find_ramps_and_vision_blockers()
         self._time_before_step: float = time.perf_counter()
 
-    def _prepare_step(self, state, proto_game_info):
+    def _prepare_step(self, state, proto_game_info=None):
         """
         :param state:
-        :param proto_game_info:
+        :param proto_game_info: If given, the pathing grid is updated from it. Otherwise main.py requests a new one when self._should_update_pathing_grid() returns True
         """
         # Set attributes from new state before on_step."""
         self.state: GameState = state  # See game_state.py
-        # update pathing grid
-        self._game_info.pathing_grid: PixelMap = PixelMap(
-            proto_game_info.game_info.start_raw.pathing_grid, in_bits=True, mirrored=False
-        )
-        # Required for events, needs to be before self.units are initialized so the old units are stored
-        self._units_previous_map: Dict = {unit.tag: unit for unit in self.units}
-        self._structures_previous_map: Dict = {structure.tag: structure for structure in self.structures}
-        self._enemy_units_previous_map: Dict = {unit.tag: unit for unit in self.enemy_units}
-        self._enemy_structures_previous_map: Dict = {structure.tag: structure for structure in self.enemy_structures}
+        # Needs to be before self.units are initialized so the old units are stored
+        self._previous_frame_units = self._frame_units
 
         self._prepare_units()
+        # Required for events
+        self.unit_registry.update(*self._frame_units.tracked_units())
         self.minerals: int = state.common.minerals
         self.vespene: int = state.common.vespene
         self.supply_army: int = state.common.food_army
@@ -1442,105 +1688,195 @@ class BotAI(DistanceCalculation):
 
         self.idle_worker_count: int = state.common.idle_worker_count
         self.army_count: int = state.common.army_count
+        if proto_game_info is not None:
+            self._update_pathing_grid(proto_game_info)
+        self._time_before_step: float = time.perf_counter()
+
+    def _get_pathing_grid_blockers(self) -> np.ndarray:
+        """ Returns (tag, unit type) rows, sorted by tag, of all units that change the pathing grid when they appear,
+        disappear or morph: structures (e.g. a supply depot being lowered or a barracks lifting off), rocks and resources.
+        Uses the columns of self._frame_units, so neither Unit objects nor the unit table are created. """
+        frame_units = self._frame_units
+        alliance = frame_units.alliance
+        type_ids = frame_units.type_ids
+        # Own and enemy structures (Alliance.Self.value = 1, Alliance.Enemy.value = 4), and neutral units
+        # (Alliance.Neutral.value = 3) except watchtowers (XELNAGATOWER = 149), same as the unit categories
+        mask = ((alliance == 1) | (alliance == 4)) & frame_units.is_structure
+        mask |= (alliance == 3) & (type_ids != 149)
+        rows = np.flatnonzero(mask)
+        tags = frame_units.tags[rows]
+        order = np.argsort(tags)
+        return np.stack((tags[order], type_ids[rows][order].astype(np.uint64)), axis=1)
+
+    def _should_update_pathing_grid(self) -> bool:
+        """ Called by main.py after self._prepare_step to decide if a new pathing grid should be requested from the game.
+        Returns True every step if 'self.pathing_grid_update_interval' is 0.
+        Otherwise returns True if a structure was started, destroyed or changed its type, a rock was destroyed or a resource was mined out,
+        or if at least 'self.pathing_grid_update_interval' game loops passed since the last update (if it is not None). """
+        interval = self.pathing_grid_update_interval
+        if interval == 0:
+            return True
+        if interval is not None and self.state.game_loop - self._pathing_grid_game_loop >= interval:
+            return True
+        if not np.array_equal(self._get_pathing_grid_blockers(), self._pathing_grid_blockers):
+            return True
+        self._pathing_grid_skip_count += 1
+        return False
+
+    def _update_pathing_grid(self, proto_game_info, request_duration: Optional[float] = None):
+        """
+        :param proto_game_info:
+        :param request_duration: Time in seconds it took to request proto_game_info from the game,
+            None if it is not known because the request was sent together with other requests
+        """
+        self._game_info.pathing_grid: PixelMap = PixelMap(
+            proto_game_info.game_info.start_raw.pathing_grid, in_bits=True, mirrored=False
+        )
+        if self.pathing_grid_update_interval != 0:
+            self._pathing_grid_blockers = self._get_pathing_grid_blockers()
+        self._pathing_grid_game_loop = self.state.game_loop
+        self._pathing_grid_update_count += 1
+        if request_duration is not None:
+            self._pathing_grid_timed_update_count += 1
+            self._total_time_pathing_grid_update += request_duration
+        # Do not count the request duration towards the step time
         self._time_before_step: float = time.perf_counter()
 
     def _prepare_units(self):
-        # Set of enemy units detected by own sensor tower, as blips have less unit information than normal visible units
-        self.blips: Set[Blip] = set()
-        self.units: Units = Units([], self)
-        self.structures: Units = Units([], self)
-        self.enemy_units: Units = Units([], self)
-        self.enemy_structures: Units = Units([], self)
-        self.mineral_field: Units = Units([], self)
-        self.vespene_geyser: Units = Units([], self)
-        self.resources: Units = Units([], self)
-        self.destructables: Units = Units([], self)
-        self.watchtowers: Units = Units([], self)
-        self.all_units: Units = Units([], self)
-        self.workers: Units = Units([], self)
-        self.townhalls: Units = Units([], self)
-        self.gas_buildings: Units = Units([], self)
-        self.larva: Units = Units([], self)
+        (
+            unit_protos,
+            type_ids,
+            alliances,
+            is_structure,
+            category_indices,
+            blip_protos,
+            fake_effect_units,
+        ) = self._classify_unit_protos(self.state.observation_raw.units)
+
+        self.state._fake_effect_units = fake_effect_units
+        # The unit table is created from the protos when it is first used, see FrameUnits.unit_table
+        self._frame_units = FrameUnits(
+            self, unit_protos, type_ids, alliances, is_structure, category_indices, blip_protos
+        )
+        if not self.lazy_unit_ingest:
+            self._frame_units.materialize()
+        # The next frame can have the same game loop, e.g. if the same observation is prepared again
+        self._clear_unit_method_caches()
+        self._prepare_distances()
+
+    def _order_state(self, ability_id: int) -> int:
+        """ Returns STATE_GATHERING or STATE_RETURNING if a unit with a first order of this ability is gathering or returning
+        (see Unit.is_gathering and Unit.is_returning), otherwise 0. Cached in the game data.
+
+        :param ability_id: """
+        order_state = self._game_data.order_states.get(ability_id)
+        if order_state is None:
+            ability = self._game_data.abilities.get(ability_id)
+            try:
+                generic_ability = ability.id if ability is not None else None
+            except ValueError:
+                # Remaps to an ability that was added in a newer game version than sc2/ids/ability_id.py
+                generic_ability = None
+            if generic_ability == IS_GATHERING:
+                order_state = STATE_GATHERING
+            elif generic_ability == IS_RETURNING:
+                order_state = STATE_RETURNING
+            else:
+                order_state = 0
+            self._game_data.order_states[ability_id] = order_state
+        return order_state
+
+    def _classify_unit_protos(
+        self, raw_units
+    ) -> Tuple[List, List[int], List[int], List[bool], Dict[str, List[int]], List, List]:
+        """ Finds the units of each Units attribute of the bot in the raw unit protos.
+        Returns the protos of the units with their unit type, alliance and if they are a structure,
+        the indices of each Units attribute, the blips and the units that are converted to effects.
+
+        :param raw_units: """
         self.techlab_tags: Set[int] = set()
         self.reactor_tags: Set[int] = set()
-
-        # as short reference as possible
-        visibility = self.state.visibility.data_numpy
-
-        for unit in self.state.observation_raw.units:
+        # Raw units without blips and fake effects, a unit has the same index in these lists and in the unit table
+        unit_protos: List = []
+        type_ids: List[int] = []
+        alliances: List[int] = []
+        is_structures: List[bool] = []
+        blip_protos: List = []
+        fake_effect_units: List = []
+        # Indices of the units of each Units attribute, e.g. category_indices["mineral_field"] for self.mineral_field
+        category_indices: Dict[str, List[int]] = {name: [] for name in self._unit_categories}
+        units = category_indices["units"]
+        structures = category_indices["structures"]
+        enemy_units = category_indices["enemy_units"]
+        enemy_structures = category_indices["enemy_structures"]
+
+        townhall_ids: Set[int] = {unit_type.value for unit_type in race_townhalls[self.race]}
+        worker_id: int = race_worker[self.race].value
+        type_records: Dict[int, UnitTypeRecord] = self._game_data.unit_type_records
+
+        for unit in raw_units:
             if unit.is_blip:
-                self.blips.add(Blip(unit))
-            else:
-                unit_type: int = unit.unit_type
-                # Convert these units to effects: reaper grenade, parasitic bomb dummy, forcefield
-                if unit_type in FakeEffectID:
-                    self.state.effects.add(EffectData(unit, fake=True))
-                    continue
-                unit_obj = Unit(unit, self)
-                self.all_units.append(unit_obj)
-                alliance = unit.alliance
-                # Alliance.Neutral.value = 3
-                if alliance == 3:
-                    # XELNAGATOWER = 149
-                    if unit_type == 149:
-                        self.watchtowers.append(unit_obj)
-                    # mineral field enums
-                    elif unit_type in mineral_ids:
-                        self.mineral_field.append(unit_obj)
-                        self.resources.append(unit_obj)
-                    # geyser enums
-                    elif unit_type in geyser_ids:
-                        self.vespene_geyser.append(unit_obj)
-                        self.resources.append(unit_obj)
-                    # all destructable rocks
-                    else:
-                        self.destructables.append(unit_obj)
-                # Alliance.Self.value = 1
-                elif alliance == 1:
-                    unit_id = unit_obj.type_id
-                    if unit_obj.is_structure:
-                        self.structures.append(unit_obj)
-                        if unit_id in race_townhalls[self.race]:
-                            self.townhalls.append(unit_obj)
-                        elif unit_id in ALL_GAS or unit_obj.vespene_contents:
-                            # TODO: remove "or unit_obj.vespene_contents" when a new linux client newer than version 4.10.0 is released
-                            self.gas_buildings.append(unit_obj)
-                        elif unit_id in {
-                            UnitTypeId.TECHLAB,
-                            UnitTypeId.BARRACKSTECHLAB,
-                            UnitTypeId.FACTORYTECHLAB,
-                            UnitTypeId.STARPORTTECHLAB,
-                        }:
-                            self.techlab_tags.add(unit_obj.tag)
-                        elif unit_id in {
-                            UnitTypeId.REACTOR,
-                            UnitTypeId.BARRACKSREACTOR,
-                            UnitTypeId.FACTORYREACTOR,
-                            UnitTypeId.STARPORTREACTOR,
-                        }:
-                            self.reactor_tags.add(unit_obj.tag)
-                    else:
-                        self.units.append(unit_obj)
-                        if unit_id == race_worker[self.race]:
-                            self.workers.append(unit_obj)
-                        elif unit_id == UnitTypeId.LARVA:
-                            self.larva.append(unit_obj)
-                # Alliance.Enemy.value = 4
-                elif alliance == 4:
-                    if unit_obj.is_structure:
-                        self.enemy_structures.append(unit_obj)
-                    else:
-                        point: Point2 = unit_obj.position.rounded
-                        unit_obj.is_calculated_snapshot = visibility[point.y, point.x] != 2
-                        self.enemy_units.append(unit_obj)
-
-        # Force distance calculation and caching on all units using scipy pdist or cdist
-        if self.distance_calculation_method == 1:
-            _ = self._unit_index_dict
-            _ = self._pdist
-        elif self.distance_calculation_method == 2:
-            _ = self._unit_index_dict
-            _ = self._cdist
+                blip_protos.append(unit)
+                continue
+            unit_type: int = unit.unit_type
+            # These units are converted to effects in self.state.effects: reaper grenade, parasitic bomb dummy, forcefield
+            if unit_type in FakeEffectID:
+                fake_effect_units.append(unit)
+                continue
+            index = len(unit_protos)
+            unit_protos.append(unit)
+            type_record = type_records.get(unit_type)
+            if type_record is None:
+                type_record = UnitTypeRecord.get(unit_type, self)
+            is_structure: bool = type_record.is_structure
+            alliance = unit.alliance
+            type_ids.append(unit_type)
+            alliances.append(alliance)
+            is_structures.append(is_structure)
+            # Alliance.Neutral.value = 3
+            if alliance == 3:
+                # XELNAGATOWER = 149
+                if unit_type == 149:
+                    category_indices["watchtowers"].append(index)
+                # mineral field enums
+                elif unit_type in mineral_ids:
+                    category_indices["mineral_field"].append(index)
+                    category_indices["resources"].append(index)
+                # geyser enums
+                elif unit_type in geyser_ids:
+                    category_indices["vespene_geyser"].append(index)
+                    category_indices["resources"].append(index)
+                # all destructable rocks
+                else:
+                    category_indices["destructables"].append(index)
+            # Alliance.Self.value = 1
+            elif alliance == 1:
+                if is_structure:
+                    structures.append(index)
+                    if unit_type in townhall_ids:
+                        category_indices["townhalls"].append(index)
+                    elif unit_type in ALL_GAS_IDS or unit.vespene_contents:
+                        # TODO: remove "or unit.vespene_contents" when a new linux client newer than version 4.10.0 is released
+                        category_indices["gas_buildings"].append(index)
+                    elif unit_type in TECHLAB_IDS:
+                        self.techlab_tags.add(unit.tag)
+                    elif unit_type in REACTOR_IDS:
+                        self.reactor_tags.add(unit.tag)
+                else:
+                    units.append(index)
+                    if unit_type == worker_id:
+                        category_indices["workers"].append(index)
+                    # LARVA = 151
+                    elif unit_type == 151:
+                        category_indices["larva"].append(index)
+            # Alliance.Enemy.value = 4
+            elif alliance == 4:
+                if is_structure:
+                    enemy_structures.append(index)
+                else:
+                    enemy_units.append(index)
+
+        return unit_protos, type_ids, alliances, is_structures, category_indices, blip_protos, fake_effect_units
 
     async def _after_step(self) -> int:
         """ Executed by main.py after each on_step function. """
@@ -1577,15 +1913,18 @@ class BotAI(DistanceCalculation):
         await self._issue_vision_events()
 
     async def _issue_unit_added_events(self):
-        for unit in self.units:
-            if unit.tag not in self._units_previous_map and unit.tag not in self._unit_tags_seen_this_game:
+        is_structure = self._frame_units.is_structure
+        for index in self.unit_registry.added_rows.tolist():
+            if is_structure[index]:
+                continue
+            unit = self._frame_units.unit(index)
+            if unit.tag not in self._unit_tags_seen_this_game:
                 self._unit_tags_seen_this_game.add(unit.tag)
                 await self.on_unit_created(unit)
-            elif unit.tag in self._units_previous_map:
-                # Check if a unit took damage this frame and then trigger event
-                previous_frame_unit: Unit = self._units_previous_map[unit.tag]
-                if unit.health < previous_frame_unit.health or unit.shield < previous_frame_unit.shield:
-                    await self.on_unit_took_damage(unit)
+        # Check if a unit took damage this frame and then trigger event
+        for index in self.unit_registry.damaged_rows.tolist():
+            if not is_structure[index]:
+                await self.on_unit_took_damage(self._frame_units.unit(index))
 
     async def _issue_upgrade_events(self):
         difference = self.state.upgrades - self._previous_upgrades
@@ -1594,47 +1933,28 @@ class BotAI(DistanceCalculation):
         self._previous_upgrades = self.state.upgrades
 
     async def _issue_building_events(self):
-        for structure in self.structures:
+        is_structure = self._frame_units.is_structure
+        for index in self.unit_registry.added_rows.tolist():
             # Check build_progress < 1 to exclude starting townhall
-            if structure.tag not in self._structures_previous_map and structure.build_progress < 1:
-                await self.on_building_construction_started(structure)
-                continue
-            elif structure.tag in self._structures_previous_map:
-                # Check if a structure took damage this frame and then trigger event
-                previous_frame_structure: Unit = self._structures_previous_map[structure.tag]
-                if (
-                    structure.health < previous_frame_structure.health
-                    or structure.shield < previous_frame_structure.shield
-                ):
-                    await self.on_unit_took_damage(structure)
-            # From here on, only check completed structure, so we ignore structures with build_progress < 1
-            if structure.build_progress < 1:
-                continue
-            # Using get function in case somehow the previous structure map (from last frame) does not contain this structure
-            structure_prev = self._structures_previous_map.get(structure.tag, None)
-            if structure_prev and structure_prev.build_progress < 1:
-                await self.on_building_construction_complete(structure)
+            if is_structure[index]:
+                unit = self._frame_units.unit(index)
+                if unit.build_progress < 1:
+                    await self.on_building_construction_started(unit)
+        # Check if a structure took damage this frame and then trigger event
+        for index in self.unit_registry.damaged_rows.tolist():
+            if is_structure[index]:
+                await self.on_unit_took_damage(self._frame_units.unit(index))
+        for index in self.unit_registry.completed_rows.tolist():
+            await self.on_building_construction_complete(self._frame_units.unit(index))
 
     async def _issue_vision_events(self):
         # Call events for enemy unit entered vision
-        for enemy_unit in self.enemy_units:
-            if enemy_unit.tag not in self._enemy_units_previous_map:
-                await self.on_enemy_unit_entered_vision(enemy_unit)
-        for enemy_structure in self.enemy_structures:
-            if enemy_structure.tag not in self._enemy_structures_previous_map:
-                await self.on_enemy_unit_entered_vision(enemy_structure)
+        for index in self.unit_registry.entered_vision_rows.tolist():
+            await self.on_enemy_unit_entered_vision(self._frame_units.unit(index))
 
         # Call events for enemy unit left vision
-        if self.enemy_units:
-            visible_enemy_units = self.enemy_units.tags
-            for enemy_unit_tag in self._enemy_units_previous_map.keys():
-                if enemy_unit_tag not in visible_enemy_units:
-                    await self.on_enemy_unit_left_vision(enemy_unit_tag)
-        if self.enemy_structures:
-            visible_enemy_structures = self.enemy_structures.tags
-            for enemy_structure_tag in self._enemy_units_previous_map.keys():
-                if enemy_structure_tag not in visible_enemy_structures:
-                    await self.on_enemy_unit_left_vision(enemy_structure_tag)
+        for enemy_unit_tag in self.unit_registry.left_vision:
+            await self.on_enemy_unit_left_vision(enemy_unit_tag)
 
     async def _issue_unit_dead_events(self):
         for unit_tag in self.state.dead_units:
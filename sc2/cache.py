@@ -1,9 +1,116 @@
+import os
+import sys
+import time
 from collections import Counter
 import numpy as np
 from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+# If the environment variable SC2CACHESTATS is set (e.g. SC2CACHESTATS=1) before sc2 is imported,
+# the decorators in this file count how each cached property is used, see cache_stats_report and BotAI.cache_stats.
+# Otherwise the decorators are not changed and nothing is counted.
+CACHE_STATS_ENABLED: bool = bool(os.environ.get("SC2CACHESTATS"))
+
+
+class CacheStats:
+    """ How one cached property or method was used, summed over all objects """
+
+    __slots__ = ("name", "calls", "misses", "copies", "recompute_time", "last_size")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.misses = 0
+        # How often the cached value was copied before it was returned
+        self.copies = 0
+        # Seconds spent calculating the values, including other cached properties that were calculated by it
+        self.recompute_time = 0.0
+        # Size of the last calculated value in bytes, without the objects it contains (sys.getsizeof)
+        self.last_size = 0
+
+    @property
+    def hits(self) -> int:
+        return self.calls - self.misses
+
+    def __repr__(self) -> str:
+        return f"CacheStats({self.name}, calls={self.calls}, misses={self.misses}, copies={self.copies})"
+
+
+_cache_stats: Dict[str, CacheStats] = {}
+
+
+def _counted_function(f: Callable) -> Tuple[Callable, Optional[CacheStats]]:
+    """ Returns 'f' with a wrapper that counts each call as a cache miss, and the CacheStats it counts in.
+    Returns 'f' and None if CACHE_STATS_ENABLED is not set. """
+    if not CACHE_STATS_ENABLED:
+        return f, None
+    stats = _cache_stats.setdefault(f.__qualname__, CacheStats(f.__qualname__))
+
+    @wraps(f)
+    def counted_f(*args, **kwargs):
+        start = time.perf_counter()
+        value = f(*args, **kwargs)
+        stats.recompute_time += time.perf_counter() - start
+        stats.misses += 1
+        stats.last_size = sys.getsizeof(value)
+        return value
+
+    return counted_f, stats
+
+
+def _counted_calls(inner: Callable, stats: Optional[CacheStats], count_copies: bool = False) -> Callable:
+    """ Returns 'inner' with a wrapper that counts its calls in 'stats', or 'inner' itself if stats is None. """
+    if stats is None:
+        return inner
+
+    @wraps(inner)
+    def counted_inner(*args, **kwargs):
+        stats.calls += 1
+        value = inner(*args, **kwargs)
+        if count_copies and _is_copied(value):
+            stats.copies += 1
+        return value
+
+    return counted_inner
+
+
+def cache_stats() -> List[CacheStats]:
+    """ Returns the CacheStats of all cached properties and methods that were used, the slowest first.
+    Empty if CACHE_STATS_ENABLED is not set. """
+    return sorted(
+        (stats for stats in _cache_stats.values() if stats.calls), key=lambda stats: stats.recompute_time, reverse=True
+    )
+
+
+def cache_stats_report() -> str:
+    """ Returns cache_stats() as a table """
+    if not CACHE_STATS_ENABLED:
+        return "Cache stats are not collected, set the environment variable SC2CACHESTATS=1 before sc2 is imported"
+    lines = [f"{'name':<50} {'calls':>9} {'hits':>9} {'misses':>9} {'copies':>9} {'time (ms)':>10} {'size (B)':>9}"]
+    for stats in cache_stats():
+        lines.append(
+            f"{stats.name:<50} {stats.calls:>9} {stats.hits:>9} {stats.misses:>9} {stats.copies:>9} "
+            f"{stats.recompute_time * 1000:>10.1f} {stats.last_size:>9}"
+        )
+    return "\n".join(lines)
+
+
+def reset_cache_stats():
+    """ Sets all counts of cache_stats() to 0 """
+    for stats in _cache_stats.values():
+        # The decorated functions keep counting in the same objects
+        stats.calls = stats.misses = stats.copies = stats.last_size = 0
+        stats.recompute_time = 0.0
+
+
+def _is_copied(value) -> bool:
+    """ If property_cache_once_per_frame returns a copy of 'value' """
+    return type(value).__name__ == "Units" or isinstance(value, (list, set, dict, Counter, np.ndarray))
 
 
 def property_cache_forever(f):
+    f, stats = _counted_function(f)
+
     @wraps(f)
     def inner(self):
         property_cache = "_cache_" + f.__name__
@@ -13,35 +120,143 @@ def property_cache_forever(f):
         cache = getattr(self, property_cache)
         return cache
 
-    return property(inner)
+    return property(_counted_calls(inner, stats))
 
 
-def property_cache_once_per_frame(f):
+def _read_only(self, *args, **kwargs):
+    raise TypeError(f"'{type(self).__name__}' is read-only, use .copy() to get a copy that can be changed")
+
+
+class FrozenDict(dict):
+    """ A dict that can not be changed, returned by frozen caches instead of a dict. copy() returns a normal dict. """
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    update = setdefault = pop = popitem = clear = _read_only
+
+    def copy(self) -> dict:
+        return dict(self)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class FrozenCounter(Counter):
+    """ A Counter that can not be changed, returned by frozen caches instead of a Counter.
+    Reading missing keys returns 0 as usual, copy() returns a normal Counter. """
+
+    def __init__(self, counts=None):
+        # Counter.__init__ would call self.update
+        dict.__init__(self, counts or {})
+
+    __setitem__ = __delitem__ = _read_only
+    update = subtract = setdefault = pop = popitem = clear = _read_only
+    __iadd__ = __isub__ = __ior__ = __iand__ = _read_only
+
+    def copy(self) -> Counter:
+        return Counter(self)
+
+    def __reduce__(self):
+        return Counter, (dict(self),)
+
+
+def freeze(value):
+    """ Returns a read-only version of 'value' without copying it if possible:
+    Units objects and numpy arrays are made read-only, dicts and Counters are wrapped, lists become tuples and sets become frozensets.
+    Other values are returned as they are. """
+    if type(value).__name__ == "Units":
+        value._frozen = True
+    elif isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, Counter):
+        value = FrozenCounter(value)
+    elif isinstance(value, dict):
+        value = FrozenDict(value)
+    elif isinstance(value, list):
+        value = tuple(value)
+    elif isinstance(value, set):
+        value = frozenset(value)
+    return value
+
+
+def property_cache_once_per_frame(f=None, *, frozen: bool = False):
     """ This decorator caches the return value for one game loop,
     then clears it if it is accessed in a different game loop.
     Only works on properties of the bot object, because it requires
-    access to self.state.game_loop """
+    access to self.state.game_loop
+
+    Mutable values (Units, list, set, dict, Counter, numpy array) are copied each time the property is accessed.
+    With @property_cache_once_per_frame(frozen=True), the value is made read-only once per frame instead (see freeze),
+    and the same object is returned each time. Callers that need to change it have to call .copy() themselves. """
+    if f is None:
+        return lambda f: property_cache_once_per_frame(f, frozen=frozen)
+
+    f, stats = _counted_function(f)
+    property_cache = "_cache_" + f.__name__
+    state_cache = "_frame_" + f.__name__
 
     @wraps(f)
     def inner(self):
-        property_cache = "_cache_" + f.__name__
-        state_cache = "_frame_" + f.__name__
         cache_updated = hasattr(self, property_cache) and getattr(self, state_cache, None) == self.state.game_loop
         if not cache_updated:
-            setattr(self, property_cache, f(self))
+            value = f(self)
+            setattr(self, property_cache, freeze(value) if frozen else value)
             setattr(self, state_cache, self.state.game_loop)
 
         cache = getattr(self, property_cache)
-        should_copy = type(cache).__name__ == "Units" or isinstance(cache, (list, set, dict, Counter, np.ndarray))
-        if should_copy:
+        if frozen:
+            return cache
+        if _is_copied(cache):
             return cache.copy()
         return cache
 
-    return property(inner)
+    return property(_counted_calls(inner, stats, count_copies=not frozen))
+
+
+def method_cache_once_per_frame(f):
+    """ This decorator caches the return value of a method for each combination of arguments for one game loop,
+    then clears it if the method is called in a different game loop.
+    Like property_cache_once_per_frame, it only works on methods of the bot object.
+    The arguments have to be hashable, calls with other arguments are not cached.
+    The returned values are not copied, so they should not be changed.
+    See clear_method_cache if a value has to be calculated again in the same game loop. """
+    f, stats = _counted_function(f)
+    method_cache = "_cache_" + f.__name__
+
+    @wraps(f)
+    def inner(self, *args, **kwargs):
+        game_loop = self.state.game_loop
+        frame_cache = getattr(self, method_cache, None)
+        if frame_cache is None or frame_cache[0] != game_loop:
+            frame_cache = (game_loop, {})
+            setattr(self, method_cache, frame_cache)
+        cache = frame_cache[1]
+        key = (args, frozenset(kwargs.items())) if kwargs else args
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # Unhashable arguments
+            return f(self, *args, **kwargs)
+        value = cache[key] = f(self, *args, **kwargs)
+        return value
+
+    return _counted_calls(inner, stats)
+
+
+def clear_method_cache(instance, *method_names: str):
+    """ Clears the values that method_cache_once_per_frame stored for the given methods of 'instance',
+    e.g. after changing something in the middle of a frame that the methods depend on.
+
+    :param instance:
+    :param method_names: """
+    for method_name in method_names:
+        instance.__dict__.pop("_cache_" + method_name, None)
 
 
 def property_immutable_cache(f):
     """ This cache should only be used on properties that return an immutable object """
+    f, stats = _counted_function(f)
 
     @wraps(f)
     def inner(self):
@@ -49,11 +264,12 @@ def property_immutable_cache(f):
             self.cache[f.__name__] = f(self)
         return self.cache[f.__name__]
 
-    return property(inner)
+    return property(_counted_calls(inner, stats))
 
 
 def property_mutable_cache(f):
     """ This cache should only be used on properties that return a mutable object (Units, list, set, dict, Counter) """
+    f, stats = _counted_function(f)
 
     @wraps(f)
     def inner(self):
@@ -61,4 +277,4 @@ def property_mutable_cache(f):
             self.cache[f.__name__] = f(self)
         return self.cache[f.__name__].copy()
 
-    return property(inner)
+    return property(_counted_calls(inner, stats, count_copies=True))
@@ -122,6 +122,12 @@ class Client(Protocol):
             result = await self._execute(observation=sc_pb.RequestObservation(game_loop=game_loop))
         else:
             result = await self._execute(observation=sc_pb.RequestObservation())
+        return await self._handle_observation(result)
+
+    async def _handle_observation(self, result):
+        """ Checks the game result and renders the observation.
+
+        :param result: Response to a RequestObservation """
         assert result.HasField("observation")
 
         if not self.in_game or result.observation.player_result:
@@ -130,10 +136,7 @@ class Client(Protocol):
                 result = await self._execute(observation=sc_pb.RequestObservation())
                 assert result.observation.player_result
 
-            player_id_to_result = {}
-            for pr in result.observation.player_result:
-                player_id_to_result[pr.player_id] = Result(pr.result)
-            self._game_result = player_id_to_result
+            self._set_game_result(result.observation.player_result)
 
         # if render_data is available, then RGB rendering was requested
         if self._renderer and result.observation.observation.HasField("render_data"):
@@ -141,10 +144,42 @@ class Client(Protocol):
 
         return result
 
+    def _set_game_result(self, player_results):
+        player_id_to_result = {}
+        for pr in player_results:
+            player_id_to_result[pr.player_id] = Result(pr.result)
+        self._game_result = player_id_to_result
+
     async def step(self):
         """ EXPERIMENTAL: Change self._client.game_step during the step function to increase or decrease steps per second """
         return await self._execute(step=sc_pb.RequestStep(count=self.game_step))
 
+    async def _step_and_observation(self, game_info: bool = False):
+        """ Sends the requests collected since self._start_pipeline (actions and debug drawings), the step request,
+        the observation request and optionally the game info request back to back.
+        Returns the observation response and the game info response (or None).
+
+        :param game_info: """
+        requests = [
+            sc_pb.Request(step=sc_pb.RequestStep(count=self.game_step)),
+            sc_pb.Request(observation=sc_pb.RequestObservation()),
+        ]
+        if game_info:
+            requests.append(sc_pb.Request(game_info=sc_pb.RequestGameInfo()))
+        collected_count = len(self._pipeline or [])
+        responses = await self._send_pipeline(*requests)
+        observation_response = responses[collected_count + 1]
+        try:
+            for response in responses:
+                self._handle_response(response)
+        except ProtocolError as error:
+            # The game ended before the collected actions were received, the observation contains the result
+            if error.is_game_over_error and observation_response.observation.player_result:
+                self._set_game_result(observation_response.observation.player_result)
+            raise
+        observation = await self._handle_observation(observation_response)
+        return observation, responses[collected_count + 2] if game_info else None
+
     async def get_game_data(self) -> GameData:
         result = await self._execute(
             data=sc_pb.RequestData(ability_id=True, unit_type_id=True, upgrade_id=True, buff_id=True, effect_id=True)
@@ -183,6 +218,9 @@ class Client(Protocol):
         res = await self._execute(
             action=sc_pb.RequestAction(actions=(sc_pb.Action(action_raw=a) for a in combine_actions(actions)))
         )
+        if res is None:
+            # The request is sent later with the next step request, see Protocol._start_pipeline
+            return None
         if return_successes:
             return [ActionResult(r) for r in res.action.result]
         else:
@@ -1,7 +1,10 @@
+from sc2.cache import property_cache_once_per_frame
 from sc2.position import Point2
 from sc2.unit import Unit
 from sc2.units import Units
+from sc2.frame_units import FrameUnits
 from sc2.game_state import GameState
+from sc2.spatial_index import SpatialIndex
 
 import logging
 
@@ -11,10 +14,141 @@ from scipy.spatial.distance import pdist, cdist
 import math
 import numpy as np
 
-from typing import Dict, Tuple, Iterable, Generator
+from typing import Dict, List, Tuple, Iterable, Generator, Optional
+
+# Modes of distance calculation method 4, see DistanceCalculation._select_distance_mode
+DISTANCE_MODE_DENSE, DISTANCE_MODE_CONDENSED, DISTANCE_MODE_SCALAR = "dense", "condensed", "scalar"
+# Calculating this many squared distances of a matrix takes about as long as one distance query without a matrix
+MATRIX_ELEMENTS_PER_SCALAR_QUERY: int = 200
+
+# Blocks of the distance matrix of method 2, see DistanceCalculation._distance_block
+FRIENDLY_BLOCK, ENEMY_BLOCK, NEUTRAL_BLOCK = 0, 1, 2
+# Block of each Alliance value: Self = 1, Ally = 2, Neutral = 3, Enemy = 4
+BLOCK_OF_ALLIANCE: np.ndarray = np.array([NEUTRAL_BLOCK, FRIENDLY_BLOCK, FRIENDLY_BLOCK, NEUTRAL_BLOCK, ENEMY_BLOCK])
+
+
+def squared_distances(positions1: np.ndarray, positions2: np.ndarray, float32: bool = False) -> np.ndarray:
+    """ Returns the matrix of squared distances between two arrays of positions of shape (n, 2) and (m, 2).
+    With float32, the matrix is calculated in single precision, which needs half the memory.
+
+    :param positions1:
+    :param positions2:
+    :param float32: """
+    if not float32:
+        return cdist(positions1, positions2, "sqeuclidean")
+    positions1 = positions1.astype(np.float32)
+    positions2 = positions2.astype(np.float32)
+    dx = np.subtract.outer(positions1[:, 0], positions2[:, 0])
+    dy = np.subtract.outer(positions1[:, 1], positions2[:, 1])
+    dx *= dx
+    dy *= dy
+    dx += dy
+    return dx
+
+
+def condensed_squared_distances(positions: np.ndarray, float32: bool = False) -> np.ndarray:
+    """ Returns the squared distances between all positions as condensed matrix (see scipy's pdist).
+
+    :param positions:
+    :param float32: """
+    distances = pdist(positions, "sqeuclidean")
+    if float32:
+        return distances.astype(np.float32)
+    return distances
+
+
+class IncrementalDistanceMatrix:
+    """ Square matrix of squared distances that is kept across frames, used by distance calculation method 5.
+    Each unit keeps its slot (row and column of the matrix) while it exists. Each frame, only the rows and columns of units
+    that moved or appeared are calculated again. The slots of units that are gone are reused for new units. """
+
+    # If more than this fraction of the units changed, the matrix is calculated again from scratch
+    FULL_UPDATE_FRACTION: float = 0.5
+
+    def __init__(self, float32: bool = False):
+        """
+        :param float32: Calculate the distances in single precision, see squared_distances
+        """
+        self.float32 = float32
+        self.matrix: np.ndarray = np.zeros((0, 0), dtype=np.float32 if float32 else float)
+        # Slot of each row of the unit table of the last update
+        self.slots: np.ndarray = np.zeros(0, dtype=int)
+        # Number of rows that were calculated in the last update
+        self.updated_rows: int = 0
+        self._positions: np.ndarray = np.zeros((0, 2))
+        self._slot_tags: np.ndarray = np.zeros(0, dtype=np.uint64)
+        self._occupied: np.ndarray = np.zeros(0, dtype=bool)
+
+    def _rebuild(self, tags: np.ndarray, positions: np.ndarray):
+        self._positions = positions.copy()
+        self._slot_tags = tags.copy()
+        self._occupied = np.ones(len(tags), dtype=bool)
+        self.matrix = squared_distances(positions, positions, self.float32)
+        self.slots = np.arange(len(tags))
+        self.updated_rows = len(tags)
+
+    def _grow(self, capacity: int):
+        old_capacity = len(self._slot_tags)
+        matrix = np.zeros((capacity, capacity), dtype=self.matrix.dtype)
+        matrix[:old_capacity, :old_capacity] = self.matrix
+        self.matrix = matrix
+        self._positions = np.concatenate((self._positions, np.zeros((capacity - old_capacity, 2))))
+        self._slot_tags = np.concatenate((self._slot_tags, np.zeros(capacity - old_capacity, dtype=np.uint64)))
+        self._occupied = np.concatenate((self._occupied, np.zeros(capacity - old_capacity, dtype=bool)))
+
+    def update(self, tags: np.ndarray, positions: np.ndarray):
+        """ Updates the matrix to the units of a new frame.
+
+        :param tags: Tag of each row of the unit table
+        :param positions: Array of shape (n, 2) with the position of each row of the unit table """
+        occupied_slots = np.flatnonzero(self._occupied)
+        order = np.argsort(self._slot_tags[occupied_slots])
+        sorted_tags = self._slot_tags[occupied_slots][order]
+        sorted_slots = occupied_slots[order]
+        if len(sorted_tags):
+            found = np.minimum(np.searchsorted(sorted_tags, tags), len(sorted_tags) - 1)
+            matched = sorted_tags[found] == tags
+        else:
+            found = np.zeros(len(tags), dtype=int)
+            matched = np.zeros(len(tags), dtype=bool)
+        slots = np.full(len(tags), -1, dtype=int)
+        slots[matched] = sorted_slots[found[matched]]
+        moved = np.zeros(len(tags), dtype=bool)
+        moved[matched] = (self._positions[slots[matched]] != positions[matched]).any(axis=1)
+        new_rows = np.flatnonzero(~matched)
+        if len(new_rows) + np.count_nonzero(moved) > self.FULL_UPDATE_FRACTION * len(tags):
+            self._rebuild(tags, positions)
+            return
+
+        # Free the slots of the units that are gone
+        self._occupied[:] = False
+        self._occupied[slots[matched]] = True
+        free_slots = np.flatnonzero(~self._occupied)
+        if len(free_slots) < len(new_rows):
+            self._grow(max(2 * len(self._slot_tags), len(self._slot_tags) + len(new_rows) - len(free_slots), 16))
+            free_slots = np.flatnonzero(~self._occupied)
+        slots[new_rows] = free_slots[: len(new_rows)]
+        self._occupied[slots[new_rows]] = True
+        self._slot_tags[slots[new_rows]] = tags[new_rows]
+
+        changed_slots = slots[moved | ~matched]
+        self._positions[slots] = positions
+        if len(changed_slots):
+            distances = squared_distances(self._positions[changed_slots], self._positions, self.float32)
+            self.matrix[changed_slots, :] = distances
+            self.matrix[:, changed_slots] = distances.T
+        self.slots = slots
+        self.updated_rows = len(changed_slots)
 
 
 class DistanceCalculation:
+    # Default settings, bots can set them like the settings in BotAI._initialize_variables.
+    # Defined on the class so that all subclasses (e.g. ObserverAI) have them
+    # Calculate the distance matrices of methods 1, 2, 4 and 5 in single precision, which needs half the memory
+    distance_matrix_float32: bool = False
+    # Largest distance matrix in bytes that method 4 calculates, None for no limit, see self._select_distance_mode
+    distance_matrix_memory_limit: Optional[int] = None
+
     def __init__(self):
         self.state: GameState = None
         self._generated_frame = -100
@@ -24,6 +158,47 @@ class DistanceCalculation:
         # Pdist condensed vector generated by scipy pdist, half the size of the cdist matrix as 1d array
         self._cached_pdist: np.ndarray = None
         self._cached_cdist: np.ndarray = None
+        # The distance matrix of method 2 split into blocks of friendly, enemy and neutral units, see self._distance_block
+        self._blocks_frame = -100
+        self._cached_distance_blocks: Dict[Tuple[int, int], np.ndarray] = {}
+        self._block_positions: List[np.ndarray] = []
+        # Block of each row of the unit table, and the row inside that block
+        self._row_block: List[int] = []
+        self._row_block_index: List[int] = []
+        # KD-tree over the positions of all units, used by distance calculation method 3
+        self._cached_spatial_index: SpatialIndex = None
+        # Distance matrix that is kept across frames, used by distance calculation method 5
+        self._incremental_distance_matrix: IncrementalDistanceMatrix = None
+        self._incremental_slots: List[int] = []
+        # The mode that distance calculation method 4 selected for the current frame, see self._select_distance_mode
+        self.distance_mode: str = DISTANCE_MODE_DENSE
+        self._distance_mode_function = self._distance_squared_unit_to_unit_method2
+        # Distance queries between two units in the current frame, counted by method 4
+        self._distance_queries: int = 0
+        # If self._distance_queries were counted for a whole frame, False before the first frame
+        self._distance_queries_measured: bool = False
+
+    @property_cache_once_per_frame(frozen=True)
+    def _all_unit_positions(self) -> np.ndarray:
+        """ Positions of self.all_units as array of shape (n, 2). BotAI takes them from the protos of the current frame,
+        without creating Unit objects. """
+        return self.all_units.positions
+
+    @property_cache_once_per_frame(frozen=True)
+    def _all_unit_tags(self) -> np.ndarray:
+        """ Tags of self.all_units. """
+        return np.array([unit.tag for unit in self.all_units], dtype=np.uint64)
+
+    @property_cache_once_per_frame(frozen=True)
+    def _all_unit_alliance(self) -> np.ndarray:
+        """ Alliance of each unit in self.all_units. """
+        return np.array([unit._proto.alliance for unit in self.all_units], dtype=np.uint8)
+
+    @property
+    def _distance_frame_units(self) -> Optional[FrameUnits]:
+        """ The units of the current frame that the rows of the distances belong to, see Units._from_frame_units.
+        None if self.all_units is not created from them. """
+        return None
 
     @property
     def _units_count(self) -> int:
@@ -50,24 +225,35 @@ class DistanceCalculation:
             return self.calculate_distances()
         return self._cached_cdist
 
+    @property
+    def _spatial_index(self) -> SpatialIndex:
+        """ As property, so it will be recalculated each time it is called, or return from cache if it is called multiple times in teh same game_loop. """
+        if self._generated_frame2 != self.state.game_loop:
+            return self.calculate_distances()
+        return self._cached_spatial_index
+
+    @property
+    def _incremental_distances(self) -> IncrementalDistanceMatrix:
+        """ As property, so it will be recalculated each time it is called, or return from cache if it is called multiple times in teh same game_loop. """
+        if self._generated_frame2 != self.state.game_loop:
+            return self.calculate_distances()
+        return self._incremental_distance_matrix
+
     def generate_unit_indices(self) -> Dict[int, int]:
         if self._generated_frame != self.state.game_loop:
-            self._cached_unit_index_dict = {unit.tag: index for index, unit in enumerate(self.all_units)}
+            tags = self._all_unit_tags.tolist()
+            self._cached_unit_index_dict = dict(zip(tags, range(len(tags))))
             self._generated_frame = self.state.game_loop
         return self._cached_unit_index_dict
 
     def _calculate_distances_method1(self) -> np.ndarray:
         if self._generated_frame2 != self.state.game_loop:
-            # Converts tuple [(1, 2), (3, 4)] to flat list like [1, 2, 3, 4]
-            flat_positions = (coord for unit in self.all_units for coord in unit.position_tuple)
-            # Converts to numpy array, then converts the flat array back to shape (n, 2): [[1, 2], [3, 4]]
-            positions_array: np.ndarray = np.fromiter(
-                flat_positions, dtype=np.float, count=2 * self._units_count
-            ).reshape((self._units_count, 2))
+            # Array of shape (n, 2): [[x1, y1], [x2, y2]]
+            positions_array: np.ndarray = self._all_unit_positions
             assert len(positions_array) == self._units_count
             self._generated_frame2 = self.state.game_loop
             # See performance benchmarks
-            self._cached_pdist = pdist(positions_array, "sqeuclidean")
+            self._cached_pdist = condensed_squared_distances(positions_array, self.distance_matrix_float32)
 
             # # Distance check of all units
             # for unit1 in self.all_units:
@@ -94,19 +280,63 @@ class DistanceCalculation:
 
     def _calculate_distances_method2(self) -> np.ndarray:
         if self._generated_frame2 != self.state.game_loop:
-            # Converts tuple [(1, 2), (3, 4)] to flat list like [1, 2, 3, 4]
-            flat_positions = (coord for unit in self.all_units for coord in unit.position_tuple)
-            # Converts to numpy array, then converts the flat array back to shape (n, 2): [[1, 2], [3, 4]]
-            positions_array: np.ndarray = np.fromiter(
-                flat_positions, dtype=np.float, count=2 * self._units_count
-            ).reshape((self._units_count, 2))
+            # Array of shape (n, 2): [[x1, y1], [x2, y2]]
+            positions_array: np.ndarray = self._all_unit_positions
             assert len(positions_array) == self._units_count
             self._generated_frame2 = self.state.game_loop
             # See performance benchmarks
-            self._cached_cdist = cdist(positions_array, positions_array, "sqeuclidean")
+            self._cached_cdist = squared_distances(positions_array, positions_array, self.distance_matrix_float32)
 
         return self._cached_cdist
 
+    def _prepare_distance_blocks(self):
+        """ Splits the units into blocks, the distances between the units of two blocks are only calculated when they are needed. """
+        # Array of shape (n, 2): [[x1, y1], [x2, y2]]
+        positions_array: np.ndarray = self._all_unit_positions
+        row_block = BLOCK_OF_ALLIANCE[self._all_unit_alliance]
+        row_block_index = np.zeros(len(positions_array), dtype=int)
+        self._block_positions = []
+        for block in (FRIENDLY_BLOCK, ENEMY_BLOCK, NEUTRAL_BLOCK):
+            in_block = row_block == block
+            row_block_index[in_block] = np.arange(np.count_nonzero(in_block))
+            self._block_positions.append(positions_array[in_block])
+        self._row_block = row_block.tolist()
+        self._row_block_index = row_block_index.tolist()
+        self._cached_distance_blocks = {}
+        self._blocks_frame = self.state.game_loop
+
+    def _distance_block(self, block1: int, block2: int) -> np.ndarray:
+        """ Returns the squared distances between the units of two blocks (block1 <= block2), e.g. own units and minerals.
+        Calculated the first time a distance between units of these blocks is needed in a frame. """
+        distances = self._cached_distance_blocks.get((block1, block2))
+        if distances is None:
+            distances = squared_distances(
+                self._block_positions[block1], self._block_positions[block2], self.distance_matrix_float32
+            )
+            self._cached_distance_blocks[(block1, block2)] = distances
+        return distances
+
+    def _calculate_distances_method3(self) -> SpatialIndex:
+        if self._generated_frame2 != self.state.game_loop:
+            # Array of shape (n, 2): [[x1, y1], [x2, y2]]
+            positions_array: np.ndarray = self._all_unit_positions
+            self._generated_frame2 = self.state.game_loop
+            self._cached_spatial_index = SpatialIndex(positions_array)
+
+        return self._cached_spatial_index
+
+    def _calculate_distances_method5(self) -> IncrementalDistanceMatrix:
+        if self._generated_frame2 != self.state.game_loop:
+            if self._incremental_distance_matrix is None:
+                self._incremental_distance_matrix = IncrementalDistanceMatrix(self.distance_matrix_float32)
+            # Array of shape (n, 2): [[x1, y1], [x2, y2]]
+            positions_array: np.ndarray = self._all_unit_positions
+            self._generated_frame2 = self.state.game_loop
+            self._incremental_distance_matrix.update(self._all_unit_tags, positions_array)
+            self._incremental_slots = self._incremental_distance_matrix.slots.tolist()
+
+        return self._incremental_distance_matrix
+
     def _get_index_of_two_units_method1(self, unit1: Unit, unit2: Unit) -> int:
         assert (
             unit1.tag in self._unit_index_dict
@@ -129,6 +359,61 @@ class DistanceCalculation:
         # idnex2 = self._unit_index_dict[unit2.tag]
         return self._unit_index_dict[unit1.tag], self._unit_index_dict[unit2.tag]
 
+    def _select_distance_mode(self):
+        """ Selects how distances are calculated in this frame if distance calculation method 4 is used, and stores it in self.distance_mode:
+        dense: blocks of the square matrix (method 2), condensed: the condensed matrix (method 1), scalar: math.hypot for each query (method 0).
+
+        The matrix is only worth calculating if enough distances were queried in the previous frame. The dense matrix is used if it
+        fits into self.distance_matrix_memory_limit (in bytes), otherwise the condensed matrix which needs half the memory. """
+        # None in the first frame, as nothing was measured yet
+        queries: Optional[int] = self._distance_queries if self._distance_queries_measured else None
+        self._distance_queries = 0
+        self._distance_queries_measured = True
+        units_count = self._units_count
+        item_size = 4 if self.distance_matrix_float32 else 8
+        memory_limit: Optional[int] = self.distance_matrix_memory_limit
+        if queries is not None and queries * MATRIX_ELEMENTS_PER_SCALAR_QUERY < units_count * units_count / 2:
+            mode = DISTANCE_MODE_SCALAR
+        elif memory_limit is None or units_count * units_count * item_size <= memory_limit:
+            mode = DISTANCE_MODE_DENSE
+        elif units_count * (units_count - 1) // 2 * item_size <= memory_limit:
+            mode = DISTANCE_MODE_CONDENSED
+        else:
+            mode = DISTANCE_MODE_SCALAR
+
+        if mode == DISTANCE_MODE_DENSE:
+            self._distance_mode_function = self._distance_squared_unit_to_unit_method2
+            self.calculate_distances = self._calculate_distances_method2
+            self._get_index_of_two_units = self._get_index_of_two_units_method2
+        elif mode == DISTANCE_MODE_CONDENSED:
+            self._distance_mode_function = self._distance_squared_unit_to_unit_method1
+            self.calculate_distances = self._calculate_distances_method1
+            self._get_index_of_two_units = self._get_index_of_two_units_method1
+        else:
+            self._distance_mode_function = self._distance_squared_unit_to_unit_method0
+        self.distance_mode = mode
+        logger.debug(f"Distance mode: {mode} with {units_count} units and {queries} queries in the last frame")
+
+    def _prepare_distances(self):
+        """ Called after the units of a new frame were prepared, e.g. by BotAI._prepare_units.
+        The distances themselves are calculated when they are first needed in the frame. """
+        if self.distance_calculation_method == 4:
+            self._select_distance_mode()
+
+    def _unit_rows(self, units: Units) -> Optional[np.ndarray]:
+        """ Returns the rows of the units in the unit table of the current frame, which are also the rows of self._spatial_index.
+        Returns None if one of the units is not part of the current frame, e.g. a remembered snapshot. """
+        if units._table_indices is not None and units._frame_units is self._distance_frame_units:
+            return units._table_indices
+        unit_index_dict = self._unit_index_dict
+        rows = []
+        for unit in units:
+            row = unit_index_dict.get(unit.tag)
+            if row is None or unit.is_memory:
+                return None
+            rows.append(row)
+        return np.array(rows, dtype=int)
+
     # Helper functions
 
     def square_to_condensed(self, i, j) -> int:
@@ -160,12 +445,13 @@ class DistanceCalculation:
         # If checked on units if they have the same tag, return distance 0 as these are not in the 1 dimensional pdist array - would result in an error otherwise
         if unit1.tag == unit2.tag:
             return 0
-        # Calculate index, needs to be after pdist has been calculated and cached
+        # Calculate index, pdist is calculated when it is first needed in a frame
         condensed_index = self._get_index_of_two_units(unit1, unit2)
+        pdist_vector = self._pdist
         assert condensed_index < len(
-            self._cached_pdist
-        ), f"Condensed index is larger than amount of calculated distances: {condensed_index} < {len(self._cached_pdist)}, units that caused the assert error: {unit1} and {unit2}"
-        distance = self._pdist[condensed_index]
+            pdist_vector
+        ), f"Condensed index is larger than amount of calculated distances: {condensed_index} < {len(pdist_vector)}, units that caused the assert error: {unit1} and {unit2}"
+        distance = pdist_vector[condensed_index]
         return distance
 
     def _distance_squared_unit_to_unit_method2(self, unit1: Unit, unit2: Unit) -> float:
@@ -176,7 +462,25 @@ class DistanceCalculation:
         if unit1.is_memory or unit2.is_memory:
             return self.distance_math_hypot_squared(unit1.position, unit2.position)
 
-        return self._cdist[self._get_index_of_two_units(unit1, unit2)]
+        index1, index2 = self._get_index_of_two_units(unit1, unit2)
+        if self._blocks_frame != self.state.game_loop:
+            self._prepare_distance_blocks()
+        block1, block2 = self._row_block[index1], self._row_block[index2]
+        if block1 > block2:
+            block1, block2, index1, index2 = block2, block1, index2, index1
+        return self._distance_block(block1, block2)[self._row_block_index[index1], self._row_block_index[index2]]
+
+    def _distance_squared_unit_to_unit_method5(self, unit1: Unit, unit2: Unit) -> float:
+        if unit1.is_memory or unit2.is_memory:
+            return self.distance_math_hypot_squared(unit1.position, unit2.position)
+
+        index1, index2 = self._get_index_of_two_units(unit1, unit2)
+        matrix = self._incremental_distances.matrix
+        return matrix[self._incremental_slots[index1], self._incremental_slots[index2]]
+
+    def _distance_squared_unit_to_unit_method4(self, unit1: Unit, unit2: Unit) -> float:
+        self._distance_queries += 1
+        return self._distance_mode_function(unit1, unit2)
 
     # Distance calculation using the fastest distance calculation functions
 
@@ -199,8 +503,16 @@ class DistanceCalculation:
         method 0: Use python's math.hypot
         The following methods calculate the distances between all units once:
         method 1: Use scipy's pdist condensed matrix (1d array)
-        method 2: Use scipy's cidst square matrix (2d array) """
-        assert 0 <= method <= 2, f"Selected method was: {method}"
+        method 2: Use scipy's cidst square matrix (2d array), split into blocks of friendly, enemy and neutral units.
+        Each block is calculated when the first distance between units of its two blocks is needed in a frame
+        method 3: Use a KD-tree (scipy's cKDTree) of all units, created once per frame. Distances between two units are calculated
+        with math.hypot, the Units functions closer_than, further_than, in_distance_between, closest_to, in_distance_of_group
+        and in_attack_range_of use range and nearest neighbour queries if the frame has at least SPATIAL_INDEX_MIN_UNITS units,
+        see spatial_index.py
+        method 4: Select method 2 (dense), 1 (condensed) or 0 (scalar) each frame, see self._select_distance_mode
+        method 5: Same square matrix as method 2, but it is kept across frames and only the rows of units that moved or appeared
+        are calculated again, see IncrementalDistanceMatrix """
+        assert 0 <= method <= 5, f"Selected method was: {method}"
         if method == 0:
             self._distance_squared_unit_to_unit = self._distance_squared_unit_to_unit_method0
         elif method == 1:
@@ -211,3 +523,12 @@ class DistanceCalculation:
             self._distance_squared_unit_to_unit = self._distance_squared_unit_to_unit_method2
             self.calculate_distances = self._calculate_distances_method2
             self._get_index_of_two_units = self._get_index_of_two_units_method2
+        elif method == 3:
+            self._distance_squared_unit_to_unit = self._distance_squared_unit_to_unit_method0
+            self.calculate_distances = self._calculate_distances_method3
+        elif method == 4:
+            self._distance_squared_unit_to_unit = self._distance_squared_unit_to_unit_method4
+        elif method == 5:
+            self._distance_squared_unit_to_unit = self._distance_squared_unit_to_unit_method5
+            self.calculate_distances = self._calculate_distances_method5
+            self._get_index_of_two_units = self._get_index_of_two_units_method2
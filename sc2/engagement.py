@@ -0,0 +1,144 @@
+from __future__ import annotations
+from typing import Dict, List, TYPE_CHECKING
+
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from .constants import UNIT_COLOSSUS
+
+if TYPE_CHECKING:
+    from .unit import Unit, UnitTypeRecord
+    from .units import Units
+
+
+class _AttackColumns:
+    """ Values of each unit of a Units object that are needed to find out what it can attack, as arrays.
+    The attack values are looked up once per unit type, see UnitTypeRecord. """
+
+    def __init__(self, units: Units):
+        type_index: Dict[int, int] = {}
+        records: List[UnitTypeRecord] = []
+        unit_type_indices = []
+        for unit in units:
+            record = unit._type_record
+            index = type_index.get(id(record))
+            if index is None:
+                index = type_index[id(record)] = len(records)
+                records.append(record)
+            unit_type_indices.append(index)
+        unit_type_indices = np.array(unit_type_indices, dtype=int)
+
+        # One value per unit type, then one value per unit
+        self.can_attack_ground = np.array([record.can_attack_ground for record in records], dtype=bool)[unit_type_indices]
+        self.can_attack_air = np.array([record.can_attack_air for record in records], dtype=bool)[unit_type_indices]
+        self.ground_range = np.array([record.ground_range for record in records], dtype=float)[unit_type_indices]
+        self.air_range = np.array([record.air_range for record in records], dtype=float)[unit_type_indices]
+        is_colossus = np.array([record.type_id == UNIT_COLOSSUS for record in records], dtype=bool)[unit_type_indices]
+
+        if units._table_indices is not None and units._frame_units.has_unit_table:
+            rows = units._frame_units.unit_table[units._table_indices]
+            self.radius = rows["radius"].astype(float)
+            self.is_flying = rows["is_flying"]
+        else:
+            self.radius = np.fromiter((unit.radius for unit in units), dtype=float, count=len(units))
+            self.is_flying = np.fromiter((unit.is_flying for unit in units), dtype=bool, count=len(units))
+        # Colossi can be attacked by anti air
+        self.air_target = self.is_flying | is_colossus
+
+
+def _in_attack_range(
+    attackers: _AttackColumns, targets: _AttackColumns, distances_squared: np.ndarray, bonus_distance: float
+) -> np.ndarray:
+    """ Returns a bool array of shape (len(attackers), len(targets)) that is True if the attacker has the target in range.
+    Same as Unit.target_in_range for all pairs. """
+    use_ground = attackers.can_attack_ground[:, None] & ~targets.is_flying[None, :]
+    use_air = ~use_ground & attackers.can_attack_air[:, None] & targets.air_target[None, :]
+    attack_range = np.where(use_ground, attackers.ground_range[:, None], attackers.air_range[:, None])
+    reach = attackers.radius[:, None] + targets.radius[None, :] + attack_range + bonus_distance
+    return (use_ground | use_air) & (distances_squared <= reach ** 2)
+
+
+def _subgroup(units: Units, indices: np.ndarray) -> Units:
+    """ Returns the units at 'indices', keeping their rows in the unit table if 'units' has them. """
+    subgroup = [units[index] for index in indices.tolist()]
+    if units._table_indices is not None:
+        return units._from_frame_units(subgroup, units._bot_object, units._frame_units, units._table_indices[indices])
+    return units.subgroup(subgroup)
+
+
+def _subgroup_of_each_row(units: Units, matrix: np.ndarray) -> List[Units]:
+    """ Returns the units at the True columns of each row of 'matrix'. """
+    if not len(matrix):
+        return []
+    rows, columns = np.nonzero(matrix)
+    row_starts = np.searchsorted(rows, np.arange(1, len(matrix)))
+    return [_subgroup(units, indices) for indices in np.split(columns, row_starts)]
+
+
+class EngagementMatrix:
+    """ Which units of two groups (usually two armies) have units of the other group in attack range, for all pairs at once.
+    Uses the same rules as Unit.target_in_range, but the ranges are looked up once per unit type and the distances
+    between both groups are calculated in one call. See Units.engagement_with and BotAI.engagement.
+
+    Example::
+
+        engagement = self.units.engagement_with(self.enemy_units)
+        for unit, targets in zip(engagement.units, engagement.targets_in_range_of_each()):
+            if targets:
+                self.do(unit.attack(targets.closest_to(unit)))
+        for unit in engagement.threatened_units():
+            # Can be attacked by at least one enemy unit
+            pass
+    """
+
+    def __init__(self, units: Units, other_units: Units, bonus_distance: float = 0):
+        """
+        :param units:
+        :param other_units:
+        :param bonus_distance: Added to the attack range of all units of both groups
+        """
+        self.units = units
+        self.other_units = other_units
+        if units and other_units:
+            distances_squared = cdist(units._distance_positions(), other_units._distance_positions(), "sqeuclidean")
+        else:
+            distances_squared = np.zeros((len(units), len(other_units)))
+        columns = _AttackColumns(units)
+        other_columns = _AttackColumns(other_units)
+        # in_range[i, j] is True if units[i] has other_units[j] in attack range
+        self.in_range: np.ndarray = _in_attack_range(columns, other_columns, distances_squared, bonus_distance)
+        # threatened[i, j] is True if other_units[j] has units[i] in attack range
+        self.threatened: np.ndarray = _in_attack_range(other_columns, columns, distances_squared.T, bonus_distance).T
+        self._unit_index: Dict[int, int] = {unit.tag: index for index, unit in enumerate(units)}
+
+    def targets_in_range(self, unit: Unit) -> Units:
+        """ Returns the units of the other group that 'unit' has in attack range. 'unit' has to be part of self.units
+
+        :param unit: """
+        return _subgroup(self.other_units, np.flatnonzero(self.in_range[self._unit_index[unit.tag]]))
+
+    def threatened_by(self, unit: Unit) -> Units:
+        """ Returns the units of the other group that have 'unit' in attack range. 'unit' has to be part of self.units
+
+        :param unit: """
+        return _subgroup(self.other_units, np.flatnonzero(self.threatened[self._unit_index[unit.tag]]))
+
+    def targets_in_range_of_each(self) -> List[Units]:
+        """ Returns self.targets_in_range for each unit, in the same order as self.units """
+        return _subgroup_of_each_row(self.other_units, self.in_range)
+
+    def threatened_by_each(self) -> List[Units]:
+        """ Returns self.threatened_by for each unit, in the same order as self.units """
+        return _subgroup_of_each_row(self.other_units, self.threatened)
+
+    def units_with_targets(self) -> Units:
+        """ Returns the units that have at least one unit of the other group in attack range. """
+        return _subgroup(self.units, np.flatnonzero(self.in_range.any(axis=1)))
+
+    def threatened_units(self) -> Units:
+        """ Returns the units that are in attack range of at least one unit of the other group. """
+        return _subgroup(self.units, np.flatnonzero(self.threatened.any(axis=1)))
+
+    def attacked_units(self) -> Units:
+        """ Returns the units of the other group that are in attack range of at least one unit of this group. """
+        return _subgroup(self.other_units, np.flatnonzero(self.in_range.any(axis=0)))
@@ -0,0 +1,244 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from .game_state import Blip
+from .unit import Unit
+from .unit_registry import TRACKED_DTYPE
+from .unit_table import UNIT_TABLE_DTYPE, unit_states, unit_table_row
+from .units import Units
+
+if TYPE_CHECKING:
+    from .bot_ai import BotAI
+
+
+class FrameUnits:
+    """ The units of one frame, created by BotAI._prepare_units.
+    Unit objects and the Units objects of the bot (self.units, self.mineral_field, ...) are only created
+    the first time they are accessed in that frame, unless self.materialize() is called.
+    The unit table (see self.unit_table) is only created when it is first used. """
+
+    def __init__(
+        self,
+        bot_object: BotAI,
+        protos: List,
+        type_ids: List[int],
+        alliances: List[int],
+        is_structure: List[bool],
+        category_indices: Dict[str, List[int]],
+        blip_protos: List,
+    ):
+        """
+        :param bot_object:
+        :param protos: Raw units without blips and fake effects
+        :param type_ids: Unit type of each unit in protos
+        :param alliances: Alliance of each unit in protos
+        :param is_structure: If each unit in protos is a structure
+        :param category_indices: Indices of the units in protos for each Units attribute of the bot
+            e.g. "mineral_field"
+        :param blip_protos: Raw units that are blips
+        """
+        self._bot_object = bot_object
+        self._protos = protos
+        self._type_id_list = type_ids
+        self._alliance_list = alliances
+        self._is_structure_list = is_structure
+        self._unit_objects: List[Optional[Unit]] = [None] * len(protos)
+        self._category_indices = category_indices
+        self._blip_protos = blip_protos
+        self._categories: Dict[str, Units] = {}
+        self._blips: Set[Blip] = None
+        self._unit_table: Optional[np.ndarray] = None
+        # Calculated when they are first needed, see the properties of the same name
+        self._type_ids: Optional[np.ndarray] = None
+        self._alliance: Optional[np.ndarray] = None
+        self._is_structure: Optional[np.ndarray] = None
+        self._tags: Optional[np.ndarray] = None
+        self._positions: Optional[np.ndarray] = None
+        self._snapshot_indices: Optional[Set[int]] = None
+
+    @classmethod
+    def empty(cls, bot_object: BotAI, categories) -> FrameUnits:
+        return cls(bot_object, [], [], [], [], {name: [] for name in categories}, [])
+
+    def __len__(self) -> int:
+        return len(self._protos)
+
+    def unit(self, index: int) -> Unit:
+        """ Returns the Unit object of row 'index' of the unit table. """
+        unit = self._unit_objects[index]
+        if unit is None:
+            unit = Unit._from_frame(self._protos[index], self._bot_object, self._type_id_list[index])
+            if self._alliance_list[index] == 4 and index in self.snapshot_indices:
+                unit.is_calculated_snapshot = True
+            self._unit_objects[index] = unit
+        return unit
+
+    def category(self, name: str) -> Units:
+        """ Returns the Units object of a bot attribute, e.g. "all_units" or "mineral_field". """
+        units = self._categories.get(name)
+        if units is None:
+            if name == "all_units":
+                indices = range(len(self._protos))
+            else:
+                indices = self._category_indices[name]
+            unit = self.unit
+            units = Units._from_frame_units(
+                [unit(index) for index in indices], self._bot_object, self, np.array(indices, dtype=int)
+            )
+            self._categories[name] = units
+        return units
+
+    def set_category(self, name: str, units: Units):
+        self._categories[name] = units
+
+    @property
+    def blips(self) -> Set[Blip]:
+        if self._blips is None:
+            self._blips = {Blip(proto) for proto in self._blip_protos}
+        return self._blips
+
+    @blips.setter
+    def blips(self, blips: Set[Blip]):
+        self._blips = blips
+
+    def materialize(self):
+        """ Creates all Unit objects, Units objects and blips. """
+        bot_object = self._bot_object
+        from_frame = Unit._from_frame
+        self._unit_objects = unit_objects = [
+            from_frame(proto, bot_object, unit_type) for proto, unit_type in zip(self._protos, self._type_id_list)
+        ]
+        for index in self.snapshot_indices:
+            unit_objects[index].is_calculated_snapshot = True
+        self.category("all_units")
+        for name in self._category_indices:
+            self.category(name)
+        _ = self.blips
+
+    @property
+    def has_unit_table(self) -> bool:
+        """ If the unit table of this frame was already created. """
+        return self._unit_table is not None
+
+    @property
+    def unit_table(self) -> np.ndarray:
+        """ The unit table of this frame, see BotAI.unit_table. Created from the protos the first time it is used. """
+        if self._unit_table is None:
+            unit_table = np.array(
+                [
+                    unit_table_row(proto, is_structure)
+                    for proto, is_structure in zip(self._protos, self._is_structure_list)
+                ],
+                dtype=UNIT_TABLE_DTYPE,
+            )
+            unit_table["state"] = unit_states(unit_table, self._bot_object._order_state)
+            self._unit_table = unit_table
+        return self._unit_table
+
+    @property
+    def type_ids(self) -> np.ndarray:
+        """ The unit type of each row of the unit table, available without creating the table. """
+        if self._type_ids is None:
+            self._type_ids = np.array(self._type_id_list, dtype=np.uint32)
+        return self._type_ids
+
+    @property
+    def alliance(self) -> np.ndarray:
+        """ The alliance of each row of the unit table, available without creating the table. """
+        if self._alliance is None:
+            self._alliance = np.array(self._alliance_list, dtype=np.uint8)
+        return self._alliance
+
+    @property
+    def is_structure(self) -> np.ndarray:
+        """ If the unit of each row of the unit table is a structure, available without creating the table. """
+        if self._is_structure is None:
+            self._is_structure = np.array(self._is_structure_list, dtype=bool)
+        return self._is_structure
+
+    @property
+    def tags(self) -> np.ndarray:
+        """ The tag of each row of the unit table. Taken from the table or the Unit objects if they exist,
+        otherwise read from the protos. """
+        if self._tags is None:
+            if self._unit_table is not None:
+                tags = self._unit_table["tag"]
+            else:
+                unit_objects = self._unit_objects
+                tags = np.array(
+                    [
+                        proto.tag if unit is None else unit.tag
+                        for proto, unit in zip(self._protos, unit_objects)
+                    ],
+                    dtype=np.uint64,
+                )
+            self._tags = tags
+        return self._tags
+
+    @property
+    def positions(self) -> np.ndarray:
+        """ The 2d position of each row of the unit table as read-only array of shape (n, 2). Taken from the table
+        or the Unit objects if they exist, otherwise read from the protos. """
+        if self._positions is None:
+            if self._unit_table is not None:
+                positions = np.column_stack((self._unit_table["x"], self._unit_table["y"])).astype(float)
+            else:
+                positions = np.array(
+                    [self._position(index) for index in range(len(self._protos))], dtype=float
+                ).reshape((len(self._protos), 2))
+            positions.flags.writeable = False
+            self._positions = positions
+        return self._positions
+
+    def _position(self, index: int) -> Tuple[float, float]:
+        unit = self._unit_objects[index]
+        if unit is not None:
+            return unit.position
+        pos = self._protos[index].pos
+        return pos.x, pos.y
+
+    @property
+    def snapshot_indices(self) -> Set[int]:
+        """ Indices of the enemy units that are in the fog of war, see Unit.is_calculated_snapshot.
+        Found with one lookup in the visibility map for all enemy units. """
+        if self._snapshot_indices is None:
+            enemy_units = self._category_indices.get("enemy_units")
+            if not enemy_units:
+                self._snapshot_indices = set()
+            else:
+                if self._positions is not None or self._unit_table is not None:
+                    positions = self.positions[enemy_units]
+                else:
+                    positions = np.array([self._position(index) for index in enemy_units], dtype=float)
+                in_fog = self._bot_object.state.visibility.values_at(positions) != 2
+                self._snapshot_indices = set(np.array(enemy_units)[in_fog].tolist())
+        return self._snapshot_indices
+
+    def tracked_units(self) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """ Returns the values of the own and enemy units that BotAI.unit_registry needs, and the row in the unit table
+        of each of them. If the unit table was not created yet, only the values of these units are read from the protos.
+        The rows are None if the unit table itself is returned. """
+        if self._unit_table is not None:
+            return self._unit_table, None
+        alliances = self._alliance_list
+        # Alliance.Self.value = 1, Alliance.Enemy.value = 4
+        rows = [index for index, alliance in enumerate(alliances) if alliance == 1 or alliance == 4]
+        protos = self._protos
+        is_structure = self._is_structure_list
+        tracked = np.array(
+            [
+                (
+                    protos[index].tag,
+                    alliances[index],
+                    is_structure[index],
+                    protos[index].health,
+                    protos[index].shield,
+                    protos[index].build_progress,
+                )
+                for index in rows
+            ],
+            dtype=TRACKED_DTYPE,
+        )
+        return tracked, np.array(rows, dtype=int)
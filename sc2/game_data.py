@@ -9,6 +9,9 @@ from .ids.ability_id import AbilityId
 from .ids.unit_typeid import UnitTypeId
 from .unit_command import UnitCommand
 
+if TYPE_CHECKING:
+    from .unit import UnitTypeRecord
+
 # Set of parts of names of abilities that have no cost
 # E.g every ability that has 'Hold' in its name is free
 # TODO move to constants, add more?
@@ -25,7 +28,12 @@ class GameData:
         self.units = {u.unit_id: UnitTypeData(self, u) for u in data.units if u.available}
         self.upgrades = {u.upgrade_id: UpgradeData(self, u) for u in data.upgrades}
         # Cached UnitTypeIds so that conversion does not take long. This needs to be moved elsewhere if a new GameData object is created multiple times per game
+        # Filled together with self.unit_type_records, see UnitTypeRecord.get
         self.unit_types: Dict[int, UnitTypeId] = {}
+        # Values shared by all units of the same unit type, see UnitTypeRecord in unit.py
+        self.unit_type_records: Dict[int, UnitTypeRecord] = {}
+        # STATE_GATHERING or STATE_RETURNING for the ability id of a first order, see BotAI._order_state
+        self.order_states: Dict[int, int] = {}
 
     @lru_cache(maxsize=256)
     def calculate_ability_cost(self, ability) -> Cost:
@@ -1,6 +1,7 @@
 from __future__ import annotations
 from typing import Any, Dict, List, Optional, Set, Tuple, Union, TYPE_CHECKING
 
+from .cache import property_immutable_cache
 from .constants import FakeEffectID, FakeEffectRadii
 from .data import Alliance, DisplayType
 from .ids.effect_id import EffectId
@@ -124,6 +125,9 @@ class EffectData:
 class GameState:
     def __init__(self, response_observation):
         """
+        The attributes that need to convert data of the observation (e.g. self.visibility, self.effects) are only
+        created when they are accessed for the first time.
+
         :param response_observation:
         """
         self.response_observation = response_observation
@@ -137,28 +141,56 @@ class GameState:
         self.player_result = response_observation.player_result
         self.chat = response_observation.chat
         self.common: Common = Common(self.observation.player_common)
-
-        # Area covered by Pylons and Warpprisms
-        self.psionic_matrix: PsionicMatrix = PsionicMatrix.from_proto(self.observation_raw.player.power_sources)
         self.game_loop: int = self.observation.game_loop  # 22.4 per second on faster game speed
-
-        # https://github.com/Blizzard/s2client-proto/blob/33f0ecf615aa06ca845ffe4739ef3133f37265a9/s2clientprotocol/score.proto#L31
-        self.score: ScoreDetails = ScoreDetails(self.observation.score)
         self.abilities = self.observation.abilities  # abilities of selected units
-        self.upgrades: Set[UpgradeId] = {UpgradeId(upgrade) for upgrade in self.observation_raw.player.upgrade_ids}
-
-        # Set of unit tags that died this step
-        self.dead_units: Set[int] = {dead_unit_tag for dead_unit_tag in self.observation_raw.event.dead_units}
-        # self.visibility[point]: 0=Hidden, 1=Fogged, 2=Visible
-        self.visibility: PixelMap = PixelMap(self.observation_raw.map_state.visibility, mirrored=False)
-        # self.creep[point]: 0=No creep, 1=creep
-        self.creep: PixelMap = PixelMap(self.observation_raw.map_state.creep, in_bits=True, mirrored=False)
-
-        # Effects like ravager bile shot, lurker attack, everything in effect_id.py
-        self.effects: Set[EffectData] = {EffectData(effect) for effect in self.observation_raw.effects}
-        """ Usage:
+        # Raw units that are converted to effects, set by BotAI._prepare_units so self.effects doesn't need to search them
+        self._fake_effect_units: Optional[List] = None
+        # Used by property_immutable_cache
+        self.cache = {}
+
+    @property_immutable_cache
+    def psionic_matrix(self) -> PsionicMatrix:
+        """ Area covered by Pylons and Warpprisms """
+        return PsionicMatrix.from_proto(self.observation_raw.player.power_sources)
+
+    @property_immutable_cache
+    def score(self) -> ScoreDetails:
+        """ https://github.com/Blizzard/s2client-proto/blob/33f0ecf615aa06ca845ffe4739ef3133f37265a9/s2clientprotocol/score.proto#L31 """
+        return ScoreDetails(self.observation.score)
+
+    @property_immutable_cache
+    def upgrades(self) -> Set[UpgradeId]:
+        """ Set of completed upgrades """
+        return {UpgradeId(upgrade) for upgrade in self.observation_raw.player.upgrade_ids}
+
+    @property_immutable_cache
+    def dead_units(self) -> Set[int]:
+        """ Set of unit tags that died this step """
+        return set(self.observation_raw.event.dead_units)
+
+    @property_immutable_cache
+    def visibility(self) -> PixelMap:
+        """ self.visibility[point]: 0=Hidden, 1=Fogged, 2=Visible """
+        return PixelMap(self.observation_raw.map_state.visibility, mirrored=False)
+
+    @property_immutable_cache
+    def creep(self) -> PixelMap:
+        """ self.creep[point]: 0=No creep, 1=creep """
+        return PixelMap(self.observation_raw.map_state.creep, in_bits=True, mirrored=False)
+
+    @property_immutable_cache
+    def effects(self) -> Set[EffectData]:
+        """ Effects like ravager bile shot, lurker attack, everything in effect_id.py
+        Also contains the units that are converted to effects: reaper grenade, parasitic bomb dummy, forcefield
+        Usage:
         for effect in self.state.effects:
             if effect.id == EffectId.RAVAGERCORROSIVEBILECP:
                 positions = effect.positions
                 # dodge the ravager biles
         """
+        effects = {EffectData(effect) for effect in self.observation_raw.effects}
+        fake_effect_units = self._fake_effect_units
+        if fake_effect_units is None:
+            fake_effect_units = (unit for unit in self.observation_raw.units if unit.unit_type in FakeEffectID)
+        effects.update(EffectData(unit, fake=True) for unit in fake_effect_units)
+        return effects
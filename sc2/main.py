@@ -45,6 +45,26 @@ class SlidingTimeWindow:
         return ",".join(f"{w:.2f}" for w in self.window[1:])
 
 
+async def _update_pathing_grid(client, ai):
+    """ Requests the game info to update the pathing grid, only if the bot wants a new one this step. """
+    if ai._should_update_pathing_grid():
+        request_start = time.perf_counter()
+        proto_game_info = await client._execute(game_info=sc_pb.RequestGameInfo())
+        ai._update_pathing_grid(proto_game_info, time.perf_counter() - request_start)
+
+
+async def _after_step(client, ai, pipelined: bool):
+    """ Sends the actions and debug drawings of the step.
+    If pipelined, they are only collected and sent together with the next step and observation requests. """
+    if pipelined:
+        client._start_pipeline()
+    try:
+        await ai._after_step()
+    except Exception:
+        client._pipeline = None
+        raise
+
+
 async def _play_game_human(client, player_id, realtime, game_time_limit):
     while True:
         state = await client.observation()
@@ -119,14 +139,25 @@ async def _play_game_ai(client, player_id, ai, realtime, step_time_limit, game_t
         await ai.on_end(Result.Defeat)
         return Result.Defeat
 
+    # Send the requests at the end of a step (actions, debug, step, observation and game info) without waiting for each response
+    pipelined = ai.pipeline_requests and not realtime
+    # Responses that were already received with the step request if pipelined
+    next_state = None
+    next_proto_game_info = None
     iteration = 0
+    observation_received_time = time.perf_counter()
     while True:
         if iteration != 0:
             if realtime:
                 # TODO: check what happens if a bot takes too long to respond, so that the requested game_loop might already be in the past
                 state = await client.observation(gs.game_loop + client.game_step)
+            elif next_state is not None:
+                state = next_state
             else:
                 state = await client.observation()
+            # Time of a whole step, from observation to observation
+            ai._record_step_wall_time(time.perf_counter() - observation_received_time)
+            observation_received_time = time.perf_counter()
             # check game result every time we get the observation
             if client._game_result:
                 try:
@@ -142,8 +173,9 @@ async def _play_game_ai(client, player_id, ai, realtime, step_time_limit, game_t
             if game_time_limit and (gs.game_loop * 0.725 * (1 / 16)) > game_time_limit:
                 await ai.on_end(Result.Tie)
                 return Result.Tie
-            proto_game_info = await client._execute(game_info=sc_pb.RequestGameInfo())
-            ai._prepare_step(gs, proto_game_info)
+            ai._prepare_step(gs, next_proto_game_info)
+            if next_proto_game_info is None:
+                await _update_pathing_grid(client, ai)
 
         logger.debug(f"Running AI step, it={iteration} {gs.game_loop * 0.725 * (1 / 16):.2f}s")
 
@@ -162,7 +194,7 @@ async def _play_game_ai(client, player_id, ai, realtime, step_time_limit, game_t
                     # Issue event like unit created or unit destroyed
                     await ai.issue_events()
                     await ai.on_step(iteration)
-                    await ai._after_step()
+                    await _after_step(client, ai, pipelined)
                 else:
                     out_of_budget = False
                     budget = time_limit - time_window.available
@@ -199,7 +231,14 @@ async def _play_game_ai(client, player_id, ai, realtime, step_time_limit, game_t
                             time_penalty_cooldown = int(time_penalty)
                             time_window.clear()
 
-                    await ai._after_step()
+                    await _after_step(client, ai, pipelined)
+
+            if pipelined and client.in_game:
+                # Sends the actions and debug drawings of this step, so their errors are handled below
+                # The pathing grid is only requested in advance if the bot wants a new one every step
+                next_state, next_proto_game_info = await client._step_and_observation(
+                    game_info=ai.pathing_grid_update_interval == 0
+                )
         except Exception as e:
             if isinstance(e, ProtocolError) and e.is_game_over_error:
                 if realtime:
@@ -226,10 +265,12 @@ async def _play_game_ai(client, player_id, ai, realtime, step_time_limit, game_t
 
         if not realtime:
             if not client.in_game:  # Client left (resigned) the game
+                client._pipeline = None
                 await ai.on_end(client._game_result[player_id])
                 return client._game_result[player_id]
 
-            await client.step()
+            if not pipelined:
+                await client.step()
 
         iteration += 1
 
@@ -250,6 +291,11 @@ async def _play_game(
         result = await _play_game_ai(client, player_id, player.ai, realtime, step_time_limit, game_time_limit)
 
     logging.info(f"Result for player {player_id} - {player.name if player.name else str(player)}: {result._name_}")
+    if not isinstance(player, Human):
+        logging.info(
+            f"Average step wall time for player {player_id}: {player.ai.step_wall_time[0]:.2f} ms "
+            f"(pipelined requests: {player.ai.pipeline_requests})"
+        )
 
     return result
 
@@ -300,8 +346,8 @@ async def _play_replay(client, ai, realtime=False, player_id=0):
             gs = GameState(state.observation)
             logger.debug(f"Score: {gs.score.score}")
 
-            proto_game_info = await client._execute(game_info=sc_pb.RequestGameInfo())
-            ai._prepare_step(gs, proto_game_info)
+            ai._prepare_step(gs)
+            await _update_pathing_grid(client, ai)
 
         logger.debug(f"Running AI step, it={iteration} {gs.game_loop * 0.725 * (1 / 16):.2f}s")
 
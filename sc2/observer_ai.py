@@ -34,6 +34,9 @@ class ObserverAI(DistanceCalculation):
         # Specific opponent bot ID used in sc2ai ladder games http://sc2ai.net/
         # The bot ID will stay the same each game so your bot can "adapt" to the opponent
         self.opponent_id: int = None
+        # Select distance calculation method, see distances.py: _distances_override_functions function
+        if not hasattr(self, "distance_calculation_method"):
+            self.distance_calculation_method: int = 2
         # This value will be set to True by main.py in self._prepare_start if game is played in realtime (if true, the bot will have limited time per step)
         self.realtime: bool = False
         self.all_units: Units = Units([], self)
@@ -171,7 +174,7 @@ class ObserverAI(DistanceCalculation):
         :param ignore_resource_requirements: """
         return await self._client.query_available_abilities(units, ignore_resource_requirements)
 
-    @property_cache_once_per_frame
+    @property_cache_once_per_frame(frozen=True)
     def _abilities_all_units(self) -> Counter:
         """ Cache for the already_pending function, includes protoss units warping in,
         all units in production and all structures, and all morphs """
@@ -202,6 +205,7 @@ class ObserverAI(DistanceCalculation):
         self._game_info: GameInfo = game_info
         self._game_data: GameData = game_data
         self.realtime: bool = realtime
+        self._distances_override_functions(self.distance_calculation_method)
 
     def _prepare_first_step(self):
         """First step extra preparations. Must not be called before _prepare_step."""
@@ -209,7 +213,7 @@ class ObserverAI(DistanceCalculation):
             self._game_info.player_start_location = self.townhalls.first.position
         self._game_info.map_ramps, self._game_info.vision_blockers = self._game_info._find_ramps_and_vision_blockers()
 
-    def _prepare_step(self, state, proto_game_info):
+    def _prepare_step(self, state, proto_game_info=None):
         """
         :param state:
         :param proto_game_info:
@@ -224,6 +228,10 @@ class ObserverAI(DistanceCalculation):
 
         self._prepare_units()
 
+    def _should_update_pathing_grid(self) -> bool:
+        """ The observer does not use the pathing grid, so main.py never has to request it. """
+        return False
+
     def _prepare_units(self):
         # Set of enemy units detected by own sensor tower, as blips have less unit information than normal visible units
         self.blips: Set[Blip] = set()
@@ -252,6 +260,8 @@ class ObserverAI(DistanceCalculation):
                 # Convert these units to effects: reaper grenade, parasitic bomb dummy, forcefield
                 unit_obj = Unit(unit, self)
                 self.units.append(unit_obj)
+                self.all_units.append(unit_obj)
+        self._prepare_distances()
 
     async def _after_step(self) -> int:
         """ Executed by main.py after each on_step function. """
@@ -5,6 +5,10 @@ import numpy as np
 from .position import Point2
 
 
+# Number of set bits of each byte
+POPCOUNT_OF_BYTE: np.ndarray = np.unpackbits(np.arange(256, dtype=np.uint8)[:, np.newaxis], axis=1).sum(axis=1)
+
+
 class PixelMap:
     def __init__(self, proto, in_bits: bool = False, mirrored: bool = False):
         """
@@ -27,6 +31,27 @@ class PixelMap:
         if mirrored:
             self.data_numpy = np.flipud(self.data_numpy)
 
+    @property
+    def packed(self) -> np.ndarray:
+        """ The data as received from the game without unpacking, for maps with 1 bit per pixel.
+        Each byte contains 8 pixels, the first pixel in the highest bit. Changes made to the map are not included. """
+        assert self._in_bits, "Only maps with 1 bit per pixel are packed"
+        return np.frombuffer(self._proto.data, dtype=np.uint8)
+
+    @property
+    def mask(self) -> np.ndarray:
+        """ Boolean view of the data of a map with 1 bit per pixel, without copying it.
+        Only valid while all values are 0 or 1. """
+        assert self._in_bits, "Only maps with 1 bit per pixel can be viewed as boolean mask"
+        return self.data_numpy.view(np.bool_)
+
+    def count_set(self) -> int:
+        """ Returns the number of pixels that are not zero.
+        For maps with 1 bit per pixel this counts the set bits of the proto data, so changes made to the map are not included. """
+        if self._in_bits:
+            return int(POPCOUNT_OF_BYTE[self.packed].sum(dtype=np.int64))
+        return int(np.count_nonzero(self.data_numpy))
+
     @property
     def width(self):
         return self._proto.size.x
@@ -57,6 +82,18 @@ class PixelMap:
         assert isinstance(value, int), f"value is of type {type(value)}, it should be an integer"
         self.data_numpy[pos[1], pos[0]] = value
 
+    def values_at(self, positions: np.ndarray) -> np.ndarray:
+        """ Returns the values at many positions at once, same as self[position.rounded] for each position.
+        Example usage: in_vision = self.state.visibility.values_at(positions) == 2
+
+        :param positions: Array of shape (n, 2) with the x and y coordinates """
+        positions = np.asarray(positions)
+        xs = np.floor(positions[:, 0]).astype(int)
+        ys = np.floor(positions[:, 1]).astype(int)
+        assert len(xs) == 0 or 0 <= xs.min() and xs.max() < self.width, f"x is not between 0 and {self.width}"
+        assert len(ys) == 0 or 0 <= ys.min() and ys.max() < self.height, f"y is not between 0 and {self.height}"
+        return self.data_numpy[ys, xs]
+
     def is_set(self, p):
         return self[p] != 0
 
@@ -64,7 +101,13 @@ class PixelMap:
         return not self.is_set(p)
 
     def copy(self):
-        return PixelMap(self._proto, in_bits=self._in_bits, mirrored=self._mirrored)
+        """ Returns a copy that has its own data array, without parsing the proto again. """
+        pixel_map = PixelMap.__new__(PixelMap)
+        pixel_map._proto = self._proto
+        pixel_map._in_bits = self._in_bits
+        pixel_map._mirrored = self._mirrored
+        pixel_map.data_numpy = self.data_numpy.copy()
+        return pixel_map
 
     def flood_fill(self, start_point: Point2, pred: Callable[[int], bool]) -> Set[Point2]:
         nodes: Set[Point2] = set()
@@ -2,6 +2,7 @@ import asyncio
 
 import logging
 import sys
+from typing import List, Optional
 
 from s2clientprotocol import sc2api_pb2 as sc_pb
 
@@ -28,8 +29,14 @@ class Protocol:
         assert ws
         self._ws = ws
         self._status = None
+        # Requests that are collected to be sent together, see self._start_pipeline
+        self._pipeline: Optional[List[sc_pb.Request]] = None
 
     async def __request(self, request):
+        await self.__send(request)
+        return await self.__receive()
+
+    async def __send(self, request):
         logger.debug(f"Sending request: {request !r}")
         try:
             await self._ws.send_bytes(request.SerializeToString())
@@ -38,6 +45,7 @@ class Protocol:
             raise ConnectionAlreadyClosed("Connection already closed.")
         logger.debug(f"Request sent")
 
+    async def __receive(self):
         response = sc_pb.Response()
         try:
             response_bytes = await self._ws.receive_bytes()
@@ -59,13 +67,7 @@ class Protocol:
         logger.debug(f"Response received")
         return response
 
-    async def _execute(self, **kwargs):
-        assert len(kwargs) == 1, "Only one request allowed"
-
-        request = sc_pb.Request(**kwargs)
-
-        response = await self.__request(request)
-
+    def _handle_response(self, response):
         new_status = Status(response.status)
         if new_status != self._status:
             logger.info(f"Client status changed to {new_status} (was {self._status})")
@@ -75,8 +77,50 @@ class Protocol:
             logger.debug(f"Response contained an error: {response.error}")
             raise ProtocolError(f"{response.error}")
 
+    async def _execute(self, **kwargs):
+        assert len(kwargs) == 1, "Only one request allowed"
+
+        request = sc_pb.Request(**kwargs)
+
+        if self._pipeline is not None:
+            # Sent later by self._execute_pipeline, the response is not returned
+            self._pipeline.append(request)
+            return None
+
+        response = await self.__request(request)
+        self._handle_response(response)
         return response
 
+    def _start_pipeline(self):
+        """ From now on, self._execute only collects the requests instead of sending them, until self._execute_pipeline is called.
+        Only use this for requests whose responses are not needed, e.g. actions and debug drawings at the end of a step. """
+        self._pipeline = []
+
+    async def _send_pipeline(self, *requests: sc_pb.Request) -> List[sc_pb.Response]:
+        """ Sends the collected requests and 'requests' back to back without waiting for the responses,
+        then receives all responses in the same order. This takes about one round trip instead of one per request.
+        Returns the responses of all requests, the collected ones first. The responses are not checked for errors.
+
+        :param requests: """
+        collected = self._pipeline or []
+        self._pipeline = None
+        all_requests = collected + list(requests)
+        for request in all_requests:
+            await self.__send(request)
+        return [await self.__receive() for _ in all_requests]
+
+    async def _execute_pipeline(self, *requests: sc_pb.Request) -> List[sc_pb.Response]:
+        """ Same as self._send_pipeline, but raises a ProtocolError if a response contains an error.
+        Returns the responses of 'requests'.
+
+        :param requests: """
+        collected_count = len(self._pipeline or [])
+        responses = await self._send_pipeline(*requests)
+        # Receive all responses before raising an error, so the next request gets its own response
+        for response in responses:
+            self._handle_response(response)
+        return responses[collected_count:]
+
     async def ping(self):
         result = await self._execute(ping=sc_pb.RequestPing())
         return result
@@ -0,0 +1,125 @@
+from __future__ import annotations
+from typing import Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Neighbours that are looked at first by SpatialIndex.closest before falling back to all rows
+CLOSEST_CANDIDATES: int = 16
+# Frames with fewer units are queried without the index, see Units._spatial_index_rows.
+# Each query has a fixed overhead of about 25 us, so with 100 range queries per frame the index is only faster
+# than a cdist matrix from about 1000 units on, see test/benchmark_spatial_index.py
+SPATIAL_INDEX_MIN_UNITS: int = 1000
+
+
+class SpatialIndex:
+    """ KD-tree over the positions of all units of a frame, created once per frame if distance_calculation_method 3 is used,
+    see distances.py. Answers range and nearest neighbour queries for Units objects, which are given as rows of the unit table.
+    The results are the same as comparing the squared distances of all units, but only the units near the queried position
+    need to be compared. """
+
+    def __init__(self, positions: np.ndarray):
+        """
+        :param positions: Array of shape (n, 2) with the position of each row of the unit table
+        """
+        self.positions = positions
+        self._tree = cKDTree(positions) if len(positions) else None
+        # One value per row, only True while a query runs. Reused so queries don't allocate an array over all rows
+        self._marked = np.zeros(len(positions), dtype=bool)
+
+    def _squared_distances(self, rows: np.ndarray, point: Tuple[float, float]) -> np.ndarray:
+        difference = self.positions[rows] - point
+        return np.einsum("ij,ij->i", difference, difference)
+
+    def _ball(self, point: Tuple[float, float], distance: float) -> np.ndarray:
+        """ Returns the rows that are at most 'distance' away from 'point'. """
+        if self._tree is None or distance < 0:
+            return np.empty(0, dtype=np.intp)
+        return np.array(self._tree.query_ball_point(point, distance), dtype=np.intp)
+
+    def _mask_of(self, rows: np.ndarray, found: np.ndarray) -> np.ndarray:
+        """ Returns a mask over 'rows' that is True for the rows that are in 'found'.
+        Takes time proportional to the length of both arrays, not to the amount of all rows. """
+        marked = self._marked
+        marked[found] = True
+        mask = marked[rows]
+        marked[found] = False
+        return mask
+
+    def candidates(self, rows: np.ndarray, point: Tuple[float, float], distance: float) -> np.ndarray:
+        """ Returns a mask over 'rows' that is True for the rows that are at most 'distance' away from 'point',
+        and possibly for rows that are exactly 'distance' away.
+
+        :param rows:
+        :param point:
+        :param distance: """
+        return self._mask_of(rows, self._ball(point, distance))
+
+    def closer_than(self, rows: np.ndarray, point: Tuple[float, float], distance: float) -> np.ndarray:
+        """ Returns a mask over 'rows' that is True for the rows that are closer than 'distance' to 'point'.
+
+        :param rows:
+        :param point:
+        :param distance: """
+        mask = self._mask_of(rows, self._ball(point, distance))
+        found = np.flatnonzero(mask)
+        mask[found] = self._squared_distances(rows[found], point) < distance ** 2
+        return mask
+
+    def further_than(self, rows: np.ndarray, point: Tuple[float, float], distance: float) -> np.ndarray:
+        """ Returns a mask over 'rows' that is True for the rows that are further than 'distance' away from 'point'.
+
+        :param rows:
+        :param point:
+        :param distance: """
+        mask = ~self._mask_of(rows, self._ball(point, distance))
+        near = np.flatnonzero(~mask)
+        mask[near] = distance ** 2 < self._squared_distances(rows[near], point)
+        return mask
+
+    def in_distance_between(
+        self, rows: np.ndarray, point: Tuple[float, float], distance1: float, distance2: float
+    ) -> np.ndarray:
+        """ Returns a mask over 'rows' that is True for the rows that are further than distance1 and closer than distance2 to 'point'.
+
+        :param rows:
+        :param point:
+        :param distance1:
+        :param distance2: """
+        mask = self._mask_of(rows, self._ball(point, distance2))
+        found = np.flatnonzero(mask)
+        distances_squared = self._squared_distances(rows[found], point)
+        mask[found] = (distance1 ** 2 < distances_squared) & (distances_squared < distance2 ** 2)
+        return mask
+
+    def closest(self, rows: np.ndarray, point: Tuple[float, float]) -> int:
+        """ Returns the index in 'rows' of the row that is closest to 'point'. If several rows have the same distance, the first one is returned.
+
+        :param rows:
+        :param point: """
+        assert len(rows), "No rows given"
+        k = min(CLOSEST_CANDIDATES, len(self.positions))
+        distances, neighbours = self._tree.query(point, k=k)
+        distances, neighbours = np.atleast_1d(distances), np.atleast_1d(neighbours)
+        marked = self._marked
+        marked[rows] = True
+        hits = np.flatnonzero(marked[neighbours])
+        marked[rows] = False
+        if len(hits):
+            # All rows that are not in the result are further away, but rows with the same distance might be missing
+            candidates = np.flatnonzero(self.candidates(rows, point, distances[hits[0]] * (1 + 1e-9) + 1e-9))
+        else:
+            candidates = np.arange(len(rows))
+        return int(candidates[np.argmin(self._squared_distances(rows[candidates], point))])
+
+    def in_distance_of_group(self, rows: np.ndarray, other_rows: np.ndarray, distance: float) -> np.ndarray:
+        """ Returns a mask over 'rows' that is True for the rows that are closer than 'distance' to any of 'other_rows'.
+
+        :param rows:
+        :param other_rows:
+        :param distance: """
+        if not len(rows) or not len(other_rows):
+            return np.zeros(len(rows), dtype=bool)
+        other_tree = cKDTree(self.positions[other_rows])
+        nearest_distances, _ = other_tree.query(self.positions[rows], distance_upper_bound=distance)
+        return nearest_distances < distance
@@ -62,7 +62,7 @@ warnings.simplefilter("once")
 
 if TYPE_CHECKING:
     from .bot_ai import BotAI
-    from .game_data import AbilityData
+    from .game_data import AbilityData, UnitTypeData
 
 
 class UnitOrder:
@@ -88,8 +88,114 @@ class UnitOrder:
         return f"UnitOrder({self.ability}, {self.target}, {self.progress})"
 
 
+class UnitTypeRecord:
+    """ Values of a unit type that are the same for all units of that type.
+    Created once per unit type, see UnitTypeRecord.get, and shared by all Unit objects of that type. """
+
+    __slots__ = (
+        "type_id",
+        "type_data",
+        "weapons",
+        "is_structure",
+        "can_attack",
+        "can_attack_both",
+        "can_attack_ground",
+        "ground_dps",
+        "ground_range",
+        "can_attack_air",
+        "air_dps",
+        "air_range",
+        "bonus_damage",
+    )
+
+    @classmethod
+    def get(cls, unit_type: int, bot_object: BotAI) -> UnitTypeRecord:
+        """ Returns the record of 'unit_type', cached in the game data of the bot. """
+        records = bot_object._game_data.unit_type_records
+        record = records.get(unit_type)
+        if record is None:
+            game_data = bot_object._game_data
+            record = records[unit_type] = cls(unit_type, game_data.units.get(unit_type))
+            if record.type_id is not None:
+                game_data.unit_types[unit_type] = record.type_id
+        return record
+
+    def __init__(self, unit_type: int, type_data: Optional["UnitTypeData"]):
+        """
+        :param unit_type:
+        :param type_data: None if the unit type is not in the game data
+        """
+        try:
+            self.type_id: Optional[UnitTypeId] = UnitTypeId(unit_type)
+        except ValueError:
+            # Unit type that was added in a newer game version than sc2/ids/unit_typeid.py
+            self.type_id = None
+        self.type_data = type_data
+        weapons = type_data._proto.weapons if type_data is not None else None
+        self.weapons = weapons
+        self.is_structure: bool = type_data is not None and IS_STRUCTURE in type_data.attributes
+
+        # TODO BATTLECRUISER doesnt have weapons in proto?!
+        self.can_attack: bool = bool(weapons) or self.type_id in {UNIT_BATTLECRUISER, UNIT_ORACLE}
+        self.can_attack_both: bool = self.type_id == UNIT_BATTLECRUISER or bool(weapons) and any(
+            weapon.type in TARGET_BOTH for weapon in weapons
+        )
+        self.can_attack_ground: bool = self.type_id in {UNIT_BATTLECRUISER, UNIT_ORACLE} or bool(weapons) and any(
+            weapon.type in TARGET_GROUND for weapon in weapons
+        )
+        self.can_attack_air: bool = self.type_id == UNIT_BATTLECRUISER or bool(weapons) and any(
+            weapon.type in TARGET_AIR for weapon in weapons
+        )
+
+        self.ground_dps: Union[int, float] = 0
+        self.ground_range: Union[int, float] = 0
+        if self.can_attack_ground:
+            weapon = next((weapon for weapon in weapons if weapon.type in TARGET_GROUND), None) if weapons else None
+            if weapon:
+                self.ground_dps = (weapon.damage * weapon.attacks) / weapon.speed
+                self.ground_range = weapon.range
+        if self.type_id == UNIT_ORACLE:
+            self.ground_range = 4
+        elif self.type_id == UNIT_BATTLECRUISER:
+            self.ground_range = 6
+
+        self.air_dps: Union[int, float] = 0
+        self.air_range: Union[int, float] = 0
+        if self.can_attack_air:
+            weapon = next((weapon for weapon in weapons if weapon.type in TARGET_AIR), None) if weapons else None
+            if weapon:
+                self.air_dps = (weapon.damage * weapon.attacks) / weapon.speed
+                self.air_range = weapon.range
+        if self.type_id == UNIT_BATTLECRUISER:
+            self.air_range = 6
+
+        # TODO: Consider units with ability attacks (Oracle, Baneling) or multiple attacks (Thor).
+        self.bonus_damage: Optional[Tuple[Union[int, float], str]] = None
+        for weapon in weapons or ():
+            if weapon.damage_bonus:
+                b = weapon.damage_bonus[0]
+                self.bonus_damage = (b.bonus, Attribute(b.attribute).name)
+                break
+
+
 class Unit:
-    is_memory: bool
+    # The values that are used the most are set when the unit is created instead of being properties:
+    # tag: The unique tag of the unit
+    # type_id: UnitTypeId found in sc2/ids/unit_typeid
+    # position: The 2d position of the unit
+    # "__dict__" keeps the other attributes that bots assign to units working
+    __slots__ = (
+        "__dict__",
+        "_proto",
+        "_bot_object",
+        "_type_record",
+        "cache",
+        "is_memory",
+        "is_calculated_snapshot",
+        "tag",
+        "type_id",
+        "position",
+    )
 
     def __init__(self, proto_data, bot_object: BotAI):
         """
@@ -98,10 +204,56 @@ class Unit:
         """
         self._proto = proto_data
         self._bot_object = bot_object
+        self._type_record: UnitTypeRecord = UnitTypeRecord.get(proto_data.unit_type, bot_object)
         # Used by property_immutable_cache
         self.cache = {}
-        self.is_memory = False
-        self.is_calculated_snapshot = False
+        self.is_memory: bool = False
+        self.is_calculated_snapshot: bool = False
+        self.tag: int = proto_data.tag
+        self.type_id: UnitTypeId = self._type_record.type_id
+        pos = proto_data.pos
+        self.position: Point2 = Point2((pos.x, pos.y))
+
+    @classmethod
+    def _from_frame(cls, proto_data, bot_object: BotAI, unit_type: int) -> Unit:
+        """ Same as Unit(proto_data, bot_object), but uses the unit type that BotAI._prepare_units already read from the proto.
+
+        :param proto_data:
+        :param bot_object:
+        :param unit_type: """
+        unit = cls.__new__(cls)
+        unit._proto = proto_data
+        unit._bot_object = bot_object
+        type_record = bot_object._game_data.unit_type_records.get(unit_type)
+        if type_record is None:
+            type_record = UnitTypeRecord.get(unit_type, bot_object)
+        unit._type_record = type_record
+        unit.cache = {}
+        unit.is_memory = False
+        unit.is_calculated_snapshot = False
+        unit.tag = proto_data.tag
+        unit.type_id = type_record.type_id
+        pos = proto_data.pos
+        unit.position = Point2((pos.x, pos.y))
+        return unit
+
+    @classmethod
+    def _from_passenger_proto(cls, proto_data, bot_object: BotAI) -> Unit:
+        """ Creates a unit inside a transport or structure, see self.passengers.
+        Passenger protos have no position, so self.position is not set.
+
+        :param proto_data:
+        :param bot_object: """
+        unit = cls.__new__(cls)
+        unit._proto = proto_data
+        unit._bot_object = bot_object
+        unit._type_record = UnitTypeRecord.get(proto_data.unit_type, bot_object)
+        unit.cache = {}
+        unit.is_memory = False
+        unit.is_calculated_snapshot = False
+        unit.tag = proto_data.tag
+        unit.type_id = unit._type_record.type_id
+        return unit
 
     def __repr__(self) -> str:
         """ Returns string of this form: Unit(name='SCV', tag=4396941328). """
@@ -112,19 +264,13 @@ class Unit:
         """ Returns true when unit is a valid target for focus fire. """
         return not self.is_memory and self.can_be_attacked and not self.is_hallucination and not self.is_snapshot
 
-    @property_immutable_cache
-    def type_id(self) -> UnitTypeId:
-        """ UnitTypeId found in sc2/ids/unit_typeid.
-        Caches all type_ids of the same unit type. """
-        unit_type = self._proto.unit_type
-        if unit_type not in self._bot_object._game_data.unit_types:
-            self._bot_object._game_data.unit_types[unit_type] = UnitTypeId(unit_type)
-        return self._bot_object._game_data.unit_types[unit_type]
-
-    @property_immutable_cache
+    @property
     def _type_data(self) -> "UnitTypeData":
         """ Provides the unit type data. """
-        return self._bot_object._game_data.units[self._proto.unit_type]
+        type_data = self._type_record.type_data
+        if type_data is None:
+            raise KeyError(self._proto.unit_type)
+        return type_data
 
     @property
     def name(self) -> str:
@@ -136,15 +282,10 @@ class Unit:
         """ Returns the race of the unit """
         return Race(self._type_data._proto.race)
 
-    @property
-    def tag(self) -> int:
-        """ Returns the unique tag of the unit. """
-        return self._proto.tag
-
     @property
     def is_structure(self) -> bool:
         """ Checks if the unit is a structure. """
-        return IS_STRUCTURE in self._type_data.attributes
+        return self._type_record.is_structure
 
     @property
     def is_light(self) -> bool:
@@ -190,101 +331,56 @@ class Unit:
         For SCV, this returns None """
         return self._type_data.unit_alias
 
-    @property_immutable_cache
+    @property
     def _weapons(self):
         """ Returns the weapons of the unit. """
-        try:
-            return self._type_data._proto.weapons
-        except:
-            return None
+        return self._type_record.weapons
 
-    @property_immutable_cache
+    @property
     def can_attack(self) -> bool:
         """ Checks if the unit can attack at all. """
-        # TODO BATTLECRUISER doesnt have weapons in proto?!
-        return bool(self._weapons) or self.type_id in {UNIT_BATTLECRUISER, UNIT_ORACLE}
+        return self._type_record.can_attack
 
-    @property_immutable_cache
+    @property
     def can_attack_both(self) -> bool:
         """ Checks if the unit can attack both ground and air units. """
-        if self.type_id == UNIT_BATTLECRUISER:
-            return True
-        if self._weapons:
-            return any(weapon.type in TARGET_BOTH for weapon in self._weapons)
-        return False
+        return self._type_record.can_attack_both
 
-    @property_immutable_cache
+    @property
     def can_attack_ground(self) -> bool:
         """ Checks if the unit can attack ground units. """
-        if self.type_id in {UNIT_BATTLECRUISER, UNIT_ORACLE}:
-            return True
-        if self._weapons:
-            return any(weapon.type in TARGET_GROUND for weapon in self._weapons)
-        return False
+        return self._type_record.can_attack_ground
 
-    @property_immutable_cache
+    @property
     def ground_dps(self) -> Union[int, float]:
         """ Returns the dps against ground units. Does not include upgrades. """
-        if self.can_attack_ground:
-            weapon = next((weapon for weapon in self._weapons if weapon.type in TARGET_GROUND), None)
-            if weapon:
-                return (weapon.damage * weapon.attacks) / weapon.speed
-        return 0
+        return self._type_record.ground_dps
 
-    @property_immutable_cache
+    @property
     def ground_range(self) -> Union[int, float]:
         """ Returns the range against ground units. Does not include upgrades. """
-        if self.type_id == UNIT_ORACLE:
-            return 4
-        if self.type_id == UNIT_BATTLECRUISER:
-            return 6
-        if self.can_attack_ground:
-            weapon = next((weapon for weapon in self._weapons if weapon.type in TARGET_GROUND), None)
-            if weapon:
-                return weapon.range
-        return 0
+        return self._type_record.ground_range
 
-    @property_immutable_cache
+    @property
     def can_attack_air(self) -> bool:
         """ Checks if the unit can air attack at all. Does not include upgrades. """
-        if self.type_id == UNIT_BATTLECRUISER:
-            return True
-        if self._weapons:
-            return any(weapon.type in TARGET_AIR for weapon in self._weapons)
-        return False
+        return self._type_record.can_attack_air
 
-    @property_immutable_cache
+    @property
     def air_dps(self) -> Union[int, float]:
         """ Returns the dps against air units. Does not include upgrades. """
-        if self.can_attack_air:
-            weapon = next((weapon for weapon in self._weapons if weapon.type in TARGET_AIR), None)
-            if weapon:
-                return (weapon.damage * weapon.attacks) / weapon.speed
-        return 0
+        return self._type_record.air_dps
 
-    @property_immutable_cache
+    @property
     def air_range(self) -> Union[int, float]:
         """ Returns the range against air units. Does not include upgrades. """
-        if self.type_id == UNIT_BATTLECRUISER:
-            return 6
-        if self.can_attack_air:
-            weapon = next((weapon for weapon in self._weapons if weapon.type in TARGET_AIR), None)
-            if weapon:
-                return weapon.range
-        return 0
+        return self._type_record.air_range
 
-    @property_immutable_cache
+    @property
     def bonus_damage(self):
         """ Returns a tuple of form '(bonus damage, armor type)' if unit does 'bonus damage' against 'armor type'.
         Possible armor typs are: 'Light', 'Armored', 'Biological', 'Mechanical', 'Psionic', 'Massive', 'Structure'. """
-        # TODO: Consider units with ability attacks (Oracle, Baneling) or multiple attacks (Thor).
-        if self._weapons:
-            for weapon in self._weapons:
-                if weapon.damage_bonus:
-                    b = weapon.damage_bonus[0]
-                    return (b.bonus, Attribute(b.attribute).name)
-        else:
-            return None
+        return self._type_record.bonus_damage
 
     @property
     def armor(self) -> Union[int, float]:
@@ -409,11 +505,6 @@ class Unit:
         """ Returns the 2d position of the unit as tuple without conversion to Point2. """
         return self._proto.pos.x, self._proto.pos.y
 
-    @property_immutable_cache
-    def position(self) -> Point2:
-        """ Returns the 2d position of the unit. """
-        return Point2.from_proto(self._proto.pos)
-
     @property_immutable_cache
     def position3d(self) -> Point3:
         """ Returns the 3d position of the unit. """
@@ -779,7 +870,7 @@ class Unit:
     @property_mutable_cache
     def passengers(self) -> Set[Unit]:
         """ Returns the units inside a Bunker, CommandCenter, PlanetaryFortress, Medivac, Nydus, Overlord or WarpPrism. """
-        return {Unit(unit, self._bot_object) for unit in self._proto.passengers}
+        return {Unit._from_passenger_proto(unit, self._bot_object) for unit in self._proto.passengers}
 
     @property_mutable_cache
     def passengers_tags(self) -> Set[int]:
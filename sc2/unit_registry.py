@@ -0,0 +1,131 @@
+from __future__ import annotations
+from typing import Optional, Set
+
+import numpy as np
+
+# Groups of units that are tracked by the registry, a unit is only matched with a unit of the same group in the previous frame
+OWN_UNIT, OWN_STRUCTURE, ENEMY_UNIT, ENEMY_STRUCTURE, NOT_TRACKED = 0, 1, 2, 3, 255
+
+# Columns of the unit table that the registry needs, see FrameUnits.tracked_units
+TRACKED_DTYPE = np.dtype(
+    [
+        ("tag", np.uint64),
+        ("alliance", np.uint8),
+        ("is_structure", np.bool_),
+        ("health", np.float32),
+        ("shield", np.float32),
+        ("build_progress", np.float32),
+    ]
+)
+
+# Values of the previous frame that are needed to find out what changed
+REGISTRY_DTYPE = np.dtype(
+    [
+        ("tag", np.uint64),
+        ("group", np.uint8),
+        ("health", np.float32),
+        ("shield", np.float32),
+        ("build_progress", np.float32),
+    ]
+)
+
+
+class UnitRegistry:
+    """ Keeps the own and enemy units of the previous frame, sorted by tag, and finds out
+    which units changed compared to the current frame. See BotAI.unit_registry.
+
+    The changes are available as sets of tags, and as rows of the unit table (in the order of the unit table)
+    so BotAI.issue_events only has to look at the units that changed. """
+
+    def __init__(self):
+        self._previous: np.ndarray = np.zeros(0, dtype=REGISTRY_DTYPE)
+        # Own units and structures that were not there in the previous frame
+        self.added: Set[int] = set()
+        # Own units and structures that were there in the previous frame but are gone now
+        self.removed: Set[int] = set()
+        # Own units and structures that lost health or shield since the previous frame
+        self.damaged: Set[int] = set()
+        # Own structures that finished construction since the previous frame
+        self.completed: Set[int] = set()
+        # Enemy units and structures that were not visible (or remembered as snapshot) in the previous frame
+        self.entered_vision: Set[int] = set()
+        # Enemy units and structures that were visible (or remembered as snapshot) in the previous frame but are gone now
+        self.left_vision: Set[int] = set()
+
+        self.added_rows: np.ndarray = np.zeros(0, dtype=int)
+        self.damaged_rows: np.ndarray = np.zeros(0, dtype=int)
+        self.completed_rows: np.ndarray = np.zeros(0, dtype=int)
+        self.entered_vision_rows: np.ndarray = np.zeros(0, dtype=int)
+
+    def update(self, unit_table: np.ndarray, table_rows: Optional[np.ndarray] = None):
+        """ Compares the units of the new frame with the units of the previous frame, then stores the new frame.
+
+        :param unit_table: The unit table of the new frame (see BotAI.unit_table), or only some of its rows
+            with at least the columns of TRACKED_DTYPE
+        :param table_rows: The row in the unit table of each row of 'unit_table' if it is not the whole table """
+        alliance = unit_table["alliance"]
+        is_structure = unit_table["is_structure"]
+        groups = np.full(len(unit_table), NOT_TRACKED, dtype=np.uint8)
+        # Alliance.Self.value = 1
+        own = alliance == 1
+        groups[own] = np.where(is_structure[own], OWN_STRUCTURE, OWN_UNIT)
+        # Alliance.Enemy.value = 4
+        enemy = alliance == 4
+        groups[enemy] = np.where(is_structure[enemy], ENEMY_STRUCTURE, ENEMY_UNIT)
+
+        rows = np.flatnonzero(groups != NOT_TRACKED)
+        rows = rows[np.argsort(unit_table["tag"][rows], kind="stable")]
+        current = np.empty(len(rows), dtype=REGISTRY_DTYPE)
+        for column in ("tag", "health", "shield", "build_progress"):
+            current[column] = unit_table[column][rows]
+        current["group"] = groups[rows]
+
+        # Find each current unit in the previous frame
+        previous = self._previous
+        if len(previous):
+            positions = np.minimum(np.searchsorted(previous["tag"], current["tag"]), len(previous) - 1)
+            matched = (previous["tag"][positions] == current["tag"]) & (previous["group"][positions] == current["group"])
+        else:
+            positions = np.zeros(len(current), dtype=int)
+            matched = np.zeros(len(current), dtype=bool)
+        new = ~matched
+        matched_previous = previous[positions[matched]]
+        matched_current = current[matched]
+        matched_rows = rows[matched]
+        current_own = current["group"] <= OWN_STRUCTURE
+
+        added_rows = rows[new & current_own]
+        entered_vision_rows = rows[new & ~current_own]
+        own_matched = matched_current["group"] <= OWN_STRUCTURE
+        damaged = own_matched & (
+            (matched_current["health"] < matched_previous["health"])
+            | (matched_current["shield"] < matched_previous["shield"])
+        )
+        completed = (
+            (matched_current["group"] == OWN_STRUCTURE)
+            & (matched_current["build_progress"] >= 1)
+            & (matched_previous["build_progress"] < 1)
+        )
+
+        # Units of the previous frame that are not in the current frame
+        found = np.zeros(len(previous), dtype=bool)
+        found[positions[matched]] = True
+        gone = previous[~found]
+        gone_own = gone["group"] <= OWN_STRUCTURE
+
+        current_tags = current["tag"]
+        self.added = set(current_tags[new & current_own].tolist())
+        self.entered_vision = set(current_tags[new & ~current_own].tolist())
+        self.damaged = set(matched_current["tag"][damaged].tolist())
+        self.completed = set(matched_current["tag"][completed].tolist())
+        if table_rows is not None:
+            added_rows = table_rows[added_rows]
+            entered_vision_rows = table_rows[entered_vision_rows]
+            matched_rows = table_rows[matched_rows]
+        self.added_rows = np.sort(added_rows)
+        self.entered_vision_rows = np.sort(entered_vision_rows)
+        self.damaged_rows = np.sort(matched_rows[damaged])
+        self.completed_rows = np.sort(matched_rows[completed])
+        self.removed = set(gone["tag"][gone_own].tolist())
+        self.left_vision = set(gone["tag"][~gone_own].tolist())
+        self._previous = current
@@ -0,0 +1,133 @@
+from __future__ import annotations
+from typing import Callable, Iterable, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from .ids.buff_id import BuffId
+
+if TYPE_CHECKING:
+    from .unit import Unit
+
+GRAVITONBEAM: int = BuffId.GRAVITONBEAM.value
+
+# Flags of the "state" column of the unit table, one bit for each of the Units filters of the same name
+STATE_READY: int = 1 << 0
+STATE_IDLE: int = 1 << 1
+STATE_FLYING: int = 1 << 2
+STATE_STRUCTURE: int = 1 << 3
+STATE_GATHERING: int = 1 << 4
+STATE_RETURNING: int = 1 << 5
+STATE_COLLECTING: int = STATE_GATHERING | STATE_RETURNING
+STATE_VISIBLE: int = 1 << 6
+STATE_MINE: int = 1 << 7
+STATE_ENEMY: int = 1 << 8
+# The game sends no more orders than this in one unit, but shift queued orders should not overflow the column
+MAX_ORDER_COUNT: int = 255
+
+# Columns of the per-frame unit table, see BotAI.unit_table
+UNIT_TABLE_DTYPE = np.dtype(
+    [
+        ("tag", np.uint64),
+        ("type_id", np.uint32),
+        ("alliance", np.uint8),
+        ("x", np.float32),
+        ("y", np.float32),
+        ("z", np.float32),
+        ("radius", np.float32),
+        ("health", np.float32),
+        ("shield", np.float32),
+        ("energy", np.float32),
+        ("build_progress", np.float32),
+        ("is_flying", np.bool_),
+        ("is_structure", np.bool_),
+        ("add_on_tag", np.uint64),
+        ("display_type", np.uint8),
+        ("order_count", np.uint8),
+        # Ability id of the first order, 0 if the unit has no orders
+        ("order_ability", np.uint32),
+        # STATE_* flags, see unit_states
+        ("state", np.uint16),
+    ]
+)
+
+
+def unit_table_row(proto, is_structure: bool, state: int = 0) -> Tuple:
+    """ Returns the row of the unit table for a raw unit proto.
+    Positions are stored as float32 which is the precision the game sends them in.
+
+    :param proto:
+    :param is_structure:
+    :param state: The STATE_* flags, which are usually set for the whole table with unit_states """
+    pos = proto.pos
+    orders = proto.orders
+    return (
+        proto.tag,
+        proto.unit_type,
+        proto.alliance,
+        pos.x,
+        pos.y,
+        pos.z,
+        proto.radius,
+        proto.health,
+        proto.shield,
+        proto.energy,
+        proto.build_progress,
+        # Same as Unit.is_flying
+        proto.is_flying or GRAVITONBEAM in proto.buff_ids,
+        is_structure,
+        proto.add_on_tag,
+        proto.display_type,
+        min(len(orders), MAX_ORDER_COUNT),
+        orders[0].ability_id if orders else 0,
+        state,
+    )
+
+
+def unit_state(unit: Unit) -> int:
+    """ Returns the STATE_* flags of a unit, calculated from its properties.
+
+    :param unit: """
+    return (
+        unit.is_ready * STATE_READY
+        | unit.is_idle * STATE_IDLE
+        | unit.is_flying * STATE_FLYING
+        | unit.is_structure * STATE_STRUCTURE
+        | unit.is_gathering * STATE_GATHERING
+        | unit.is_returning * STATE_RETURNING
+        | unit.is_visible * STATE_VISIBLE
+        | unit.is_mine * STATE_MINE
+        | unit.is_enemy * STATE_ENEMY
+    )
+
+
+def unit_states(unit_table: np.ndarray, order_state: Callable[[int], int]) -> np.ndarray:
+    """ Returns the STATE_* flags of each row of the unit table, the same as unit_state for the unit of each row.
+
+    :param unit_table:
+    :param order_state: Returns the STATE_GATHERING or STATE_RETURNING flag of an ability id of a first order, or 0 """
+    states = np.zeros(len(unit_table), dtype=np.uint16)
+    states[unit_table["build_progress"] == 1] |= STATE_READY
+    has_orders = unit_table["order_count"] > 0
+    states[~has_orders] |= STATE_IDLE
+    states[unit_table["is_flying"]] |= STATE_FLYING
+    states[unit_table["is_structure"]] |= STATE_STRUCTURE
+    # IS_VISIBLE = DisplayType.Visible.value = 1
+    states[unit_table["display_type"] == 1] |= STATE_VISIBLE
+    # IS_MINE = Alliance.Self.value = 1, IS_ENEMY = Alliance.Enemy.value = 4
+    states[unit_table["alliance"] == 1] |= STATE_MINE
+    states[unit_table["alliance"] == 4] |= STATE_ENEMY
+    if has_orders.any():
+        # The flags are looked up once per ability
+        abilities, ability_indices = np.unique(unit_table["order_ability"][has_orders], return_inverse=True)
+        ability_states = np.array([order_state(ability) for ability in abilities.tolist()], dtype=np.uint16)
+        states[has_orders] |= ability_states[ability_indices]
+    return states
+
+
+def unit_table_from_units(units: Iterable[Unit]) -> np.ndarray:
+    """ Creates a unit table from Unit objects, e.g. for units that are not part of the current frame.
+
+    :param units: """
+    return np.array(
+        [unit_table_row(unit._proto, unit.is_structure, unit_state(unit)) for unit in units], dtype=UNIT_TABLE_DTYPE
+    )
@@ -5,15 +5,53 @@ import math
 from itertools import chain
 from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union, TYPE_CHECKING
 
+from .dicts.unit_tech_alias import UNIT_TECH_ALIAS
+from .dicts.unit_unit_alias import UNIT_UNIT_ALIAS
 from .ids.unit_typeid import UnitTypeId
 from .position import Point2, Point3
+from .engagement import EngagementMatrix
+from .spatial_index import SPATIAL_INDEX_MIN_UNITS
 from .unit import Unit
+from .unit_table import (
+    STATE_COLLECTING,
+    STATE_ENEMY,
+    STATE_FLYING,
+    STATE_GATHERING,
+    STATE_IDLE,
+    STATE_MINE,
+    STATE_READY,
+    STATE_RETURNING,
+    STATE_STRUCTURE,
+    STATE_VISIBLE,
+    unit_table_from_units,
+)
 import numpy as np
+from scipy.spatial.distance import cdist
 
 warnings.simplefilter("once")
 
+# From this amount of units on, distances to a point are calculated with Units.positions instead of one by one
+VECTORIZED_MIN_UNITS: int = 8
+
 if TYPE_CHECKING:
     from .bot_ai import BotAI
+    from .frame_units import FrameUnits
+
+# Unit types (as int) that have a unit type in their tech alias, e.g. HATCHERY: {LAIR, HIVE}, see Units.same_tech
+TYPES_WITH_TECH_ALIAS: Dict[int, Set[int]] = {}
+for _unit_type, _tech_aliases in UNIT_TECH_ALIAS.items():
+    for _tech_alias in _tech_aliases:
+        TYPES_WITH_TECH_ALIAS.setdefault(_tech_alias.value, set()).add(_unit_type.value)
+# Unit types (as int) that have a unit type as unit alias, e.g. ROACH: {ROACHBURROWED}, see Units.same_unit
+TYPES_WITH_UNIT_ALIAS: Dict[int, Set[int]] = {}
+for _unit_type, _unit_alias in UNIT_UNIT_ALIAS.items():
+    TYPES_WITH_UNIT_ALIAS.setdefault(_unit_alias.value, set()).add(_unit_type.value)
+
+
+def _position_tuple(position: Union[Unit, Point2, Point3]) -> Tuple[float, float]:
+    if isinstance(position, Unit):
+        return position.position_tuple
+    return position[0], position[1]
 
 
 class Units(list):
@@ -23,6 +61,14 @@ class Units(list):
     def from_proto(cls, units, bot_object: BotAI):
         return cls((Unit(u, bot_object=bot_object) for u in units))
 
+    @classmethod
+    def _from_frame_units(cls, units, bot_object: BotAI, frame_units: FrameUnits, table_indices: np.ndarray) -> Units:
+        """ Creates a Units object where the unit at position i is row table_indices[i] of the unit table of a frame. """
+        units = cls(units, bot_object)
+        units._frame_units = frame_units
+        units._table_indices = table_indices
+        return units
+
     def __init__(self, units, bot_object: BotAI):
         """
         :param units:
@@ -30,6 +76,75 @@ class Units(list):
         """
         super().__init__(units)
         self._bot_object = bot_object
+        # Set if the units are rows of the unit table of a frame, see self.table
+        self._frame_units: FrameUnits = None
+        self._table_indices: np.ndarray = None
+        # See self.positions
+        self._positions: np.ndarray = None
+        # See self._tag_index
+        self._tag_index_dict: Dict[int, int] = None
+        # See self._type_index
+        self._type_index_dict: Dict[int, List[int]] = None
+        # Set by frozen caches, see cache.freeze
+        self._frozen: bool = False
+
+    def _clear_cache(self):
+        """ Called when the list is changed, clears everything that was calculated from its content. """
+        if self._frozen:
+            raise TypeError("This Units object is read-only, use .copy() to get a copy that can be changed")
+        self._frame_units = None
+        self._table_indices = None
+        self._positions = None
+        self._tag_index_dict = None
+        self._type_index_dict = None
+
+    def append(self, unit: Unit):
+        self._clear_cache()
+        super().append(unit)
+
+    def extend(self, units: Iterable[Unit]):
+        self._clear_cache()
+        super().extend(units)
+
+    def insert(self, index: int, unit: Unit):
+        self._clear_cache()
+        super().insert(index, unit)
+
+    def remove(self, unit: Unit):
+        self._clear_cache()
+        super().remove(unit)
+
+    def pop(self, index: int = -1) -> Unit:
+        self._clear_cache()
+        return super().pop(index)
+
+    def clear(self):
+        self._clear_cache()
+        super().clear()
+
+    def sort(self, *args, **kwargs):
+        self._clear_cache()
+        super().sort(*args, **kwargs)
+
+    def reverse(self):
+        self._clear_cache()
+        super().reverse()
+
+    def __setitem__(self, index, value):
+        self._clear_cache()
+        super().__setitem__(index, value)
+
+    def __delitem__(self, index):
+        self._clear_cache()
+        super().__delitem__(index)
+
+    def __iadd__(self, other: Iterable[Unit]) -> Units:
+        self._clear_cache()
+        return super().__iadd__(other)
+
+    def __imul__(self, n: int) -> Units:
+        self._clear_cache()
+        return super().__imul__(n)
 
     def __call__(self, *args, **kwargs):
         return UnitSelection(self, *args, **kwargs)
@@ -38,37 +153,87 @@ class Units(list):
         return UnitSelection(self, *args, **kwargs)
 
     def copy(self):
-        return self.subgroup(self)
+        units = self.subgroup(self)
+        units._frame_units = self._frame_units
+        units._table_indices = self._table_indices
+        units._positions = self._positions
+        units._tag_index_dict = self._tag_index_dict
+        units._type_index_dict = self._type_index_dict
+        return units
+
+    @property
+    def _tag_index(self) -> Dict[int, int]:
+        """ Returns a dict from the tag of each unit to its index, created the first time it is needed after the list was changed.
+        If several units have the same tag, the index of the first one is used. """
+        if self._tag_index_dict is None:
+            # Iterated backwards so the first unit with a tag overwrites the later ones
+            self._tag_index_dict = {unit.tag: index for index, unit in zip(range(len(self) - 1, -1, -1), reversed(self))}
+        return self._tag_index_dict
+
+    @property
+    def _type_index(self) -> Dict[int, List[int]]:
+        """ Returns a dict from each unit type (as int) to the indices of the units of that type in ascending order,
+        created the first time it is needed after the list was changed. The Units objects of the bot are created
+        once per frame, so their index is also created at most once per frame. """
+        if self._type_index_dict is None:
+            if self._table_indices is not None:
+                unit_types = self._frame_units.type_ids[self._table_indices].tolist()
+            else:
+                unit_types = [unit._proto.unit_type for unit in self]
+            type_index: Dict[int, List[int]] = {}
+            for index, unit_type in enumerate(unit_types):
+                indices = type_index.get(unit_type)
+                if indices is None:
+                    type_index[unit_type] = [index]
+                else:
+                    indices.append(index)
+            self._type_index_dict = type_index
+        return self._type_index_dict
+
+    def _indices_of_types(self, unit_types: Iterable[int]) -> List[int]:
+        """ Returns the indices of the units that have one of these unit types (as int), in ascending order. """
+        type_index = self._type_index
+        index_lists = [type_index[unit_type] for unit_type in unit_types if unit_type in type_index]
+        if len(index_lists) == 1:
+            return index_lists[0]
+        return sorted(chain.from_iterable(index_lists))
+
+    def _subgroup_of_indices(self, indices: List[int]) -> Units:
+        """ Creates a new Units object from the units at 'indices', which keeps their rows in the unit table if self has them. """
+        units = [self[index] for index in indices]
+        if self._table_indices is not None:
+            return Units._from_frame_units(
+                units, self._bot_object, self._frame_units, self._table_indices[np.array(indices, dtype=int)]
+            )
+        return self.subgroup(units)
+
+    @staticmethod
+    def _tags_of(units: Iterable[Unit]) -> Union[Set[int], Dict[int, int]]:
+        if isinstance(units, Units):
+            return units._tag_index
+        return {unit.tag for unit in units}
 
     def __or__(self, other: Units) -> Units:
+        self_tags = self._tag_index
         return Units(
-            chain(
-                iter(self),
-                (other_unit for other_unit in other if other_unit.tag not in (self_unit.tag for self_unit in self)),
-            ),
+            chain(iter(self), (other_unit for other_unit in other if other_unit.tag not in self_tags)),
             self._bot_object,
         )
 
     def __add__(self, other: Units) -> Units:
+        self_tags = self._tag_index
         return Units(
-            chain(
-                iter(self),
-                (other_unit for other_unit in other if other_unit.tag not in (self_unit.tag for self_unit in self)),
-            ),
+            chain(iter(self), (other_unit for other_unit in other if other_unit.tag not in self_tags)),
             self._bot_object,
         )
 
     def __and__(self, other: Units) -> Units:
-        return Units(
-            (other_unit for other_unit in other if other_unit.tag in (self_unit.tag for self_unit in self)),
-            self._bot_object,
-        )
+        self_tags = self._tag_index
+        return Units((other_unit for other_unit in other if other_unit.tag in self_tags), self._bot_object)
 
     def __sub__(self, other: Units) -> Units:
-        return Units(
-            (self_unit for self_unit in self if self_unit.tag not in (other_unit.tag for other_unit in other)),
-            self._bot_object,
-        )
+        other_tags = self._tags_of(other)
+        return Units((self_unit for self_unit in self if self_unit.tag not in other_tags), self._bot_object)
 
     def __hash__(self):
         return hash(unit.tag for unit in self)
@@ -86,10 +251,10 @@ class Units(list):
         return bool(self)
 
     def find_by_tag(self, tag) -> Optional[Unit]:
-        for unit in self:
-            if unit.tag == tag:
-                return unit
-        return None
+        index = self._tag_index.get(tag)
+        if index is None:
+            return None
+        return self[index]
 
     def by_tag(self, tag):
         unit = self.find_by_tag(tag)
@@ -125,12 +290,49 @@ class Units(list):
         else:
             return self.subgroup(random.sample(self, n))
 
-    # TODO: append, insert, remove, pop and extend functions should reset the cache for Units.positions because the number of units in the list has changed
-    # @property_immutable_cache
-    # def positions(self) -> np.ndarray:
-    #     flat_units_positions = (coord for unit in self for coord in unit.position)
-    #     unit_positions_np = np.fromiter(flat_units_positions, dtype=float, count=2 * len(self)).reshape((len(self), 2))
-    #     return unit_positions_np
+    @property
+    def table(self) -> np.ndarray:
+        """ Returns the data of these units as numpy structured array with one row per unit, in the same order as the units.
+        See BotAI.unit_table for the available columns. If these units were taken from the current frame (e.g. self.units or self.mineral_field),
+        the rows are gathered from the unit table of that frame, otherwise they are created from the units.
+
+        Example::
+
+            marines = self.units(UnitTypeId.MARINE)
+            marines_table = marines.table
+            # Numpy array of bools, True for all marines with less than 20 health
+            low_health = marines_table["health"] < 20
+
+        """
+        if self._table_indices is not None:
+            return self._frame_units.unit_table[self._table_indices]
+        return unit_table_from_units(self)
+
+    @property
+    def positions(self) -> np.ndarray:
+        """ Returns the 2d positions of these units as read-only numpy array of shape (n, 2), in the same order as the units.
+        The array is created once and cached until the list is changed (append, remove, sort, ...).
+
+        Example::
+
+            marines = self.units(UnitTypeId.MARINE)
+            # Numpy array of bools, True for all marines in the left half of the map
+            left = marines.positions[:, 0] < self.game_info.map_center.x
+
+        """
+        if self._positions is None:
+            if self._table_indices is not None:
+                positions = self._frame_units.positions[self._table_indices]
+            else:
+                positions = np.array([unit.position_tuple for unit in self], dtype=float).reshape((len(self), 2))
+            positions.flags.writeable = False
+            self._positions = positions
+        return self._positions
+
+    def _squared_distances_to_point(self, position: Union[Point2, Point3]) -> np.ndarray:
+        """ Returns the squared distance of each unit to the position, calculated with self.positions. """
+        difference = self.positions - (position[0], position[1])
+        return np.einsum("ij,ij->i", difference, difference)
 
     def in_attack_range_of(self, unit: Unit, bonus_distance: Union[int, float] = 0) -> Units:
         """
@@ -155,6 +357,26 @@ class Units(list):
 
         :param unit:
         :param bonus_distance: """
+        rows = self._spatial_index_rows()
+        if rows is not None and len(rows):
+            # Only the units that could be in range of the largest of both attack ranges need to be checked
+            reach = (
+                unit.radius
+                + max(unit.ground_range, unit.air_range)
+                + bonus_distance
+                + max(target.radius for target in self)
+            )
+            candidates = self._bot_object._spatial_index.candidates(
+                rows, unit.position_tuple, reach * (1 + 1e-9) + 1e-9
+            )
+            return self._subgroup_of_rows(
+                rows,
+                (
+                    index
+                    for index in np.flatnonzero(candidates).tolist()
+                    if unit.target_in_range(self[index], bonus_distance=bonus_distance)
+                ),
+            )
         return self.filter(lambda x: unit.target_in_range(x, bonus_distance=bonus_distance))
 
     def closest_distance_to(self, position: Union[Unit, Point2, Point3]) -> float:
@@ -209,12 +431,17 @@ class Units(list):
 
         :param position: """
         assert self, "Units object is empty"
+        rows = self._spatial_index_rows()
+        if rows is not None:
+            return self[self._bot_object._spatial_index.closest(rows, _position_tuple(position))]
         if isinstance(position, Unit):
             return min(
                 (unit1 for unit1 in self),
                 key=lambda unit2: self._bot_object._distance_squared_unit_to_unit(unit2, position),
             )
 
+        if len(self) >= VECTORIZED_MIN_UNITS:
+            return self[int(np.argmin(self._squared_distances_to_point(position)))]
         distances = self._bot_object._distance_units_to_pos(self, position)
         return min(((unit, dist) for unit, dist in zip(self, distances)), key=lambda my_tuple: my_tuple[1])[0]
 
@@ -237,6 +464,8 @@ class Units(list):
                 (unit1 for unit1 in self),
                 key=lambda unit2: self._bot_object._distance_squared_unit_to_unit(unit2, position),
             )
+        if len(self) >= VECTORIZED_MIN_UNITS:
+            return self[int(np.argmax(self._squared_distances_to_point(position)))]
         distances = self._bot_object._distance_units_to_pos(self, position)
         return max(((unit, dist) for unit, dist in zip(self, distances)), key=lambda my_tuple: my_tuple[1])[0]
 
@@ -257,6 +486,10 @@ class Units(list):
         """
         if not self: return Units([], self._bot_object)
 
+        rows = self._spatial_index_rows()
+        if rows is not None:
+            mask = self._bot_object._spatial_index.closer_than(rows, _position_tuple(position), distance)
+            return self._subgroup_of_rows(rows, np.flatnonzero(mask))
         if isinstance(position, Unit):
             distance_squared = distance ** 2
             return self.subgroup(
@@ -264,6 +497,9 @@ class Units(list):
                 for unit in self
                 if self._bot_object._distance_squared_unit_to_unit(unit, position) < distance_squared
             )
+        if len(self) >= VECTORIZED_MIN_UNITS:
+            indices = np.flatnonzero(self._squared_distances_to_point(position) < distance ** 2)
+            return self.subgroup(self[index] for index in indices.tolist())
         distances = self._bot_object._distance_units_to_pos(self, position)
         return self.subgroup(unit for unit, dist in zip(self, distances) if dist < distance)
 
@@ -284,6 +520,10 @@ class Units(list):
         """
         if not self: return Units([], self._bot_object)
 
+        rows = self._spatial_index_rows()
+        if rows is not None:
+            mask = self._bot_object._spatial_index.further_than(rows, _position_tuple(position), distance)
+            return self._subgroup_of_rows(rows, np.flatnonzero(mask))
         if isinstance(position, Unit):
             distance_squared = distance ** 2
             return self.subgroup(
@@ -314,6 +554,12 @@ class Units(list):
         """
         if not self: return Units([], self._bot_object)
 
+        rows = self._spatial_index_rows()
+        if rows is not None:
+            mask = self._bot_object._spatial_index.in_distance_between(
+                rows, _position_tuple(position), distance1, distance2
+            )
+            return self._subgroup_of_rows(rows, np.flatnonzero(mask))
         if isinstance(position, Unit):
             distance1_squared = distance1 ** 2
             distance2_squared = distance2 ** 2
@@ -373,6 +619,11 @@ class Units(list):
         # Return self because there are no enemies
         if not self:
             return self
+        rows = self._spatial_index_rows()
+        other_rows = other_units._spatial_index_rows() if rows is not None else None
+        if other_rows is not None:
+            mask = self._bot_object._spatial_index.in_distance_of_group(rows, other_rows, distance)
+            return self._subgroup_of_rows(rows, np.flatnonzero(mask))
         distance_squared = distance ** 2
         if len(self) == 1:
             if any(
@@ -408,6 +659,109 @@ class Units(list):
             ),
         )
 
+    def _distance_positions(self) -> np.ndarray:
+        """ Returns the positions of these units as array of shape (n, 2). The positions are taken from the unit table
+        of the current frame which the distance calculation uses (see distances.py), unless a unit is not part of the current frame. """
+        bot = self._bot_object
+        if bot is None or (self._table_indices is not None and self._frame_units is bot._distance_frame_units):
+            return self.positions
+        rows = bot._unit_rows(self)
+        if rows is not None:
+            return bot._all_unit_positions[rows]
+        return self.positions
+
+    def distance_matrix_to(self, other_units: Units) -> np.ndarray:
+        """
+        Returns the distances between all units of this group and all units of the other group as array of shape (len(self), len(other_units)).
+
+        Example::
+
+            marines = self.units(UnitTypeId.MARINE)
+            zerglings = self.enemy_units(UnitTypeId.ZERGLING)
+            distances = marines.distance_matrix_to(zerglings)
+            # distances[i, j] is the distance between marines[i] and zerglings[j]
+
+        :param other_units: """
+        return np.sqrt(cdist(self._distance_positions(), other_units._distance_positions(), "sqeuclidean"))
+
+    def closest_to_each(self, other_units: Units) -> List[Unit]:
+        """
+        Returns the closest unit of the other group for each unit of this group, in the same order as this group.
+        Same as [other_units.closest_to(unit) for unit in self], but the distances are calculated in one call.
+
+        Example::
+
+            marines = self.units(UnitTypeId.MARINE)
+            zerglings = self.enemy_units(UnitTypeId.ZERGLING)
+            if zerglings:
+                for marine, zergling in zip(marines, marines.closest_to_each(zerglings)):
+                    self.do(marine.attack(zergling))
+
+        :param other_units: """
+        assert other_units, "Other units object is empty"
+        if not self:
+            return []
+        distances = cdist(self._distance_positions(), other_units._distance_positions(), "sqeuclidean")
+        return [other_units[index] for index in np.argmin(distances, axis=1).tolist()]
+
+    def closest_distance_to_each(self, other_units: Units) -> np.ndarray:
+        """
+        Returns the distance to the closest unit of the other group for each unit of this group, in the same order as this group.
+        Same as [other_units.closest_distance_to(unit) for unit in self], but the distances are calculated in one call.
+
+        Example::
+
+            marines = self.units(UnitTypeId.MARINE)
+            zerglings = self.enemy_units(UnitTypeId.ZERGLING)
+            if zerglings:
+                # Numpy array of bools, True for all marines that have a zergling closer than 5
+                in_danger = marines.closest_distance_to_each(zerglings) < 5
+
+        :param other_units: """
+        assert other_units, "Other units object is empty"
+        if not self:
+            return np.zeros(0)
+        distances = cdist(self._distance_positions(), other_units._distance_positions(), "sqeuclidean")
+        return np.sqrt(distances.min(axis=1))
+
+    def pairs_within(self, other_units: Units, distance: float) -> List[Tuple[Unit, Unit]]:
+        """
+        Returns all pairs of a unit of this group and a unit of the other group that are closer than 'distance' to each other,
+        ordered by the units of this group and then by the units of the other group.
+        If a unit is in both groups, it is also paired with itself.
+
+        Example::
+
+            marines = self.units(UnitTypeId.MARINE)
+            zerglings = self.enemy_units(UnitTypeId.ZERGLING)
+            for marine, zergling in marines.pairs_within(zerglings, 3):
+                # Each marine and zergling that are closer than 3 to each other (does not include unit radius in calculation)
+                pass
+
+        :param other_units:
+        :param distance: """
+        if not self or not other_units:
+            return []
+        distances = cdist(self._distance_positions(), other_units._distance_positions(), "sqeuclidean")
+        indices1, indices2 = np.nonzero(distances < distance ** 2)
+        return [(self[index1], other_units[index2]) for index1, index2 in zip(indices1.tolist(), indices2.tolist())]
+
+    def engagement_with(self, other_units: Units, bonus_distance: Union[int, float] = 0) -> EngagementMatrix:
+        """
+        Returns which units of this group and of the other group have each other in attack range, see EngagementMatrix.
+        Same as calling unit.target_in_range for all pairs in both directions, but the distances are calculated in one call.
+
+        Example::
+
+            engagement = self.units.engagement_with(self.enemy_units)
+            for marine in self.units(UnitTypeId.MARINE):
+                targets = engagement.targets_in_range(marine)
+                attackers = engagement.threatened_by(marine)
+
+        :param other_units:
+        :param bonus_distance: """
+        return EngagementMatrix(self, other_units, bonus_distance=bonus_distance)
+
     def _list_sorted_closest_to_distance(self, position: Union[Unit, Point2], distance: float) -> List[Unit]:
         """ This function should be a bit faster than using units.sorted(key=lambda u: u.distance_to(position)) """
         if isinstance(position, Unit):
@@ -430,6 +784,41 @@ class Units(list):
         """ Inverse of the function 'n_closest_to_distance', returns the furthest units instead """
         return self.subgroup(self._list_sorted_closest_to_distance(position=position, distance=distance)[-n:])
 
+    def _spatial_index_rows(self) -> Optional[np.ndarray]:
+        """ Returns the rows of these units in the spatial index of the current frame, or None if the bot does not use
+        distance calculation method 3 (see distances.py), if the frame has fewer than SPATIAL_INDEX_MIN_UNITS units
+        or if one of the units is not part of the current frame. """
+        if getattr(self._bot_object, "distance_calculation_method", None) != 3:
+            return None
+        if self._bot_object._units_count < SPATIAL_INDEX_MIN_UNITS:
+            return None
+        return self._bot_object._unit_rows(self)
+
+    def _subgroup_of_rows(self, rows: np.ndarray, indices: Iterable[int]) -> Units:
+        """ Creates a new Units object from the units at 'indices', which keeps their rows in the unit table of the current frame.
+
+        :param rows: The rows of all units of self
+        :param indices: """
+        indices = np.fromiter(indices, dtype=int)
+        units = [self[index] for index in indices.tolist()]
+        frame_units = self._bot_object._distance_frame_units
+        if frame_units is None:
+            return self.subgroup(units)
+        return Units._from_frame_units(units, self._bot_object, frame_units, rows[indices])
+
+    def query(self) -> UnitsQuery:
+        """
+        Returns a query on these units that collects filters, orderings and limits and calculates them once when it is used,
+        instead of creating a new Units object for each of them. See UnitsQuery.
+
+        Example::
+
+            idle_marines = self.units.query().of_type(UnitTypeId.MARINE).ready.idle.closer_than(10, self.start_location)
+            for marine in idle_marines.sorted_by_distance_to(self.enemy_start_locations[0]):
+                pass
+        """
+        return UnitsQuery(self)
+
     def subgroup(self, units):
         """
         Creates a new mutable Units object from Units or list object.
@@ -437,6 +826,18 @@ class Units(list):
         :param units: """
         return Units(units, self._bot_object)
 
+    def _filter_state(self, state: int, has_state: bool, pred: callable) -> Units:
+        """ Filters the units by one of the STATE_* flags of the unit table (see unit_table.py) if they are rows of it
+        and the table was already created, otherwise with 'pred' which has to give the same result.
+
+        :param state:
+        :param has_state: Keep the units that have the flag if True, otherwise the units that do not have it
+        :param pred: """
+        if self._table_indices is not None and len(self) >= VECTORIZED_MIN_UNITS and self._frame_units.has_unit_table:
+            flags = self._frame_units.unit_table["state"][self._table_indices] & state
+            return self._subgroup_of_indices(np.flatnonzero(flags if has_state else flags == 0).tolist())
+        return self.filter(pred)
+
     def filter(self, pred: callable) -> Units:
         """
         Filters the current Units object and returns a new Units object.
@@ -470,6 +871,11 @@ class Units(list):
             return sorted(
                 self, key=lambda unit: self._bot_object._distance_squared_unit_to_unit(unit, position), reverse=reverse
             )
+        if len(self) >= VECTORIZED_MIN_UNITS:
+            distances_squared = self._squared_distances_to_point(position)
+            # Stable like sorted(), units with the same distance keep their order
+            order = np.argsort(-distances_squared if reverse else distances_squared, kind="stable")
+            return [self[index] for index in order.tolist()]
         distances = self._bot_object._distance_units_to_pos(self, position)
         unit_dist_dict = {unit.tag: dist for unit, dist in zip(self, distances)}
         return sorted(self, key=lambda unit2: unit_dist_dict[unit2.tag], reverse=reverse)
@@ -490,6 +896,8 @@ class Units(list):
 
         :param other:
         """
+        if isinstance(other, list):
+            other = set(other)
         return self.filter(lambda unit: unit.tag in other)
 
     def tags_not_in(self, other: Union[Set[int], List[int], Dict[int, Any]]) -> Units:
@@ -505,6 +913,8 @@ class Units(list):
 
         :param other:
         """
+        if isinstance(other, list):
+            other = set(other)
         return self.filter(lambda unit: unit.tag not in other)
 
     def of_type(self, other: Union[UnitTypeId, Set[UnitTypeId], List[UnitTypeId], Dict[UnitTypeId, Any]]) -> Units:
@@ -519,9 +929,7 @@ class Units(list):
         :param other: """
         if isinstance(other, UnitTypeId):
             other = {other}
-        elif isinstance(other, list):
-            other = set(other)
-        return self.filter(lambda unit: unit.type_id in other)
+        return self._subgroup_of_indices(self._indices_of_types({unit_type.value for unit_type in other}))
 
     def exclude_type(self, other: Union[UnitTypeId, Set[UnitTypeId], List[UnitTypeId], Dict[UnitTypeId, Any]]) -> Units:
         """
@@ -535,9 +943,10 @@ class Units(list):
         :param other: """
         if isinstance(other, UnitTypeId):
             other = {other}
-        elif isinstance(other, list):
-            other = set(other)
-        return self.filter(lambda unit: unit.type_id not in other)
+        excluded_types = {unit_type.value for unit_type in other}
+        return self._subgroup_of_indices(
+            self._indices_of_types(unit_type for unit_type in self._type_index if unit_type not in excluded_types)
+        )
 
     def same_tech(self, other: Set[UnitTypeId]) -> Units:
         """
@@ -568,14 +977,14 @@ class Units(list):
             + " 'self.units.same_tech({UnitTypeId.LAIR})'"
         )
         tech_alias_types: Set[int] = {u.value for u in other}
-        unit_data = self._bot_object._game_data.units
-        for unitType in other:
-            for same in unit_data[unitType.value]._proto.tech_alias:
-                tech_alias_types.add(same)
-        return self.filter(
-            lambda unit: unit._proto.unit_type in tech_alias_types
-            or any(same in tech_alias_types for same in unit._type_data._proto.tech_alias)
+        for unit_type in other:
+            for same in UNIT_TECH_ALIAS.get(unit_type, ()):
+                tech_alias_types.add(same.value)
+        # Units that are one of these types or have one of them as tech alias
+        same_tech_types: Set[int] = tech_alias_types.union(
+            *(TYPES_WITH_TECH_ALIAS.get(unit_type, ()) for unit_type in tech_alias_types)
         )
+        return self._subgroup_of_indices(self._indices_of_types(same_tech_types))
 
     def same_unit(self, other: Union[UnitTypeId, Set[UnitTypeId], List[UnitTypeId], Dict[UnitTypeId, Any]]) -> Units:
         """
@@ -601,19 +1010,22 @@ class Units(list):
         if isinstance(other, UnitTypeId):
             other = {other}
         unit_alias_types: Set[int] = {u.value for u in other}
-        unit_data = self._bot_object._game_data.units
-        for unitType in other:
-            unit_alias_types.add(unit_data[unitType.value]._proto.unit_alias)
-        unit_alias_types.discard(0)
-        return self.filter(
-            lambda unit: unit._proto.unit_type in unit_alias_types
-            or unit._type_data._proto.unit_alias in unit_alias_types
+        for unit_type in other:
+            if unit_type in UNIT_UNIT_ALIAS:
+                unit_alias_types.add(UNIT_UNIT_ALIAS[unit_type].value)
+        # Units that are one of these types or have one of them as unit alias
+        same_unit_types: Set[int] = unit_alias_types.union(
+            *(TYPES_WITH_UNIT_ALIAS.get(unit_type, ()) for unit_type in unit_alias_types)
         )
+        return self._subgroup_of_indices(self._indices_of_types(same_unit_types))
 
     @property
     def center(self) -> Point2:
         """ Returns the central position of all units. """
         assert self, f"Units object is empty"
+        if len(self) >= VECTORIZED_MIN_UNITS:
+            x, y = self.positions.mean(axis=0).tolist()
+            return Point2((x, y))
         amount = self.amount
         return Point2(
             (
@@ -630,73 +1042,73 @@ class Units(list):
     @property
     def tags(self) -> Set[int]:
         """ Returns all unit tags as a set. """
-        return {unit.tag for unit in self}
+        return set(self._tag_index)
 
     @property
     def ready(self) -> Units:
         """ Returns all structures that are ready (construction complete). """
-        return self.filter(lambda unit: unit.is_ready)
+        return self._filter_state(STATE_READY, True, lambda unit: unit.is_ready)
 
     @property
     def not_ready(self) -> Units:
         """ Returns all structures that are not ready (construction not complete). """
-        return self.filter(lambda unit: not unit.is_ready)
+        return self._filter_state(STATE_READY, False, lambda unit: not unit.is_ready)
 
     @property
     def idle(self) -> Units:
         """ Returns all units or structures that are doing nothing (unit is standing still, structure is doing nothing). """
-        return self.filter(lambda unit: unit.is_idle)
+        return self._filter_state(STATE_IDLE, True, lambda unit: unit.is_idle)
 
     @property
     def owned(self) -> Units:
         """ Deprecated: All your units. """
-        return self.filter(lambda unit: unit.is_mine)
+        return self._filter_state(STATE_MINE, True, lambda unit: unit.is_mine)
 
     @property
     def enemy(self) -> Units:
         """ Deprecated: All enemy units."""
-        return self.filter(lambda unit: unit.is_enemy)
+        return self._filter_state(STATE_ENEMY, True, lambda unit: unit.is_enemy)
 
     @property
     def flying(self) -> Units:
         """ Returns all units that are flying. """
-        return self.filter(lambda unit: unit.is_flying)
+        return self._filter_state(STATE_FLYING, True, lambda unit: unit.is_flying)
 
     @property
     def not_flying(self) -> Units:
         """ Returns all units that not are flying. """
-        return self.filter(lambda unit: not unit.is_flying)
+        return self._filter_state(STATE_FLYING, False, lambda unit: not unit.is_flying)
 
     @property
     def structure(self) -> Units:
         """ Deprecated: All structures. """
-        return self.filter(lambda unit: unit.is_structure)
+        return self._filter_state(STATE_STRUCTURE, True, lambda unit: unit.is_structure)
 
     @property
     def not_structure(self) -> Units:
         """ Deprecated: All units that are not structures. """
-        return self.filter(lambda unit: not unit.is_structure)
+        return self._filter_state(STATE_STRUCTURE, False, lambda unit: not unit.is_structure)
 
     @property
     def gathering(self) -> Units:
         """ Returns all workers that are mining minerals or vespene (gather command). """
-        return self.filter(lambda unit: unit.is_gathering)
+        return self._filter_state(STATE_GATHERING, True, lambda unit: unit.is_gathering)
 
     @property
     def returning(self) -> Units:
         """ Returns all workers that are carrying minerals or vespene and are returning to a townhall. """
-        return self.filter(lambda unit: unit.is_returning)
+        return self._filter_state(STATE_RETURNING, True, lambda unit: unit.is_returning)
 
     @property
     def collecting(self) -> Units:
         """ Returns all workers that are mining or returning resources. """
-        return self.filter(lambda unit: unit.is_collecting)
+        return self._filter_state(STATE_COLLECTING, True, lambda unit: unit.is_collecting)
 
     @property
     def visible(self) -> Units:
         """ Returns all units or structures that are visible.
         TODO: add proper description on which units are exactly visible (not snapshots?) """
-        return self.filter(lambda unit: unit.is_visible)
+        return self._filter_state(STATE_VISIBLE, True, lambda unit: unit.is_visible)
 
     @property
     def mineral_field(self) -> Units:
@@ -717,13 +1129,353 @@ class Units(list):
 class UnitSelection(Units):
     def __init__(self, parent, selection=None):
         if isinstance(selection, (UnitTypeId)):
-            super().__init__((unit for unit in parent if unit.type_id == selection), parent._bot_object)
+            indices = parent._type_index.get(selection.value, [])
         elif isinstance(selection, set):
             assert all(isinstance(t, UnitTypeId) for t in selection), f"Not all ids in selection are of type UnitTypeId"
-            super().__init__((unit for unit in parent if unit.type_id in selection), parent._bot_object)
+            indices = parent._indices_of_types({unit_type.value for unit_type in selection})
         elif selection is None:
-            super().__init__((unit for unit in parent), parent._bot_object)
+            indices = range(len(parent))
         else:
             assert isinstance(
                 selection, (UnitTypeId, set)
             ), f"selection is not None or of type UnitTypeId or Set[UnitTypeId]"
+        super().__init__((parent[index] for index in indices), parent._bot_object)
+        if parent._table_indices is not None:
+            self._frame_units = parent._frame_units
+            self._table_indices = parent._table_indices[np.array(indices, dtype=int)]
+
+
+# Kinds of the terms of a UnitsQuery
+_FILTER, _ORDER, _TAKE = 0, 1, 2
+
+
+def _column_filter(column: str, test: callable, predicate: callable) -> Tuple[callable, callable]:
+    """ Returns the (mask function, predicate) of a UnitsQuery filter that can be calculated from a column of the unit table.
+
+    :param column: Column of the unit table, see unit_table.py
+    :param test: Returns a mask for an array of values of the column
+    :param predicate: Used instead of 'test' for units that are not rows of the unit table """
+
+    def mask(query: UnitsQuery, indices: np.ndarray) -> Optional[np.ndarray]:
+        values = query._table_column(column, indices)
+        return None if values is None else test(values)
+
+    return mask, predicate
+
+
+def _state_filter(state: int, has_state: bool, predicate: callable) -> Tuple[callable, callable]:
+    """ Returns the (mask function, predicate) of a UnitsQuery filter on one of the STATE_* flags of the unit table.
+
+    :param state:
+    :param has_state: Keep the units that have the flag if True, otherwise the units that do not have it
+    :param predicate: """
+    if has_state:
+        return _column_filter("state", lambda values: (values & state) != 0, predicate)
+    return _column_filter("state", lambda values: (values & state) == 0, predicate)
+
+
+class UnitsQuery:
+    """ A chain of filters, orderings and limits on a Units object that is only calculated once,
+    when the query is iterated or materialized, without creating a Units object for each step of the chain.
+    Created by Units.query, each function returns a new query with one more term.
+
+    Filters that can be answered from the unit table (the STATE_* flags like ready or idle, types, tags and distances)
+    are calculated with numpy for all remaining units at once. All other filters are checked in one loop over the units
+    that are left, before the next ordering or limit.
+
+    Example::
+
+        # Same units as self.units.filter(...).ready.idle.closer_than(10, p).sorted_by_distance_to(q)
+        units = (
+            self.units.query()
+            .filter(lambda unit: unit.health_percentage > 0.5)
+            .ready.idle.closer_than(10, p)
+            .sorted_by_distance_to(q)
+        )
+        for unit in units:
+            pass
+        # Or as Units object
+        units = units.materialize()
+    """
+
+    def __init__(self, units: Units, terms: Tuple[Tuple[int, Any], ...] = ()):
+        """
+        :param units:
+        :param terms:
+        """
+        self._units = units
+        self._terms = terms
+        self._result: Optional[Units] = None
+
+    def _add(self, kind: int, value: Any) -> UnitsQuery:
+        return UnitsQuery(self._units, self._terms + ((kind, value),))
+
+    def _table_column(self, column: str, indices: np.ndarray) -> Optional[np.ndarray]:
+        """ Returns the values of a column of the unit table for the units at 'indices',
+        or None if the units are not rows of a unit table or the table was not created yet. """
+        units = self._units
+        if units._table_indices is None or not units._frame_units.has_unit_table:
+            return None
+        return units._frame_units.unit_table[column][units._table_indices[indices]]
+
+    def _squared_distances(self, indices: np.ndarray, position: Union[Unit, Point2, Point3]) -> np.ndarray:
+        difference = self._units._distance_positions()[indices] - _position_tuple(position)
+        return np.einsum("ij,ij->i", difference, difference)
+
+    def _apply_predicates(self, indices: np.ndarray, predicates: List[callable]) -> np.ndarray:
+        if not predicates:
+            return indices
+        units = self._units
+        return np.array(
+            [index for index in indices.tolist() if all(predicate(units[index]) for predicate in predicates)], dtype=int
+        )
+
+    def _run(self) -> np.ndarray:
+        """ Returns the indices of the units in the result. """
+        indices = np.arange(len(self._units))
+        predicates: List[callable] = []
+        for kind, value in self._terms:
+            if kind == _FILTER:
+                mask_function, predicate = value
+                mask = mask_function(self, indices) if mask_function is not None else None
+                if mask is None:
+                    predicates.append(predicate)
+                else:
+                    indices = indices[mask]
+                continue
+            # Filters do not change the order, so all filters before an ordering or limit are checked together
+            indices = self._apply_predicates(indices, predicates)
+            predicates = []
+            if kind == _ORDER:
+                indices = value(self, indices)
+            elif kind == _TAKE:
+                indices = indices[:value]
+        return self._apply_predicates(indices, predicates)
+
+    def materialize(self) -> Units:
+        """ Calculates the query and returns the result as Units object. The result is calculated only once. """
+        if self._result is None:
+            self._result = self._units._subgroup_of_indices(self._run().tolist())
+        return self._result
+
+    def __iter__(self):
+        return iter(self.materialize())
+
+    def __len__(self) -> int:
+        return len(self.materialize())
+
+    def __bool__(self) -> bool:
+        return bool(self.materialize())
+
+    @property
+    def amount(self) -> int:
+        return len(self.materialize())
+
+    @property
+    def exists(self) -> bool:
+        return bool(self.materialize())
+
+    @property
+    def empty(self) -> bool:
+        return not self.materialize()
+
+    @property
+    def first(self) -> Unit:
+        return self.materialize().first
+
+    # Filters
+
+    def filter(self, pred: callable) -> UnitsQuery:
+        """ Same as Units.filter
+
+        :param pred: """
+        return self._add(_FILTER, (None, pred))
+
+    def of_type(self, other: Union[UnitTypeId, Set[UnitTypeId], List[UnitTypeId], Dict[UnitTypeId, Any]]) -> UnitsQuery:
+        """ Same as Units.of_type
+
+        :param other: """
+        if isinstance(other, UnitTypeId):
+            other = {other}
+        unit_types = {unit_type.value for unit_type in other}
+
+        def mask(query: UnitsQuery, indices: np.ndarray) -> np.ndarray:
+            units = query._units
+            of_type = np.zeros(len(units), dtype=bool)
+            of_type[units._indices_of_types(unit_types)] = True
+            return of_type[indices]
+
+        return self._add(_FILTER, (mask, None))
+
+    def exclude_type(
+        self, other: Union[UnitTypeId, Set[UnitTypeId], List[UnitTypeId], Dict[UnitTypeId, Any]]
+    ) -> UnitsQuery:
+        """ Same as Units.exclude_type
+
+        :param other: """
+        if isinstance(other, UnitTypeId):
+            other = {other}
+        unit_types = {unit_type.value for unit_type in other}
+
+        def mask(query: UnitsQuery, indices: np.ndarray) -> np.ndarray:
+            units = query._units
+            excluded = np.zeros(len(units), dtype=bool)
+            excluded[units._indices_of_types(unit_types)] = True
+            return ~excluded[indices]
+
+        return self._add(_FILTER, (mask, None))
+
+    def tags_in(self, other: Union[Set[int], List[int], Dict[int, Any]]) -> UnitsQuery:
+        """ Same as Units.tags_in
+
+        :param other: """
+        tags = set(other)
+        tags_array = np.fromiter(tags, dtype=np.uint64, count=len(tags))
+        return self._add(
+            _FILTER, _column_filter("tag", lambda values: np.isin(values, tags_array), lambda unit: unit.tag in tags)
+        )
+
+    def tags_not_in(self, other: Union[Set[int], List[int], Dict[int, Any]]) -> UnitsQuery:
+        """ Same as Units.tags_not_in
+
+        :param other: """
+        tags = set(other)
+        tags_array = np.fromiter(tags, dtype=np.uint64, count=len(tags))
+        return self._add(
+            _FILTER,
+            _column_filter("tag", lambda values: ~np.isin(values, tags_array), lambda unit: unit.tag not in tags),
+        )
+
+    def closer_than(self, distance: Union[int, float], position: Union[Unit, Point2, Point3]) -> UnitsQuery:
+        """ Same as Units.closer_than
+
+        :param distance:
+        :param position: """
+
+        def mask(query: UnitsQuery, indices: np.ndarray) -> np.ndarray:
+            return query._squared_distances(indices, position) < distance ** 2
+
+        return self._add(_FILTER, (mask, None))
+
+    def further_than(self, distance: Union[int, float], position: Union[Unit, Point2, Point3]) -> UnitsQuery:
+        """ Same as Units.further_than
+
+        :param distance:
+        :param position: """
+
+        def mask(query: UnitsQuery, indices: np.ndarray) -> np.ndarray:
+            return distance ** 2 < query._squared_distances(indices, position)
+
+        return self._add(_FILTER, (mask, None))
+
+    def in_distance_between(
+        self, position: Union[Unit, Point2, Tuple[float, float]], distance1: float, distance2: float
+    ) -> UnitsQuery:
+        """ Same as Units.in_distance_between
+
+        :param position:
+        :param distance1:
+        :param distance2: """
+
+        def mask(query: UnitsQuery, indices: np.ndarray) -> np.ndarray:
+            distances_squared = query._squared_distances(indices, position)
+            return (distance1 ** 2 < distances_squared) & (distances_squared < distance2 ** 2)
+
+        return self._add(_FILTER, (mask, None))
+
+    @property
+    def ready(self) -> UnitsQuery:
+        return self._add(_FILTER, _state_filter(STATE_READY, True, lambda unit: unit.is_ready))
+
+    @property
+    def not_ready(self) -> UnitsQuery:
+        return self._add(_FILTER, _state_filter(STATE_READY, False, lambda unit: not unit.is_ready))
+
+    @property
+    def owned(self) -> UnitsQuery:
+        return self._add(_FILTER, _state_filter(STATE_MINE, True, lambda unit: unit.is_mine))
+
+    @property
+    def enemy(self) -> UnitsQuery:
+        return self._add(_FILTER, _state_filter(STATE_ENEMY, True, lambda unit: unit.is_enemy))
+
+    @property
+    def flying(self) -> UnitsQuery:
+        return self._add(_FILTER, _state_filter(STATE_FLYING, True, lambda unit: unit.is_flying))
+
+    @property
+    def not_flying(self) -> UnitsQuery:
+        return self._add(_FILTER, _state_filter(STATE_FLYING, False, lambda unit: not unit.is_flying))
+
+    @property
+    def structure(self) -> UnitsQuery:
+        return self._add(_FILTER, _state_filter(STATE_STRUCTURE, True, lambda unit: unit.is_structure))
+
+    @property
+    def not_structure(self) -> UnitsQuery:
+        return self._add(_FILTER, _state_filter(STATE_STRUCTURE, False, lambda unit: not unit.is_structure))
+
+    @property
+    def idle(self) -> UnitsQuery:
+        return self._add(_FILTER, _state_filter(STATE_IDLE, True, lambda unit: unit.is_idle))
+
+    @property
+    def gathering(self) -> UnitsQuery:
+        return self._add(_FILTER, _state_filter(STATE_GATHERING, True, lambda unit: unit.is_gathering))
+
+    @property
+    def returning(self) -> UnitsQuery:
+        return self._add(_FILTER, _state_filter(STATE_RETURNING, True, lambda unit: unit.is_returning))
+
+    @property
+    def collecting(self) -> UnitsQuery:
+        return self._add(_FILTER, _state_filter(STATE_COLLECTING, True, lambda unit: unit.is_collecting))
+
+    @property
+    def visible(self) -> UnitsQuery:
+        return self._add(_FILTER, _state_filter(STATE_VISIBLE, True, lambda unit: unit.is_visible))
+
+    @property
+    def selected(self) -> UnitsQuery:
+        return self._add(_FILTER, (None, lambda unit: unit.is_selected))
+
+    @property
+    def mineral_field(self) -> UnitsQuery:
+        return self._add(_FILTER, (None, lambda unit: unit.is_mineral_field))
+
+    @property
+    def vespene_geyser(self) -> UnitsQuery:
+        return self._add(_FILTER, (None, lambda unit: unit.is_vespene_geyser))
+
+    # Orderings and limits
+
+    def sorted(self, key: callable, reverse: bool = False) -> UnitsQuery:
+        """ Same as Units.sorted
+
+        :param key:
+        :param reverse: """
+
+        def order(query: UnitsQuery, indices: np.ndarray) -> np.ndarray:
+            units = query._units
+            return np.array(sorted(indices.tolist(), key=lambda index: key(units[index]), reverse=reverse), dtype=int)
+
+        return self._add(_ORDER, order)
+
+    def sorted_by_distance_to(self, position: Union[Unit, Point2], reverse: bool = False) -> UnitsQuery:
+        """ Same as Units.sorted_by_distance_to
+
+        :param position:
+        :param reverse: """
+
+        def order(query: UnitsQuery, indices: np.ndarray) -> np.ndarray:
+            distances_squared = query._squared_distances(indices, position)
+            # Stable like sorted(), units with the same distance keep their order
+            return indices[np.argsort(-distances_squared if reverse else distances_squared, kind="stable")]
+
+        return self._add(_ORDER, order)
+
+    def take(self, n: int) -> UnitsQuery:
+        """ Same as Units.take
+
+        :param n: """
+        return self._add(_TAKE, n)
@@ -0,0 +1,51 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from sc2.ids.unit_typeid import UnitTypeId
+
+import pytest
+
+from benchmark_batched_distances import bots
+
+UNIT_TYPES = [
+    UnitTypeId.SCV,
+    UnitTypeId.PROBE,
+    UnitTypeId.DRONE,
+    UnitTypeId.SUPPLYDEPOT,
+    UnitTypeId.PYLON,
+    UnitTypeId.OVERLORD,
+    UnitTypeId.MARINE,
+    UnitTypeId.ZEALOT,
+    UnitTypeId.ZERGLING,
+    UnitTypeId.COMMANDCENTER,
+]
+
+
+def already_pending_with_copy():
+    # The frame cache used to return a copy of the Counter each time
+    return [
+        [
+            bot._abilities_all_units.copy()[bot._game_data.units[unit_type.value].creation_ability]
+            for unit_type in UNIT_TYPES
+        ]
+        for bot in bots
+    ]
+
+
+def already_pending_frozen():
+    return [[bot.already_pending(unit_type) for unit_type in UNIT_TYPES] for bot in bots]
+
+
+def test_already_pending_with_copy(benchmark):
+    result = benchmark(already_pending_with_copy)
+    assert result == already_pending_frozen()
+
+
+def test_already_pending_frozen(benchmark):
+    result = benchmark(already_pending_frozen)
+    assert len(result) == len(bots)
+
+
+# Run this file using
+# pipenv run pytest test/benchmark_already_pending.py --benchmark-compare
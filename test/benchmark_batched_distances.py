@@ -0,0 +1,74 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import lzma
+import pickle
+
+from sc2.bot_ai import BotAI
+from sc2.game_data import GameData
+from sc2.game_info import GameInfo
+from sc2.game_state import GameState
+
+import pytest
+from typing import List
+
+
+def load_bots() -> List[BotAI]:
+    """ Creates a bot object for each file in test/pickle_data, like test_pickled_data.py does """
+    folder = os.path.join(os.path.dirname(__file__), "pickle_data")
+    bots = []
+    for file in sorted(f for f in os.listdir(folder) if f.endswith(".xz")):
+        with lzma.open(os.path.join(folder, file), "rb") as f:
+            raw_game_data, raw_game_info, raw_observation = pickle.load(f)
+        bot = BotAI()
+        bot._initialize_variables()
+        bot._prepare_start(
+            client=None, player_id=1, game_info=GameInfo(raw_game_info.game_info), game_data=GameData(raw_game_data.data)
+        )
+        bot._prepare_step(state=GameState(raw_observation), proto_game_info=raw_game_info)
+        bots.append(bot)
+    return bots
+
+
+bots = load_bots()
+
+
+def closest_to_in_loop():
+    return [[bot.mineral_field.closest_to(unit) for unit in bot.all_units] for bot in bots]
+
+
+def closest_to_each():
+    return [bot.all_units.closest_to_each(bot.mineral_field) for bot in bots]
+
+
+def closer_than_in_loop():
+    return [[(unit, mineral) for unit in bot.all_units for mineral in bot.mineral_field.closer_than(10, unit)] for bot in bots]
+
+
+def pairs_within():
+    return [bot.all_units.pairs_within(bot.mineral_field, 10) for bot in bots]
+
+
+def test_closest_to_in_loop(benchmark):
+    result = benchmark(closest_to_in_loop)
+    assert result == closest_to_each()
+
+
+def test_closest_to_each(benchmark):
+    result = benchmark(closest_to_each)
+    assert len(result) == len(bots)
+
+
+def test_closer_than_in_loop(benchmark):
+    result = benchmark(closer_than_in_loop)
+    assert result == pairs_within()
+
+
+def test_pairs_within(benchmark):
+    result = benchmark(pairs_within)
+    assert len(result) == len(bots)
+
+
+# Run this file using
+# pipenv run pytest test/benchmark_batched_distances.py --benchmark-compare
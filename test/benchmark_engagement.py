@@ -0,0 +1,31 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import pytest
+
+from benchmark_batched_distances import bots
+
+
+def target_in_range_in_loop():
+    return [
+        [[target for target in bot.all_units if unit.target_in_range(target)] for unit in bot.all_units] for bot in bots
+    ]
+
+
+def engagement_matrix():
+    return [bot.all_units.engagement_with(bot.all_units).targets_in_range_of_each() for bot in bots]
+
+
+def test_target_in_range_in_loop(benchmark):
+    result = benchmark(target_in_range_in_loop)
+    assert result == engagement_matrix()
+
+
+def test_engagement_matrix(benchmark):
+    result = benchmark(engagement_matrix)
+    assert len(result) == len(bots)
+
+
+# Run this file using
+# pipenv run pytest test/benchmark_engagement.py --benchmark-compare
@@ -0,0 +1,53 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from sc2.bot_ai import BotAI
+from sc2.ids.unit_typeid import UnitTypeId
+
+import pytest
+
+from benchmark_batched_distances import bots
+
+UNIT_TYPES = [
+    UnitTypeId.SCV,
+    UnitTypeId.MARINE,
+    UnitTypeId.SUPPLYDEPOT,
+    UnitTypeId.BARRACKS,
+    UnitTypeId.FACTORY,
+    UnitTypeId.ORBITALCOMMAND,
+]
+
+METHODS = [
+    "calculate_cost",
+    "calculate_supply_cost",
+    "already_pending",
+    "structure_type_build_progress",
+    "tech_requirement_progress",
+]
+
+
+def frame_methods_uncached():
+    return [
+        [getattr(BotAI, name).__wrapped__(bot, unit_type) for name in METHODS for unit_type in UNIT_TYPES]
+        for bot in bots
+    ]
+
+
+def frame_methods_cached():
+    # Bots call these several times per step with the same arguments
+    return [[getattr(bot, name)(unit_type) for name in METHODS for unit_type in UNIT_TYPES] for bot in bots]
+
+
+def test_frame_methods_uncached(benchmark):
+    result = benchmark(frame_methods_uncached)
+    assert result == frame_methods_cached()
+
+
+def test_frame_methods_cached(benchmark):
+    result = benchmark(frame_methods_cached)
+    assert len(result) == len(bots)
+
+
+# Run this file using
+# pipenv run pytest test/benchmark_frame_methods.py --benchmark-compare
@@ -0,0 +1,60 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import lzma
+import pickle
+
+from sc2.game_state import GameState
+
+import pytest
+from typing import List
+
+
+def load_observations() -> List:
+    """ Loads the raw observations of all files in test/pickle_data """
+    folder = os.path.join(os.path.dirname(__file__), "pickle_data")
+    observations = []
+    for file in sorted(f for f in os.listdir(folder) if f.endswith(".xz")):
+        with lzma.open(os.path.join(folder, file), "rb") as f:
+            raw_game_data, raw_game_info, raw_observation = pickle.load(f)
+        observations.append(raw_observation)
+    return observations
+
+
+observations = load_observations()
+
+
+def create_game_states():
+    return [GameState(observation) for observation in observations]
+
+
+def create_game_states_and_access_all():
+    game_states = []
+    for observation in observations:
+        state = GameState(observation)
+        _ = (
+            state.psionic_matrix,
+            state.score,
+            state.upgrades,
+            state.dead_units,
+            state.visibility,
+            state.creep,
+            state.effects,
+        )
+        game_states.append(state)
+    return game_states
+
+
+def test_create_game_states(benchmark):
+    result = benchmark(create_game_states)
+    assert len(result) == len(observations)
+
+
+def test_create_game_states_and_access_all(benchmark):
+    result = benchmark(create_game_states_and_access_all)
+    assert len(result) == len(observations)
+
+
+# Run this file using
+# pipenv run pytest test/benchmark_game_state.py --benchmark-compare
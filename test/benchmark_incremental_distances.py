@@ -0,0 +1,62 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import random
+
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from sc2.distances import IncrementalDistanceMatrix
+
+import pytest
+from typing import List, Tuple
+
+random.seed(1)
+np.random.seed(1)
+amount = 600
+frame_amount = 20
+# Fraction of units that move each frame, structures and resources never move
+moving_fraction = 0.1
+
+
+def create_frames() -> List[Tuple[np.ndarray, np.ndarray]]:
+    tags = np.arange(1, amount + 1, dtype=np.uint64)
+    positions = np.random.uniform(0, 200, size=(amount, 2))
+    frames = []
+    for _ in range(frame_amount):
+        positions = positions.copy()
+        moving = np.random.random(amount) < moving_fraction
+        positions[moving] += np.random.uniform(-1, 1, size=(np.count_nonzero(moving), 2))
+        frames.append((tags, positions))
+    return frames
+
+
+frames = create_frames()
+
+
+def full_matrix_each_frame():
+    return [cdist(positions, positions, "sqeuclidean") for tags, positions in frames]
+
+
+def incremental_matrix():
+    matrix = IncrementalDistanceMatrix()
+    updated_rows = 0
+    for tags, positions in frames:
+        matrix.update(tags, positions)
+        updated_rows += matrix.updated_rows
+    return updated_rows
+
+
+def test_full_matrix_each_frame(benchmark):
+    result = benchmark(full_matrix_each_frame)
+    assert len(result) == frame_amount
+
+
+def test_incremental_matrix(benchmark):
+    result = benchmark(incremental_matrix)
+    assert result < amount * frame_amount
+
+
+# Run this file using
+# pipenv run pytest test/benchmark_incremental_distances.py --benchmark-compare
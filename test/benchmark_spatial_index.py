@@ -0,0 +1,61 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import random
+
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from sc2.spatial_index import SpatialIndex
+
+import pytest
+
+random.seed(1)
+map_size = 200
+query_amount = 100
+query_distance = 10
+
+
+def random_positions(amount: int) -> np.ndarray:
+    return np.array([[random.uniform(0, map_size), random.uniform(0, map_size)] for _ in range(amount)])
+
+
+# The index is only used from SPATIAL_INDEX_MIN_UNITS units on, the smaller frames show that it is slower there
+frames = {amount: random_positions(amount) for amount in (300, 600, 1200, 2400)}
+
+
+def frame_with_cdist(positions: np.ndarray):
+    """ Distance calculation method 2: the full matrix is calculated each frame, then each query reads one row """
+    distances_squared = cdist(positions, positions, "sqeuclidean")
+    rows = np.arange(len(positions))
+    found = 0
+    for i in range(query_amount):
+        found += np.count_nonzero(distances_squared[i, rows] < query_distance ** 2)
+    return found
+
+
+def frame_with_spatial_index(positions: np.ndarray):
+    """ Distance calculation method 3: a KD-tree is created each frame, then each query is a range query """
+    index = SpatialIndex(positions)
+    rows = np.arange(len(positions))
+    found = 0
+    for i in range(query_amount):
+        found += np.count_nonzero(index.closer_than(rows, positions[i], query_distance))
+    return found
+
+
+@pytest.mark.parametrize("amount", frames)
+def test_frame_with_cdist(benchmark, amount):
+    result = benchmark(frame_with_cdist, frames[amount])
+    assert result == frame_with_spatial_index(frames[amount])
+
+
+@pytest.mark.parametrize("amount", frames)
+def test_frame_with_spatial_index(benchmark, amount):
+    result = benchmark(frame_with_spatial_index, frames[amount])
+    assert result >= query_amount
+
+
+# Run this file using
+# pipenv run pytest test/benchmark_spatial_index.py --benchmark-compare
@@ -0,0 +1,132 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import functools
+import lzma
+import pickle
+
+from sc2.bot_ai import BotAI
+from sc2.game_data import GameData
+from sc2.game_info import GameInfo
+from sc2.game_state import GameState
+from sc2.ids.unit_typeid import UnitTypeId
+
+import pytest
+
+"""
+Benchmarks the work the library does in each step of a game, for each map in test/pickle_data.
+Each phase is measured separately so it is visible which part of a step became slower:
+- game_state: creating GameState from the observation and accessing its values, which are created on first access
+- prepare_step: BotAI._prepare_step, which creates the units of the frame
+- prepare_first_step: BotAI._prepare_first_step, which finds the ramps and expansions of the map
+- units_queries: a set of Units functions that bots use in each step
+
+Each round uses a new GameState or bot object, so nothing is taken from a cache that was filled in the previous round.
+Creating them is not part of the measured time.
+"""
+
+FOLDER = os.path.join(os.path.dirname(__file__), "pickle_data")
+MAP_FILES = sorted(f for f in os.listdir(FOLDER) if f.endswith(".xz"))
+
+# The first step takes much longer than the other phases, so it is measured fewer times
+ROUNDS = 20
+FIRST_STEP_ROUNDS = 3
+
+
+@functools.lru_cache(maxsize=1)
+def load_map(map_file: str):
+    """ Returns the raw game data, game info and observation of a file in test/pickle_data """
+    with lzma.open(os.path.join(FOLDER, map_file), "rb") as f:
+        return pickle.load(f)
+
+
+def create_bot(map_file: str, prepare_step: bool = True) -> BotAI:
+    """ Creates a bot object like test_pickled_data.py does """
+    raw_game_data, raw_game_info, raw_observation = load_map(map_file)
+    bot = BotAI()
+    bot._initialize_variables()
+    bot._prepare_start(
+        client=None, player_id=1, game_info=GameInfo(raw_game_info.game_info), game_data=GameData(raw_game_data.data)
+    )
+    if prepare_step:
+        bot._prepare_step(state=GameState(raw_observation), proto_game_info=raw_game_info)
+    return bot
+
+
+def create_game_state(raw_observation) -> GameState:
+    state = GameState(raw_observation)
+    _ = (
+        state.common,
+        state.psionic_matrix,
+        state.score,
+        state.upgrades,
+        state.dead_units,
+        state.visibility,
+        state.creep,
+        state.effects,
+    )
+    return state
+
+
+def units_queries(bot: BotAI):
+    townhall = bot.townhalls.first
+    idle_workers = bot.workers.idle
+    return (
+        bot.mineral_field.closest_to(townhall),
+        bot.mineral_field.closer_than(10, townhall),
+        bot.vespene_geyser.closer_than(10, townhall),
+        bot.workers.sorted_by_distance_to(townhall.position),
+        bot.workers.closest_to_each(bot.mineral_field),
+        bot.all_units.of_type({UnitTypeId.MINERALFIELD, UnitTypeId.MINERALFIELD750}),
+        bot.all_units.exclude_type(UnitTypeId.SCV).not_structure,
+        bot.structures.ready.tags_in(bot.townhalls.tags),
+        bot.enemy_structures.in_distance_between(townhall, 5, 50),
+        bot.units.in_attack_range_of(townhall, bonus_distance=10),
+        bot.engagement.threatened_units(),
+        idle_workers.center if idle_workers else townhall.position,
+        bot.resources.in_distance_of_group(bot.workers, 8),
+    )
+
+
+@pytest.mark.parametrize("map_file", MAP_FILES)
+def test_game_state(benchmark, map_file):
+    _, _, raw_observation = load_map(map_file)
+    state = benchmark.pedantic(create_game_state, args=(raw_observation,), rounds=ROUNDS)
+    assert state.game_loop == raw_observation.observation.game_loop
+
+
+@pytest.mark.parametrize("map_file", MAP_FILES)
+def test_prepare_step(benchmark, map_file):
+    _, raw_game_info, raw_observation = load_map(map_file)
+    bot = create_bot(map_file, prepare_step=False)
+
+    def setup():
+        return (GameState(raw_observation),), {"proto_game_info": raw_game_info}
+
+    benchmark.pedantic(bot._prepare_step, setup=setup, rounds=ROUNDS)
+    assert bot.townhalls
+
+
+@pytest.mark.parametrize("map_file", MAP_FILES)
+def test_prepare_first_step(benchmark, map_file):
+    bots = []
+
+    def setup():
+        bots.append(create_bot(map_file))
+        return (bots[-1],), {}
+
+    benchmark.pedantic(BotAI._prepare_first_step, setup=setup, rounds=FIRST_STEP_ROUNDS)
+    assert bots[-1].expansion_locations
+
+
+@pytest.mark.parametrize("map_file", MAP_FILES)
+def test_units_queries(benchmark, map_file):
+    result = benchmark.pedantic(units_queries, setup=lambda: ((create_bot(map_file),), {}), rounds=ROUNDS)
+    assert result[0] in result[1]
+
+
+# Run this file using
+# pipenv run pytest test/benchmark_step.py --benchmark-compare
+# To see the medians of each phase per map and save them as json, e.g. to compare two versions of the library:
+# pipenv run pytest test/benchmark_step.py --benchmark-group-by=param:map_file --benchmark-columns=median --benchmark-json=benchmark_step.json
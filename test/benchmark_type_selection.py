@@ -0,0 +1,47 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from sc2.ids.unit_typeid import UnitTypeId
+
+import pytest
+
+from benchmark_batched_distances import bots
+
+# Selections that a bot could make in one step, each one several times
+SELECTIONS = [UnitTypeId.SCV, {UnitTypeId.MINERALFIELD, UnitTypeId.MINERALFIELD750}, {UnitTypeId.MARINE}] * 10
+
+
+def select_with_filter():
+    """ How UnitSelection and Units.of_type selected units before they used Units._type_index """
+    result = []
+    for bot in bots:
+        for selection in SELECTIONS:
+            if isinstance(selection, UnitTypeId):
+                selection = {selection}
+            result.append(bot.all_units.filter(lambda unit: unit.type_id in selection))
+    return result
+
+
+def select_with_type_index():
+    result = []
+    for bot in bots:
+        # The type index is created once per frame, in the first selection of the frame
+        bot.all_units._type_index_dict = None
+        for selection in SELECTIONS:
+            result.append(bot.all_units.of_type(selection))
+    return result
+
+
+def test_select_with_filter(benchmark):
+    result = benchmark(select_with_filter)
+    assert result == select_with_type_index()
+
+
+def test_select_with_type_index(benchmark):
+    result = benchmark(select_with_type_index)
+    assert len(result) == len(bots) * len(SELECTIONS)
+
+
+# Run this file using
+# pipenv run pytest test/benchmark_type_selection.py --benchmark-compare
@@ -0,0 +1,96 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import lzma
+import pickle
+
+from sc2.bot_ai import BotAI
+from sc2.game_data import GameData
+from sc2.game_info import GameInfo
+from sc2.game_state import GameState
+from sc2.unit import Unit
+
+import pytest
+from typing import List, Tuple
+
+
+def load_bots() -> List[BotAI]:
+    """ Creates a bot object for each file in test/pickle_data, like test_pickled_data.py does """
+    folder = os.path.join(os.path.dirname(__file__), "pickle_data")
+    bots = []
+    for file in sorted(f for f in os.listdir(folder) if f.endswith(".xz")):
+        with lzma.open(os.path.join(folder, file), "rb") as f:
+            raw_game_data, raw_game_info, raw_observation = pickle.load(f)
+        bot = BotAI()
+        bot._initialize_variables()
+        bot._prepare_start(
+            client=None, player_id=1, game_info=GameInfo(raw_game_info.game_info), game_data=GameData(raw_game_data.data)
+        )
+        bot._prepare_step(state=GameState(raw_observation), proto_game_info=raw_game_info)
+        bots.append(bot)
+    return bots
+
+
+bots = load_bots()
+frames: List[Tuple[BotAI, list]] = [(bot, bot._frame_units._protos) for bot in bots]
+# Unit types of the protos, which BotAI._prepare_units reads anyway
+frames_with_types: List[Tuple[BotAI, list, list]] = [
+    (bot, bot._frame_units._protos, bot._frame_units._type_id_list) for bot in bots
+]
+
+
+def create_units():
+    return [Unit(proto, bot) for bot, protos in frames for proto in protos]
+
+
+def create_units_from_frame():
+    return [
+        Unit._from_frame(proto, bot, unit_type)
+        for bot, protos, unit_types in frames_with_types
+        for proto, unit_type in zip(protos, unit_types)
+    ]
+
+
+def create_units_and_access_properties():
+    total = 0
+    for bot, protos, unit_types in frames_with_types:
+        for proto, unit_type in zip(protos, unit_types):
+            unit = Unit._from_frame(proto, bot, unit_type)
+            # Properties that are used by most bots on most units each frame
+            if unit.tag and unit.type_id and unit.position and not unit.is_structure and unit.can_attack_ground:
+                total += unit.ground_range + unit.health + unit.is_mine
+    return total
+
+
+def access_properties(units: List[Unit]):
+    total = 0
+    for unit in units:
+        if unit.tag and unit.type_id and unit.position and not unit.is_structure and unit.can_attack_ground:
+            total += unit.ground_range + unit.health + unit.is_mine
+    return total
+
+
+def test_create_units(benchmark):
+    result = benchmark(create_units)
+    assert len(result) == sum(len(protos) for bot, protos in frames)
+
+
+def test_create_units_from_frame(benchmark):
+    result = benchmark(create_units_from_frame)
+    assert len(result) == sum(len(protos) for bot, protos in frames)
+
+
+def test_create_units_and_access_properties(benchmark):
+    result = benchmark(create_units_and_access_properties)
+    assert result > 0
+
+
+def test_access_properties(benchmark):
+    units = create_units()
+    result = benchmark(access_properties, units)
+    assert result > 0
+
+
+# Run this file using
+# pipenv run pytest test/benchmark_unit_creation.py --benchmark-compare
@@ -0,0 +1,42 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import pytest
+
+from benchmark_batched_distances import bots
+
+
+def filters_with_lambda():
+    return [
+        (
+            units.filter(lambda unit: unit.is_ready),
+            units.filter(lambda unit: unit.is_idle),
+            units.filter(lambda unit: not unit.is_structure),
+            units.filter(lambda unit: unit.is_collecting),
+            units.filter(lambda unit: unit.is_visible),
+            units.filter(lambda unit: unit.is_mine),
+        )
+        for units in (bot.all_units for bot in bots)
+    ]
+
+
+def filters_with_states():
+    return [
+        (units.ready, units.idle, units.not_structure, units.collecting, units.visible, units.owned)
+        for units in (bot.all_units for bot in bots)
+    ]
+
+
+def test_filters_with_lambda(benchmark):
+    result = benchmark(filters_with_lambda)
+    assert result == filters_with_states()
+
+
+def test_filters_with_states(benchmark):
+    result = benchmark(filters_with_states)
+    assert len(result) == len(bots)
+
+
+# Run this file using
+# pipenv run pytest test/benchmark_unit_states.py --benchmark-compare
@@ -0,0 +1,41 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import pytest
+
+from benchmark_batched_distances import bots
+
+
+def units_chains():
+    return [
+        bot.all_units.filter(lambda unit: unit.tag % 2)
+        .not_structure.ready.closer_than(30, bot.townhalls[0])
+        .sorted_by_distance_to(bot.game_info.map_center)
+        for bot in bots
+    ]
+
+
+def units_queries():
+    return [
+        bot.all_units.query()
+        .filter(lambda unit: unit.tag % 2)
+        .not_structure.ready.closer_than(30, bot.townhalls[0])
+        .sorted_by_distance_to(bot.game_info.map_center)
+        .materialize()
+        for bot in bots
+    ]
+
+
+def test_units_chains(benchmark):
+    result = benchmark(units_chains)
+    assert result == units_queries()
+
+
+def test_units_queries(benchmark):
+    result = benchmark(units_queries)
+    assert len(result) == len(bots)
+
+
+# Run this file using
+# pipenv run pytest test/benchmark_units_query.py --benchmark-compare
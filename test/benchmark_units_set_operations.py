@@ -0,0 +1,54 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from sc2.unit import Unit
+from sc2.units import Units
+
+import pytest
+from itertools import chain
+
+from benchmark_batched_distances import bots
+
+# Two groups of 200 units, half of the units are in both groups
+bot = bots[0]
+proto = bot.workers[0]._proto
+units_by_tag = {}
+for tag in range(1, 301):
+    unit_proto = type(proto)()
+    unit_proto.CopyFrom(proto)
+    unit_proto.tag = tag
+    units_by_tag[tag] = Unit(unit_proto, bot)
+units1 = Units((units_by_tag[tag] for tag in range(1, 201)), bot)
+units2 = Units((units_by_tag[tag] for tag in range(101, 301)), bot)
+tags = list(range(50, 250))
+
+
+def set_operations_compare_all_tags():
+    """ How Units.__or__, __and__ and __sub__ compared the tags before they used Units._tag_index """
+    return (
+        Units(chain(iter(units1), (u2 for u2 in units2 if u2.tag not in (u1.tag for u1 in units1))), bot),
+        Units((u2 for u2 in units2 if u2.tag in (u1.tag for u1 in units1)), bot),
+        Units((u1 for u1 in units1 if u1.tag not in (u2.tag for u2 in units2)), bot),
+        [next((unit for unit in units1 if unit.tag == tag), None) for tag in tags],
+    )
+
+
+def set_operations():
+    # New Units objects, so the tag index is created in each round
+    a, b = Units(units1, bot), Units(units2, bot)
+    return a | b, a & b, a - b, [a.find_by_tag(tag) for tag in tags]
+
+
+def test_set_operations_compare_all_tags(benchmark):
+    result = benchmark(set_operations_compare_all_tags)
+    assert result == set_operations()
+
+
+def test_set_operations(benchmark):
+    result = benchmark(set_operations)
+    assert len(result[0]) == 300 and len(result[1]) == len(result[2]) == 100
+
+
+# Run this file using
+# pipenv run pytest test/benchmark_units_set_operations.py --benchmark-compare
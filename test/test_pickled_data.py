@@ -6,8 +6,24 @@ from sc2.game_data import GameData
 from sc2.game_info import GameInfo
 from sc2.game_info import Ramp
 from sc2.game_state import GameState
+from sc2.pixel_map import PixelMap
+from sc2.unit_table import UNIT_TABLE_DTYPE, STATE_FLYING, STATE_IDLE, unit_state, unit_states, unit_table_row
 from sc2.bot_ai import BotAI
+from sc2.observer_ai import ObserverAI
+from sc2 import cache
+from sc2.cache import (
+    FrozenCounter,
+    FrozenDict,
+    clear_method_cache,
+    freeze,
+    method_cache_once_per_frame,
+    property_cache_forever,
+    property_cache_once_per_frame,
+    property_immutable_cache,
+    property_mutable_cache,
+)
 from sc2.units import Units
+from sc2.unit_registry import UnitRegistry
 from sc2.unit import Unit
 from sc2.position import Point2, Point3, Size, Rect
 from sc2.game_data import Cost
@@ -19,8 +35,23 @@ from sc2.ids.buff_id import BuffId
 from sc2.ids.effect_id import EffectId
 
 from sc2.data import Race
+from sc2.distances import (
+    DISTANCE_MODE_CONDENSED,
+    DISTANCE_MODE_DENSE,
+    DISTANCE_MODE_SCALAR,
+    FRIENDLY_BLOCK,
+    NEUTRAL_BLOCK,
+    IncrementalDistanceMatrix,
+    squared_distances,
+)
+from scipy.spatial.distance import cdist
+from sc2.constants import IS_STRUCTURE
+
+from s2clientprotocol import raw_pb2 as raw_pb, sc2api_pb2 as sc_pb
 
-import pickle, pytest, random, math, lzma
+import asyncio, itertools, pickle, pytest, random, math, lzma
+from collections import Counter
+import numpy as np
 from hypothesis import given, event, settings, strategies as st
 
 from typing import Iterable
@@ -59,6 +90,24 @@ def get_map_specific_bots() -> Iterable[BotAI]:
         yield bot
 
 
+def create_bot(source_bot: BotAI, observation=None, **attributes) -> BotAI:
+    """ Builds a fresh bot object with the game info and game data of 'source_bot' and prepares one step.
+
+    :param source_bot:
+    :param observation: The ResponseObservation of the step, the one of 'source_bot' if None
+    :param attributes: Set on the bot before _initialize_variables, e.g. distance_calculation_method=3 """
+    bot = BotAI()
+    for name, value in attributes.items():
+        setattr(bot, name, value)
+    bot._initialize_variables()
+    bot._prepare_start(client=None, player_id=1, game_info=source_bot._game_info, game_data=source_bot._game_data)
+    if observation is None:
+        observation = source_bot.state.response_observation
+    proto_game_info = sc_pb.Response(game_info=source_bot._game_info._proto)
+    bot._prepare_step(state=GameState(observation), proto_game_info=proto_game_info)
+    return bot
+
+
 # Global bot object that is used in TestClass.test_position_*
 bot_object_generator = get_map_specific_bots()
 random_bot_object: BotAI = next(bot_object_generator)
@@ -430,13 +479,942 @@ def test_game_info():
     assert game_info.player_start_location
 
 
+def test_pathing_grid_update():
+    bot: BotAI = next(bot_object_generator)
+    proto_game_info = sc_pb.Response(game_info=bot._game_info._proto)
+
+    # By default a new pathing grid is requested every step
+    assert bot.pathing_grid_update_interval == 0
+    assert bot._should_update_pathing_grid()
+    assert bot.pathing_grid_update_time[:2] == (1, 0)
+
+    # Only request a new pathing grid if pathing blockers changed
+    bot.pathing_grid_update_interval = None
+    assert bot._should_update_pathing_grid()
+    bot._update_pathing_grid(proto_game_info)
+    assert [bot.townhalls.first.tag, bot.townhalls.first._proto.unit_type] in bot._pathing_grid_blockers.tolist()
+    assert len(bot._pathing_grid_blockers) == sum(
+        units.amount
+        for units in (bot.structures, bot.enemy_structures, bot.destructables, bot.mineral_field, bot.vespene_geyser)
+    )
+    assert not bot._should_update_pathing_grid()
+    assert bot.pathing_grid_update_time[:2] == (2, 1)
+    # A structure changed its type, e.g. a supply depot was lowered
+    bot._pathing_grid_blockers[0, 1] = UnitTypeId.SUPPLYDEPOTLOWERED.value
+    assert bot._should_update_pathing_grid()
+    bot._update_pathing_grid(proto_game_info)
+    assert not bot._should_update_pathing_grid()
+    # A structure was destroyed
+    bot._pathing_grid_blockers = np.vstack(
+        (bot._pathing_grid_blockers, np.array([[0, UnitTypeId.SUPPLYDEPOT.value]], dtype=np.uint64))
+    )
+    assert bot._should_update_pathing_grid()
+    bot._update_pathing_grid(proto_game_info)
+    assert not bot._should_update_pathing_grid()
+    # Only requests that were sent on their own are included in the average duration
+    assert bot.pathing_grid_update_time[2] == 0
+    bot._update_pathing_grid(proto_game_info, 0.004)
+    bot._update_pathing_grid(proto_game_info, 0.002)
+    assert bot.pathing_grid_update_time[0] == 6 and bot.pathing_grid_update_time[2] == pytest.approx(3)
+
+    # Request a new pathing grid after some game loops, even if nothing changed
+    bot.pathing_grid_update_interval = 16
+    assert not bot._should_update_pathing_grid()
+    bot._pathing_grid_game_loop -= 16
+    assert bot._should_update_pathing_grid()
+
+
+def test_unit_table():
+    bot: BotAI = random_bot_object
+    table = bot.unit_table
+
+    assert len(table) == bot.all_units.amount
+    for unit, row in zip(bot.all_units, table):
+        assert row["tag"] == unit.tag
+        assert row["type_id"] == unit._proto.unit_type
+        assert row["alliance"] == unit.alliance
+        assert (row["x"], row["y"], row["z"]) == unit.position3d
+        assert row["radius"] == unit.radius
+        assert row["health"] == unit.health
+        assert row["shield"] == unit.shield
+        assert row["energy"] == unit.energy
+        assert row["build_progress"] == unit.build_progress
+        assert row["is_flying"] == unit.is_flying
+        assert row["is_structure"] == unit.is_structure
+        assert row["add_on_tag"] == unit.add_on_tag
+
+    # Units objects of the bot are views into the unit table
+    for units in [bot.units, bot.structures, bot.mineral_field, bot.vespene_geyser, bot.destructables]:
+        assert units._table_indices is not None
+        assert units.table["tag"].tolist() == [unit.tag for unit in units]
+        # Units created from these units fall back to creating the rows from the units
+        assert units.filter(lambda unit: True)._table_indices is None
+        assert units.filter(lambda unit: True).table.tolist() == units.table.tolist()
+    assert bot.townhalls.table["is_structure"].all()
+
+    # Changing the list invalidates the rows
+    workers = bot.workers.copy()
+    assert workers._table_indices is not None
+    workers.pop()
+    assert workers._table_indices is None
+    assert len(workers.table) == bot.workers.amount - 1
+
+
+def test_lazy_unit_ingest():
+    eager_bot: BotAI = next(bot_object_generator)
+    bot = create_bot(eager_bot, lazy_unit_ingest=True)
+
+    # No Unit objects and no unit table were created, but tags and positions are available for distance calculations
+    assert not bot._frame_units._categories
+    assert all(unit is None for unit in bot._frame_units._unit_objects)
+    assert not bot._frame_units.has_unit_table
+    assert not create_bot(eager_bot)._frame_units.has_unit_table
+    # The unit registry gets the same result from the protos as from the unit table
+    registry = UnitRegistry()
+    registry.update(*bot._frame_units.tracked_units())
+    table_registry = UnitRegistry()
+    table_registry.update(create_bot(eager_bot).unit_table)
+    assert registry.added == table_registry.added
+    assert registry.added_rows.tolist() == table_registry.added_rows.tolist()
+    assert bot._frame_units.tags.tolist() == [unit.tag for unit in eager_bot.all_units]
+    assert bot.unit_table["tag"].tolist() == [unit.tag for unit in eager_bot.all_units]
+    assert bot._unit_index_dict == eager_bot._unit_index_dict
+
+    # Only the accessed units are created
+    mineral_field = bot.mineral_field
+    assert set(bot._frame_units._categories) == {"mineral_field"}
+    assert sum(unit is not None for unit in bot._frame_units._unit_objects) == mineral_field.amount
+    assert bot.mineral_field is mineral_field
+    assert bot.all_units.first is bot._frame_units.unit(0)
+
+    for name in ("all_units",) + BotAI._unit_categories:
+        assert [unit.tag for unit in getattr(bot, name)] == [unit.tag for unit in getattr(eager_bot, name)], name
+    assert [unit.is_snapshot for unit in bot.enemy_units] == [unit.is_snapshot for unit in eager_bot.enemy_units]
+    assert bot.blips == eager_bot.blips
+    assert bot.techlab_tags == eager_bot.techlab_tags
+    assert bot.reactor_tags == eager_bot.reactor_tags
+
+    # Units attributes can still be assigned, e.g. by bots that filter them
+    bot.units = bot.units.filter(lambda unit: False)
+    assert not bot.units
+
+
+def test_spatial_index_distance_method(monkeypatch):
+    bot2: BotAI = next(bot_object_generator)
+    bot3 = create_bot(bot2, distance_calculation_method=3)
+
+    def tags(units: Units):
+        return [unit.tag for unit in units]
+
+    # The pickled frames have too few units for the index, so the other functions are used
+    assert bot3.all_units._spatial_index_rows() is None
+    center = bot2.game_info.map_center
+    assert tags(bot3.all_units.closer_than(40, center)) == tags(bot2.all_units.closer_than(40, center))
+    monkeypatch.setattr("sc2.units.SPATIAL_INDEX_MIN_UNITS", 0)
+    assert bot3.all_units._spatial_index_rows() is not None
+
+    random.seed(5)
+    checked_attack_range = False
+    for name in ("all_units", "mineral_field", "townhalls", "workers", "enemy_units", "enemy_structures", "resources"):
+        units2, units3 = getattr(bot2, name), getattr(bot3, name)
+        if not units3:
+            continue
+        # Subgroups that are not a Units attribute of the bot
+        units2, units3 = units2.filter(lambda unit: unit.tag % 3), units3.filter(lambda unit: unit.tag % 3)
+        if not units3:
+            continue
+        assert bot3._unit_rows(units3) is not None
+        for target2, target3 in [(center, center), (bot2.workers[0], bot3.workers[0])] + [
+            (bot2.all_units[i], bot3.all_units[i]) for i in random.sample(range(len(bot3.all_units)), 5)
+        ]:
+            assert units3.closest_to(target3).tag == units2.closest_to(target2).tag
+            for distance in (0, 3, 10, 40, 500):
+                assert tags(units3.closer_than(distance, target3)) == tags(units2.closer_than(distance, target2))
+                assert tags(units3.further_than(distance, target3)) == tags(units2.further_than(distance, target2))
+                assert tags(units3.in_distance_between(target3, distance / 2, distance)) == tags(
+                    units2.in_distance_between(target2, distance / 2, distance)
+                )
+            if isinstance(target3, Unit):
+                for bonus_distance in (0, 5):
+                    in_range = units3.in_attack_range_of(target3, bonus_distance)
+                    assert tags(in_range) == tags(units2.in_attack_range_of(target2, bonus_distance))
+                    checked_attack_range = checked_attack_range or bool(in_range)
+        for distance in (1, 8, 30):
+            assert tags(units3.in_distance_of_group(bot3.structures, distance)) == tags(
+                units2.in_distance_of_group(bot2.structures, distance)
+            )
+        # Results keep their rows, so they can be queried again without looking up the tags
+        close = units3.closer_than(30, center)
+        assert close._table_indices is not None
+        assert tags(close.closer_than(15, center)) == tags(units2.closer_than(15, center))
+    assert checked_attack_range
+
+
+def test_lazy_distance_blocks():
+    bot: BotAI = next(bot_object_generator)
+    assert bot.distance_calculation_method == 2
+    # No distances are calculated before they are needed
+    assert bot._cached_cdist is None
+    assert not bot._cached_distance_blocks
+
+    worker, mineral = bot.workers[0], bot.mineral_field[0]
+    assert bot._distance_squared_unit_to_unit(worker, mineral) == pytest.approx(
+        worker.position._distance_squared(mineral.position)
+    )
+    assert bot._distance_squared_unit_to_unit(mineral, worker) == bot._distance_squared_unit_to_unit(worker, mineral)
+    # Only the block of own units and neutral units was calculated
+    assert set(bot._cached_distance_blocks) == {(FRIENDLY_BLOCK, NEUTRAL_BLOCK)}
+
+    # The blocks contain the same distances as the full matrix
+    units = random.sample(list(bot.all_units), min(60, len(bot.all_units)))
+    for unit1 in units:
+        for unit2 in units:
+            index1, index2 = bot._unit_index_dict[unit1.tag], bot._unit_index_dict[unit2.tag]
+            assert bot._distance_squared_unit_to_unit(unit1, unit2) == bot._cdist[index1, index2]
+
+
+def test_distance_settings():
+    # Other subclasses of DistanceCalculation have the settings that BotAI has
+    observer = ObserverAI()
+    observer._initialize_variables()
+    assert observer.distance_matrix_float32 is False
+    assert observer.distance_matrix_memory_limit is None
+    bot = BotAI()
+    bot.distance_matrix_float32 = True
+    bot._initialize_variables()
+    assert bot.distance_matrix_float32 is True
+
+
+def test_observer_distances():
+    bot: BotAI = next(bot_object_generator)
+    for method in (2, 4):
+        observer = ObserverAI()
+        observer.distance_calculation_method = method
+        observer._initialize_variables()
+        observer._prepare_start(client=None, player_id=1, game_info=bot._game_info, game_data=bot._game_data)
+        observer._prepare_step(state=GameState(bot.state.response_observation))
+        assert observer.distance_mode == DISTANCE_MODE_DENSE
+        assert len(observer.all_units) == len(bot.all_units)
+        units = random.sample(list(observer.all_units), min(20, len(observer.all_units)))
+        for unit1 in units:
+            for unit2 in units:
+                assert observer._distance_squared_unit_to_unit(unit1, unit2) == pytest.approx(
+                    unit1.position._distance_squared(unit2.position)
+                )
+        # The tags are only collected once per frame
+        assert observer._all_unit_tags is observer._all_unit_tags
+        assert observer._distance_queries == (len(units) ** 2 if method == 4 else 0)
+
+
+def test_automatic_distance_mode():
+    bot2: BotAI = next(bot_object_generator)
+    bot = create_bot(bot2, distance_calculation_method=4, distance_matrix_float32=True)
+
+    units_count = len(bot.all_units)
+    units = random.sample(list(bot.all_units), min(30, units_count))
+    units2 = [bot2.all_units.by_tag(unit.tag) for unit in units]
+
+    def assert_distances():
+        for unit1, unit2 in zip(units, units2):
+            for other1, other2 in zip(units, units2):
+                assert bot._distance_squared_unit_to_unit(unit1, other1) == pytest.approx(
+                    bot2._distance_squared_unit_to_unit(unit2, other2), rel=1e-6, abs=1e-6
+                )
+
+    # Nothing was measured in the first frame
+    assert bot.distance_mode == DISTANCE_MODE_DENSE
+    assert_distances()
+    assert bot._cached_distance_blocks
+    assert all(block.dtype == np.float32 for block in bot._cached_distance_blocks.values())
+
+    # Many queries, but the dense matrix is above the memory limit
+    bot._distance_queries = units_count * units_count
+    bot.distance_matrix_memory_limit = units_count * units_count * 4 - 1
+    bot._select_distance_mode()
+    assert bot.distance_mode == DISTANCE_MODE_CONDENSED
+    assert_distances()
+    assert bot._cached_pdist.dtype == np.float32
+    # Queries are counted
+    assert bot._distance_queries == len(units) ** 2
+
+    bot._distance_queries = units_count * units_count
+    bot.distance_matrix_memory_limit = 0
+    bot._select_distance_mode()
+    assert bot.distance_mode == DISTANCE_MODE_SCALAR
+
+    # Only a few queries in the previous frame
+    bot.distance_matrix_memory_limit = None
+    bot._distance_queries = 1
+    bot._select_distance_mode()
+    assert bot.distance_mode == DISTANCE_MODE_SCALAR
+    assert_distances()
+    bot._select_distance_mode()
+    assert bot.distance_mode == DISTANCE_MODE_DENSE
+
+    positions = np.array([[10.5, 20.25], [100.0, 3.0], [50.125, 60.0]])
+    distances32 = squared_distances(positions, positions, float32=True)
+    assert distances32.dtype == np.float32
+    assert distances32 == pytest.approx(squared_distances(positions, positions), rel=1e-6)
+
+
+def test_incremental_distance_matrix():
+    random.seed(7)
+    unit_table = random_bot_object.unit_table
+    tags = unit_table["tag"].copy()
+    positions = np.column_stack((unit_table["x"], unit_table["y"])).astype(float)
+    matrix = IncrementalDistanceMatrix()
+    next_tag = int(tags.max()) + 1
+    for frame in range(12):
+        if frame:
+            # Some units die, some move and some are created
+            keep = np.array([random.random() > 0.05 for _ in tags], dtype=bool)
+            tags, positions = tags[keep], positions[keep]
+            moved = np.array([random.random() < 0.1 for _ in tags], dtype=bool)
+            positions[moved] += np.random.uniform(-1, 1, size=(np.count_nonzero(moved), 2))
+            new_tags = np.arange(next_tag, next_tag + 3, dtype=np.uint64)
+            next_tag += 3
+            tags = np.concatenate((tags, new_tags))
+            positions = np.concatenate((positions, np.random.uniform(0, 150, size=(3, 2))))
+        matrix.update(tags, positions)
+        if frame:
+            assert matrix.updated_rows < len(tags)
+        slots = matrix.slots
+        assert (matrix.matrix[np.ix_(slots, slots)] == cdist(positions, positions, "sqeuclidean")).all()
+
+
+def test_incremental_distance_method():
+    bot2: BotAI = next(bot_object_generator)
+    # The recorded frame, then the same frame where some units moved and some are gone
+    bot5 = create_bot(bot2, distance_calculation_method=5)
+    unit = bot5.all_units[0]
+    assert bot5._distance_squared_unit_to_unit(unit, unit) == 0
+    second_frame = sc_pb.ResponseObservation()
+    second_frame.CopyFrom(bot2.state.response_observation)
+    second_frame.observation.game_loop += 8
+    raw_units = second_frame.observation.raw_data.units
+    for index, unit in enumerate(raw_units):
+        if index % 7 == 0:
+            unit.pos.x += 0.5
+    del raw_units[5]
+    del raw_units[1]
+    bot2 = create_bot(bot5, second_frame)
+
+    bot5._prepare_step(state=GameState(second_frame), proto_game_info=sc_pb.Response(game_info=bot5._game_info._proto))
+    unit = bot5.all_units[0]
+    assert bot5._distance_squared_unit_to_unit(unit, unit) == 0
+    assert bot5._incremental_distances.updated_rows < len(bot5.all_units)
+
+    for unit5, unit2 in zip(bot5.all_units, bot2.all_units):
+        for other5, other2 in zip(bot5.all_units, bot2.all_units):
+            assert bot5._distance_squared_unit_to_unit(unit5, other5) == bot2._distance_squared_unit_to_unit(
+                unit2, other2
+            )
+
+
+def test_batched_distance_queries():
+    bot: BotAI = random_bot_object
+    groups = [bot.workers, bot.mineral_field, bot.structures, bot.all_units.filter(lambda unit: unit.tag % 2)]
+    for units in groups:
+        for other_units in groups:
+            assert [unit.tag for unit in units.closest_to_each(other_units)] == [
+                other_units.closest_to(unit).tag for unit in units
+            ]
+            assert units.closest_distance_to_each(other_units) == pytest.approx(
+                [other_units.closest_distance_to(unit) for unit in units]
+            )
+            distances = units.distance_matrix_to(other_units)
+            assert distances.shape == (len(units), len(other_units))
+            assert distances[0, -1] == pytest.approx(units[0].distance_to(other_units[-1]))
+            for distance in (0, 5, 20):
+                assert [(unit1.tag, unit2.tag) for unit1, unit2 in units.pairs_within(other_units, distance)] == [
+                    (unit1.tag, unit2.tag) for unit1 in units for unit2 in other_units.closer_than(distance, unit1)
+                ]
+    # Units that are not part of the current frame
+    memory_units = Units([Unit(unit._proto, bot) for unit in bot.workers], bot)
+    for unit in memory_units:
+        unit.is_memory = True
+    assert [unit.tag for unit in memory_units.closest_to_each(bot.townhalls)] == [bot.townhalls[0].tag] * len(memory_units)
+    assert not Units([], bot).closest_to_each(bot.workers)
+    assert not bot.workers.pairs_within(Units([], bot), 10)
+
+
+def test_units_tag_index():
+    bot: BotAI = random_bot_object
+    workers = bot.workers.copy()
+    half = bot.all_units.filter(lambda unit: unit.tag % 2)
+    for units, other in ((bot.all_units, half), (half, bot.all_units), (workers, bot.mineral_field), (half, [])):
+        other = Units(other, bot)
+        # Same results as comparing the tags of all pairs
+        assert units | other == units + [o for o in other if all(o.tag != u.tag for u in units)]
+        assert units + other == units | other
+        assert units & other == [o for o in other if any(o.tag == u.tag for u in units)]
+        assert units - other == [u for u in units if all(u.tag != o.tag for o in other)]
+        assert units - list(other) == units - other
+        assert units.tags == {unit.tag for unit in units}
+        for unit in other:
+            assert units.find_by_tag(unit.tag) == next((u for u in units if u.tag == unit.tag), None)
+        tags = [unit.tag for unit in other]
+        assert units.tags_in(tags) == [unit for unit in units if unit.tag in tags]
+        assert units.tags_not_in(tags) == [unit for unit in units if unit.tag not in tags]
+
+    # The index is created again after each change of the list
+    mineral = bot.mineral_field[0]
+    assert workers.find_by_tag(mineral.tag) is None
+    workers.append(mineral)
+    assert workers.by_tag(mineral.tag) is mineral
+    workers.insert(0, mineral)
+    assert workers.tags == {unit.tag for unit in workers} and workers.find_by_tag(mineral.tag) is workers[0]
+    # The first unit with a tag is found
+    duplicate = Unit(mineral._proto, bot)
+    workers.insert(0, duplicate)
+    assert workers.by_tag(mineral.tag) is duplicate
+    workers.remove(duplicate)
+    workers.clear()
+    with pytest.raises(KeyError):
+        workers.by_tag(mineral.tag)
+
+
+def test_units_type_index():
+    bot: BotAI = random_bot_object
+    unit_data = bot._game_data.units
+    # Units of types that have tech or unit aliases, next to the units of the frame
+    townhall_proto = bot.townhalls[0]._proto
+    alias_units = []
+    for tag, unit_type in enumerate(
+        (UnitTypeId.LAIR, UnitTypeId.HIVE, UnitTypeId.ORBITALCOMMANDFLYING, UnitTypeId.ROACHBURROWED, UnitTypeId.SPIRE)
+    ):
+        proto = type(townhall_proto)()
+        proto.CopyFrom(townhall_proto)
+        proto.tag, proto.unit_type = tag + 1, unit_type.value
+        alias_units.append(Unit(proto, bot))
+
+    def same_tech_filter(units, other):
+        tech_alias_types = {u.value for u in other}
+        for unit_type in other:
+            tech_alias_types |= set(unit_data[unit_type.value]._proto.tech_alias)
+        return [
+            unit
+            for unit in units
+            if unit._proto.unit_type in tech_alias_types
+            or any(same in tech_alias_types for same in unit._type_data._proto.tech_alias)
+        ]
+
+    def same_unit_filter(units, other):
+        unit_alias_types = {u.value for u in other} | {unit_data[u.value]._proto.unit_alias for u in other}
+        unit_alias_types.discard(0)
+        return [
+            unit
+            for unit in units
+            if unit._proto.unit_type in unit_alias_types or unit._type_data._proto.unit_alias in unit_alias_types
+        ]
+
+    selections = (
+        {UnitTypeId.SCV},
+        {UnitTypeId.SCV, UnitTypeId.MINERALFIELD, UnitTypeId.COMMANDCENTER},
+        {UnitTypeId.HATCHERY},
+        {UnitTypeId.HIVE, UnitTypeId.GREATERSPIRE},
+        {UnitTypeId.COMMANDCENTER, UnitTypeId.ROACH},
+        {UnitTypeId.ZERGLING},
+    )
+    for units in (bot.all_units, bot.all_units.copy() + alias_units, Units(alias_units, bot)):
+        for selection in selections:
+            expected = [unit for unit in units if unit.type_id in selection]
+            assert units.of_type(selection) == expected
+            assert units.of_type(list(selection)) == expected
+            assert units(selection) == expected
+            assert units.exclude_type(selection) == [unit for unit in units if unit.type_id not in selection]
+            assert units.same_tech(selection) == same_tech_filter(units, selection)
+            assert units.same_unit(selection) == same_unit_filter(units, selection)
+        assert units(UnitTypeId.SCV) == units.of_type(UnitTypeId.SCV) == [u for u in units if u.type_id == UnitTypeId.SCV]
+        assert units() == units
+    # The selections keep the rows of the unit table
+    minerals = bot.all_units(UnitTypeId.MINERALFIELD)
+    assert minerals.table["tag"].tolist() == [unit.tag for unit in minerals]
+    assert bot.all_units.of_type(UnitTypeId.SCV).table["tag"].tolist() == bot.workers.table["tag"].tolist()
+
+    # The index is created again after each change of the list
+    workers = bot.workers.copy()
+    assert not workers(UnitTypeId.LAIR)
+    workers.append(alias_units[0])
+    assert workers(UnitTypeId.LAIR) == [alias_units[0]]
+    assert workers.same_tech({UnitTypeId.HATCHERY}) == [alias_units[0]]
+
+
+def test_units_query():
+    bot: BotAI = random_bot_object
+    position = bot.townhalls[0].position
+    other_position = bot.game_info.map_center
+    townhall = bot.townhalls[0]
+    tags = {unit.tag for unit in bot.all_units if unit.tag % 3}
+    chains = (
+        lambda u: u.ready,
+        lambda u: u.not_ready.owned,
+        lambda u: u.flying,
+        lambda u: u.not_flying.enemy,
+        lambda u: u.structure,
+        lambda u: u.not_structure.idle.gathering,
+        lambda u: u.returning,
+        lambda u: u.collecting.visible,
+        lambda u: u.mineral_field.closer_than(15, position),
+        lambda u: u.vespene_geyser.further_than(15, townhall),
+        lambda u: u.of_type({UnitTypeId.SCV, UnitTypeId.MINERALFIELD}).tags_in(tags),
+        lambda u: u.exclude_type(UnitTypeId.SCV).tags_not_in(list(tags)),
+        lambda u: u.filter(lambda unit: unit.tag % 2).ready.in_distance_between(position, 5, 30),
+        lambda u: u.sorted_by_distance_to(other_position).take(20).filter(lambda unit: unit.is_idle),
+        lambda u: u.filter(lambda unit: unit.tag % 2).sorted_by_distance_to(townhall, reverse=True).take(5),
+        lambda u: u.sorted(lambda unit: unit.type_id.value).not_structure.sorted_by_distance_to(position).take(3),
+        lambda u: u.take(10).ready.sorted(lambda unit: unit.tag, reverse=True),
+    )
+    # Rows of the unit table, and units without table rows
+    for units in (bot.all_units, Units(list(bot.all_units), bot)):
+        for chain in chains:
+            expected = chain(units)
+            query = chain(units.query())
+            result = query.materialize()
+            assert isinstance(result, Units)
+            assert result == expected
+            assert list(query) == expected
+            assert len(query) == query.amount == len(expected)
+            assert bool(query) == query.exists == (not query.empty) == bool(expected)
+            if expected:
+                assert query.first is expected[0]
+    # The result keeps the rows of the unit table
+    result = bot.all_units.query().not_structure.closer_than(20, position).materialize()
+    assert result.table["tag"].tolist() == [unit.tag for unit in result]
+    # Each term creates a new query
+    query = bot.all_units.query()
+    assert query.ready is not query and len(query) == len(bot.all_units)
+
+
+def test_unit_states():
+    bot: BotAI = random_bot_object
+    # Units with orders and buffs that are not in the pickled frames
+    worker_proto = bot.workers[0]._proto
+    protos = []
+    for abilities, buffs in (
+        ([AbilityId.HARVEST_RETURN_SCV], []),
+        ([AbilityId.HARVEST_GATHER_SCV, AbilityId.MOVE_MOVE], []),
+        ([AbilityId.MOVE_MOVE, AbilityId.HARVEST_RETURN_SCV], [BuffId.GRAVITONBEAM]),
+        ([AbilityId.HARVEST_RETURN], []),
+        ([], [BuffId.GRAVITONBEAM]),
+    ):
+        proto = type(worker_proto)()
+        proto.CopyFrom(worker_proto)
+        proto.tag = len(protos) + 1
+        del proto.orders[:]
+        for ability in abilities:
+            proto.orders.add(ability_id=ability.value)
+        proto.buff_ids.extend(buff.value for buff in buffs)
+        protos.append(proto)
+    units = Units([Unit(proto, bot) for proto in protos], bot)
+    unit_table = np.array([unit_table_row(proto, False) for proto in protos], dtype=UNIT_TABLE_DTYPE)
+    assert unit_states(unit_table, bot._order_state).tolist() == [unit_state(unit) for unit in units]
+    assert units.table["state"].tolist() == [unit_state(unit) for unit in units]
+    assert [unit.is_returning for unit in units] == [True, False, False, True, False]
+    assert units.table["state"][-1] & STATE_FLYING and units.table["state"][-1] & STATE_IDLE
+
+    # The states of the frame are calculated when the unit table is created
+    assert bot.unit_table["state"].tolist() == [unit_state(unit) for unit in bot.all_units]
+    for group in (bot.all_units, bot.workers, bot.all_units.copy() + units, Units(list(bot.all_units), bot)):
+        for name, pred in (
+            ("ready", lambda unit: unit.is_ready),
+            ("not_ready", lambda unit: not unit.is_ready),
+            ("idle", lambda unit: unit.is_idle),
+            ("owned", lambda unit: unit.is_mine),
+            ("enemy", lambda unit: unit.is_enemy),
+            ("flying", lambda unit: unit.is_flying),
+            ("not_flying", lambda unit: not unit.is_flying),
+            ("structure", lambda unit: unit.is_structure),
+            ("not_structure", lambda unit: not unit.is_structure),
+            ("gathering", lambda unit: unit.is_gathering),
+            ("returning", lambda unit: unit.is_returning),
+            ("collecting", lambda unit: unit.is_collecting),
+            ("visible", lambda unit: unit.is_visible),
+        ):
+            assert getattr(group, name) == group.filter(pred), name
+            assert getattr(group.query(), name).materialize() == group.filter(pred), name
+
+
+def test_frozen_cache():
+    bot: BotAI = random_bot_object
+    # Frozen caches return the same object each time instead of a copy
+    abilities = bot._abilities_all_units
+    assert abilities is bot._abilities_all_units
+    assert isinstance(abilities, FrozenCounter)
+    assert abilities[AbilityId.NULL_NULL] == 0
+    with pytest.raises(TypeError):
+        abilities[AbilityId.NULL_NULL] += 1
+    with pytest.raises(TypeError):
+        abilities.update([AbilityId.NULL_NULL])
+    # The copy can be changed
+    copied = abilities.copy()
+    copied[AbilityId.NULL_NULL] += 1
+    assert type(copied) == Counter and copied - abilities == Counter({AbilityId.NULL_NULL: 1})
+    assert pickle.loads(pickle.dumps(freeze(Counter({1: 2})))) == Counter({1: 2})
+
+    # The maps of the previous frame are created once per frame
+    for name in (
+        "_units_previous_map",
+        "_structures_previous_map",
+        "_enemy_units_previous_map",
+        "_enemy_structures_previous_map",
+    ):
+        assert getattr(bot, name) is getattr(bot, name)
+        assert isinstance(getattr(bot, name), FrozenDict)
+    assert set(bot._units_previous_map) == {unit.tag for unit in bot._previous_frame_units.category("units")}
+
+    units = freeze(bot.units.copy())
+    for change in (
+        lambda: units.append(units[0]),
+        lambda: units.sort(key=lambda unit: unit.tag),
+        lambda: units.__delitem__(0),
+        lambda: units.__iadd__(units),
+    ):
+        with pytest.raises(TypeError):
+            change()
+    assert units.copy() == units and units.copy().extend(units) is None
+    assert units.filter(lambda unit: True) == units
+
+    array = freeze(np.arange(3))
+    with pytest.raises(ValueError):
+        array[0] = 1
+    assert array.copy().flags.writeable
+    mapping = freeze({1: 2})
+    with pytest.raises(TypeError):
+        mapping[3] = 4
+    assert isinstance(mapping, FrozenDict) and type(mapping.copy()) == dict
+    assert freeze([1, 2]) == (1, 2) and freeze({1}) == frozenset({1})
+
+
+def test_method_cache_once_per_frame():
+    bot: BotAI = random_bot_object
+    unit_types = [UnitTypeId.SCV, UnitTypeId.RAVAGER, UnitTypeId.ORBITALCOMMAND, UnitTypeId.BARRACKS, UnitTypeId.SUPPLYDEPOT]
+    for unit_type in unit_types:
+        assert bot.calculate_cost(unit_type) is bot.calculate_cost(unit_type)
+        for name in (
+            "calculate_cost",
+            "calculate_supply_cost",
+            "already_pending",
+            "structure_type_build_progress",
+            "tech_requirement_progress",
+        ):
+            uncached = getattr(BotAI, name).__wrapped__(bot, unit_type)
+            assert getattr(bot, name)(unit_type) == uncached, name
+    assert bot.already_pending(UpgradeId.STIMPACK) == BotAI.already_pending_upgrade.__wrapped__(bot, UpgradeId.STIMPACK)
+
+    # The methods that depend on the units are calculated again when the units change or a command is issued
+    bot = create_bot(random_bot_object)
+    townhall = bot.townhalls.first
+    assert bot.structure_type_build_progress(townhall.type_id) == 1
+    bot.structures = bot.structures.filter(lambda unit: unit.tag != townhall.tag)
+    assert bot.structure_type_build_progress(townhall.type_id) == 0
+    assert bot.already_pending(UnitTypeId.SCV) == BotAI.already_pending.__wrapped__(bot, UnitTypeId.SCV)
+    cost = bot.calculate_cost(UnitTypeId.SCV)
+    bot.do(townhall.stop())
+    assert "_cache_already_pending" not in bot.__dict__
+    assert bot.calculate_cost(UnitTypeId.SCV) is cost
+
+    class Counting:
+        def __init__(self):
+            self.state = GameState(bot.state.response_observation)
+            self.calls = 0
+
+        @method_cache_once_per_frame
+        def count(self, value, step=1):
+            self.calls += 1
+            return self.calls
+
+    counting = Counting()
+    assert counting.count(1) == counting.count(1) == 1
+    assert counting.count(1, step=2) == counting.count(1, step=2) == 2
+    assert counting.count(2) == 3
+    # Unhashable arguments are not cached
+    assert counting.count([1]) == 4 and counting.count([1]) == 5
+    clear_method_cache(counting, "count")
+    assert counting.count(1) == 6
+    counting.state.game_loop += 1
+    assert counting.count(1) == counting.count(1) == 7
+
+
+def test_cache_stats(monkeypatch):
+    bot: BotAI = random_bot_object
+
+    def value(self):
+        return [1, 2]
+
+    # Without SC2CACHESTATS, nothing is added to the cached properties
+    monkeypatch.setattr(cache, "CACHE_STATS_ENABLED", False)
+    assert property_cache_forever(value).fget.__wrapped__ is value
+    monkeypatch.setattr(cache, "CACHE_STATS_ENABLED", True)
+
+    class Cached:
+        def __init__(self):
+            self.state = GameState(bot.state.response_observation)
+            self.cache = {}
+
+        @property_cache_forever
+        def forever(self):
+            return [1, 2]
+
+        @property_cache_once_per_frame
+        def once_per_frame(self):
+            return [1, 2]
+
+        @property_cache_once_per_frame(frozen=True)
+        def frozen(self):
+            return [1, 2]
+
+        @property_immutable_cache
+        def immutable(self):
+            return 1
+
+        @property_mutable_cache
+        def mutable(self):
+            return [1, 2]
+
+        @method_cache_once_per_frame
+        def method(self, argument):
+            return [argument]
+
+    cached = Cached()
+    for _ in range(3):
+        for name in ("forever", "once_per_frame", "frozen", "immutable", "mutable"):
+            getattr(cached, name)
+        cached.method(1)
+    cached.state.game_loop += 1
+    cached.once_per_frame
+
+    stats = {stats.name.split(".")[-1]: stats for stats in cache.cache_stats() if "test_cache_stats" in stats.name}
+    assert {name: (s.calls, s.hits, s.misses, s.copies) for name, s in stats.items()} == {
+        "forever": (3, 2, 1, 0),
+        "once_per_frame": (4, 2, 2, 4),
+        "frozen": (3, 2, 1, 0),
+        "immutable": (3, 2, 1, 0),
+        "mutable": (3, 2, 1, 3),
+        "method": (3, 2, 1, 0),
+    }
+    assert stats["method"].last_size > 0 and stats["method"].recompute_time > 0
+    assert "Cached.method" in bot.cache_stats()
+    cache.reset_cache_stats()
+    assert "Cached.method" not in bot.cache_stats()
+    # Counted again after the reset
+    cached.method(1)
+    assert [(s.calls, s.misses) for s in cache.cache_stats() if s.name.endswith("Cached.method")] == [(1, 1)]
+
+
+def test_units_positions():
+    bot: BotAI = random_bot_object
+    units = bot.all_units.copy()
+    positions = units.positions
+    assert positions.shape == (len(units), 2)
+    assert positions.tolist() == [list(unit.position_tuple) for unit in units]
+    assert units.positions is positions
+    with pytest.raises(ValueError):
+        positions[0, 0] = 1
+
+    # Each change of the list creates the positions again
+    mineral = bot.mineral_field[0]
+    for change in (
+        lambda: units.append(mineral),
+        lambda: units.extend([mineral]),
+        lambda: units.insert(0, mineral),
+        lambda: units.remove(mineral),
+        lambda: units.pop(),
+        lambda: units.sort(key=lambda unit: unit.tag),
+        lambda: units.reverse(),
+        lambda: units.__setitem__(0, mineral),
+        lambda: units.__delitem__(0),
+    ):
+        _ = units.positions
+        change()
+        assert units.positions.tolist() == [list(unit.position_tuple) for unit in units]
+    units += [mineral]
+    assert units.positions.tolist() == [list(unit.position_tuple) for unit in units]
+
+    # The point based functions give the same results as calculating each distance
+    for point in (bot.game_info.map_center, bot.townhalls[0].position, Point3((30, 40, 10))):
+        distances = [unit.position._distance_squared(point) for unit in units]
+        assert units.closest_to(point) is units[distances.index(min(distances))]
+        assert units.furthest_to(point) is units[distances.index(max(distances))]
+        assert units.closer_than(20, point) == [unit for unit, d in zip(units, distances) if d < 20 ** 2]
+        assert units.sorted_by_distance_to(point) == sorted(units, key=lambda unit: unit.position._distance_squared(point))
+        assert units.sorted_by_distance_to(point, reverse=True) == sorted(
+            units, key=lambda unit: unit.position._distance_squared(point), reverse=True
+        )
+    center = units.center
+    assert center.x == pytest.approx(sum(unit.position.x for unit in units) / len(units))
+    assert center.y == pytest.approx(sum(unit.position.y for unit in units) / len(units))
+
+
+def test_unit_type_record():
+    bot: BotAI = random_bot_object
+    for unit in bot.all_units:
+        # Units of the bot are created from the rows of the unit table
+        unit2 = Unit(unit._proto, bot)
+        assert (unit2.tag, unit2.type_id, unit2.position) == (unit.tag, unit.type_id, unit.position)
+        assert unit2._type_record is unit._type_record
+        assert unit._type_record is bot._game_data.unit_type_records[unit._proto.unit_type]
+        assert unit.is_structure == (IS_STRUCTURE in unit._type_data.attributes)
+
+    scv = bot.workers.first
+    assert scv.can_attack and scv.can_attack_ground and not scv.can_attack_air
+    assert scv.ground_range == scv._weapons[0].range
+    assert scv.air_range == 0 and scv.air_dps == 0
+    assert not bot.townhalls.first.can_attack
+    assert bot.townhalls.first.bonus_damage is None
+
+    # Passenger protos have no position
+    bunker_proto = raw_pb.Unit()
+    bunker_proto.CopyFrom(bot.townhalls.first._proto)
+    bunker_proto.unit_type = UnitTypeId.BUNKER.value
+    bunker_proto.passengers.add(tag=scv.tag, unit_type=UnitTypeId.SCV.value, health=45, health_max=45)
+    bunker_proto.cargo_space_taken = 1
+    bunker = Unit(bunker_proto, bot)
+    assert bunker.passengers_tags == {scv.tag}
+    passenger = bunker.passengers.pop()
+    assert (passenger.tag, passenger.type_id, passenger.health) == (scv.tag, UnitTypeId.SCV, 45)
+    assert passenger._type_record is scv._type_record
+
+    # Bots can still assign their own attributes to units
+    scv.role = "builder"
+    assert scv.role == "builder"
+
+
+def test_unit_registry():
+    bot: BotAI = random_bot_object
+    table = bot.unit_table.copy()
+    own_tags = set(table["tag"][table["alliance"] == 1].tolist())
+    registry = UnitRegistry()
+
+    # In the first frame, all own units are added
+    registry.update(table)
+    assert registry.added == own_tags
+    assert not registry.removed and not registry.damaged and not registry.completed and not registry.left_vision
+    assert set(table["tag"][registry.added_rows].tolist()) == own_tags
+
+    # Nothing changed
+    registry.update(table)
+    assert not registry.added and not registry.removed and not registry.damaged and not registry.completed
+
+    # A worker took damage, another worker died and a structure finished
+    next_table = table.copy()
+    worker1, worker2 = [bot._unit_index_dict[worker.tag] for worker in bot.workers[:2]]
+    townhall = bot._unit_index_dict[bot.townhalls.first.tag]
+    next_table[worker1]["health"] -= 5
+    table[townhall]["build_progress"] = 0.5
+    registry.update(table)
+    next_table = np.delete(next_table, worker2)
+    registry.update(next_table)
+    worker1 -= worker2 < worker1
+    townhall -= worker2 < townhall
+    assert registry.damaged == {next_table[worker1]["tag"]}
+    assert registry.removed == {table[worker2]["tag"]}
+    assert registry.completed == {next_table[townhall]["tag"]}
+    assert not registry.added
+
+    # An enemy unit entered and left vision
+    enemy = next_table[worker1].copy()
+    enemy["tag"], enemy["alliance"] = 1, 4
+    registry.update(np.append(next_table, enemy))
+    assert registry.entered_vision == {1}
+    assert not registry.added
+    registry.update(next_table)
+    assert registry.left_vision == {1}
+    assert not registry.removed
+
+    # Events of the first frame of the bot
+    bot = next(bot_object_generator)
+    created_units = []
+
+    async def on_unit_created(unit: Unit):
+        created_units.append(unit)
+
+    bot.on_unit_created = on_unit_created
+    asyncio.run(bot.issue_events())
+    assert created_units == list(bot.units)
+
+
+def test_game_state_lazy_attributes():
+    source_bot: BotAI = random_bot_object
+    # Add an effect and a unit that is converted to an effect, so that the effects can be compared
+    observation = sc_pb.ResponseObservation()
+    observation.CopyFrom(source_bot.state.response_observation)
+    raw_data = observation.observation.raw_data
+    center = source_bot.game_info.map_center
+    effect = raw_data.effects.add(effect_id=EffectId.PSISTORMPERSISTENT.value, alliance=4, owner=2, radius=1.5)
+    effect.pos.add(x=center.x, y=center.y)
+    forcefield = raw_data.units.add()
+    forcefield.CopyFrom(raw_data.units[0])
+    forcefield.tag = max(unit.tag for unit in raw_data.units) + 1
+    forcefield.unit_type = UnitTypeId.FORCEFIELD.value
+    forcefield.pos.x, forcefield.pos.y = center.x + 3, center.y
+
+    bot = create_bot(source_bot, observation)
+
+    state = GameState(observation)
+    # Nothing is converted until it is accessed
+    assert not state.cache
+    assert state.visibility.data_numpy.tolist() == bot.state.visibility.data_numpy.tolist()
+    assert set(state.cache) == {"visibility"}
+    assert state.upgrades is state.upgrades
+
+    # Without BotAI._prepare_units the units that are converted to effects are searched in the raw units
+    def effect_fields(effects):
+        return sorted(
+            (str(effect.id), sorted(effect.positions), effect.alliance, effect.owner, effect.radius)
+            for effect in effects
+        )
+
+    assert len(bot.state.effects) == 2
+    assert effect_fields(state.effects) == effect_fields(bot.state.effects)
+
+
+def test_pixel_map_bits():
+    bot: BotAI = random_bot_object
+    proto = bot._game_info._proto.start_raw.pathing_grid
+    expected = np.unpackbits(np.frombuffer(proto.data, dtype=np.uint8)).reshape(proto.size.y, proto.size.x)
+
+    pathing_grid = PixelMap(proto, in_bits=True)
+    assert pathing_grid.data_numpy.tolist() == expected.tolist()
+    assert pathing_grid.count_set() == int(expected.sum())
+    assert pathing_grid.packed.tolist() == np.packbits(expected).tolist()
+    assert pathing_grid.mask.tolist() == (expected != 0).tolist()
+
+    # Copies have their own data and keep changes
+    pathing_grid[Point2((0, 0))] = 1
+    copy = pathing_grid.copy()
+    assert copy[Point2((0, 0))] == 1
+    copy[Point2((0, 0))] = 0
+    assert pathing_grid[Point2((0, 0))] == 1
+
+
+def test_visibility_and_creep_batch():
+    bot: BotAI = random_bot_object
+    points = [Point2((x + 0.5, y + 0.7)) for x in range(0, bot.game_info.map_size[0], 7) for y in range(0, 60, 3)]
+    assert bot.is_visible_batch(points).tolist() == [bot.is_visible(point) for point in points]
+    assert bot.has_creep_batch(points).tolist() == [bot.has_creep(point) for point in points]
+    assert bot.is_visible_batch(np.array(points)).tolist() == [bot.is_visible(point) for point in points]
+    assert bot.is_visible_batch(bot.units).tolist() == [bot.is_visible(unit) for unit in bot.units]
+    # Units that are not rows of the current frame use their cached positions, no unit table is created for them
+    workers = bot.workers.filter(lambda unit: True)
+    assert bot.has_creep_batch(workers).tolist() == [bot.has_creep(unit) for unit in workers]
+    assert workers._positions is not None and workers._table_indices is None
+    assert bot.has_creep_batch([]).shape == (0,)
+
+    # Enemy units in the fog of war are snapshots
+    for unit in bot.enemy_units:
+        assert unit.is_calculated_snapshot == (not bot.is_visible(unit))
+
+
 def test_game_data():
     bot: BotAI = random_bot_object
     game_data = bot._game_data
     assert game_data.abilities
     assert game_data.units
     assert game_data.upgrades
-    assert len(game_data.unit_types) == 2  # Filled with CC and SCV from previous tests
+    # Filled with the unit types of the units of the frame
+    assert game_data.unit_types
+    assert all(game_data.unit_types[unit._proto.unit_type] == unit.type_id for unit in bot.all_units)
 
 
 def test_game_state():
@@ -916,3 +1894,37 @@ def test_position_rect(x, y, w, h):
     assert rect.size == Size((w, h))
     assert rect.center == Point2((rect.x + rect.width / 2, rect.y + rect.height / 2))
     assert rect.offset((1, 1)) == Rect((x + 1, y + 1, w, h))
+
+
+def test_engagement_matrix():
+    bot: BotAI = random_bot_object
+    # Units that can attack next to units that cannot, ground and flying units
+    groups = (
+        (bot.all_units.filter(lambda unit: unit.tag % 3), bot.all_units.filter(lambda unit: unit.tag % 3 != 1)),
+        # Rows of the unit table
+        (bot.all_units, bot.all_units),
+    )
+    for (units, other_units), bonus_distance in itertools.product(groups, (0, 3)):
+        engagement = units.engagement_with(other_units, bonus_distance=bonus_distance)
+        assert engagement.in_range.shape == engagement.threatened.shape == (len(units), len(other_units))
+        for unit, targets, attackers in zip(
+            units, engagement.targets_in_range_of_each(), engagement.threatened_by_each()
+        ):
+            assert targets == [
+                target for target in other_units if unit.target_in_range(target, bonus_distance=bonus_distance)
+            ]
+            assert attackers == [
+                attacker for attacker in other_units if attacker.target_in_range(unit, bonus_distance=bonus_distance)
+            ]
+            assert engagement.targets_in_range(unit) == targets
+            assert engagement.threatened_by(unit) == attackers
+        assert engagement.units_with_targets() == [unit for unit, row in zip(units, engagement.in_range) if row.any()]
+        assert engagement.threatened_units() == [unit for unit, row in zip(units, engagement.threatened) if row.any()]
+        assert engagement.attacked_units() == [
+            target for target in other_units if any(unit.target_in_range(target, bonus_distance) for unit in units)
+        ]
+        assert engagement.in_range.any() and engagement.threatened.any()
+    assert not Units([], bot).engagement_with(bot.workers).in_range.size
+    assert not Units([], bot).engagement_with(bot.workers).targets_in_range_of_each()
+    assert bot.engagement is bot.engagement
+    assert bot.engagement.units == bot.units + bot.structures
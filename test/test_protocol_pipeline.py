@@ -0,0 +1,136 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import lzma
+import pickle
+import pytest
+
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+from sc2.bot_ai import BotAI
+from sc2.client import Client
+from sc2.data import Result
+from sc2.main import _play_game_ai
+from sc2.protocol import ProtocolError
+
+
+class RecordingWebSocket:
+    """ Answers each request with a response of the same type, and records when requests were sent """
+
+    def __init__(self):
+        self.events = []
+        self.unanswered = []
+
+    async def send_bytes(self, data: bytes):
+        request = sc_pb.Request()
+        request.ParseFromString(data)
+        request_type = request.WhichOneof("request")
+        self.events.append(("send", request_type))
+        self.unanswered.append(request_type)
+
+    async def receive_bytes(self) -> bytes:
+        request_type = self.unanswered.pop(0)
+        self.events.append(("receive", request_type))
+        response = sc_pb.Response(status=sc_pb.in_game)
+        if request_type == "observation":
+            response.observation.observation.game_loop = 8
+            response.observation.observation.raw_data.units.add(tag=1, unit_type=45, alliance=1)
+        elif request_type == "debug":
+            response.error.append("Debug error")
+        else:
+            getattr(response, request_type).SetInParent()
+        return response.SerializeToString()
+
+
+def test_pipelined_step():
+    ws = RecordingWebSocket()
+    client = Client(ws)
+
+    async def step():
+        client._start_pipeline()
+        # Collected, not sent yet
+        assert await client._execute(action=sc_pb.RequestAction()) is None
+        assert not ws.events
+        return await client._step_and_observation(game_info=True)
+
+    observation, game_info = asyncio.run(step())
+    assert observation.observation.observation.game_loop == 8
+    assert game_info.HasField("game_info")
+    # All requests are sent before the first response is received
+    request_types = ["action", "step", "observation", "game_info"]
+    assert ws.events == [("send", t) for t in request_types] + [("receive", t) for t in request_types]
+    assert client._pipeline is None
+
+
+def test_pipeline_error_after_all_responses():
+    ws = RecordingWebSocket()
+    client = Client(ws)
+
+    async def step():
+        client._start_pipeline()
+        await client._execute(debug=sc_pb.RequestDebug())
+        return await client._step_and_observation()
+
+    with pytest.raises(ProtocolError):
+        asyncio.run(step())
+    # The responses of the following requests were received, so the next request gets its own response
+    assert not ws.unanswered
+
+
+class GameOverWebSocket(RecordingWebSocket):
+    """ Answers with the pickled responses of a map. The game ends during the first step:
+    the action request is answered with a game over error and the next observation contains the result. """
+
+    def __init__(self):
+        super().__init__()
+        folder = os.path.join(os.path.dirname(__file__), "pickle_data")
+        map_file = sorted(f for f in os.listdir(folder) if f.endswith(".xz"))[0]
+        with lzma.open(os.path.join(folder, map_file), "rb") as f:
+            self.raw_game_data, self.raw_game_info, self.raw_observation = pickle.load(f)
+        self.observation_count = 0
+
+    async def receive_bytes(self) -> bytes:
+        request_type = self.unanswered.pop(0)
+        self.events.append(("receive", request_type))
+        response = sc_pb.Response(status=sc_pb.in_game)
+        if request_type == "data":
+            response.data.CopyFrom(self.raw_game_data.data)
+        elif request_type == "game_info":
+            response.game_info.CopyFrom(self.raw_game_info.game_info)
+        elif request_type == "observation":
+            response.observation.CopyFrom(self.raw_observation)
+            self.observation_count += 1
+            if self.observation_count > 1:
+                response.status = sc_pb.ended
+                response.observation.player_result.add(player_id=1, result=sc_pb.Victory)
+        elif request_type == "action":
+            response.status = sc_pb.ended
+            response.error.append("Game has already ended")
+        else:
+            getattr(response, request_type).SetInParent()
+        return response.SerializeToString()
+
+
+def test_pipelined_game_over_error():
+    class StopWorkerBot(BotAI):
+        def __init__(self):
+            self.pipeline_requests = True
+            self.results = []
+
+        async def on_step(self, iteration: int):
+            self.do(self.workers.first.stop())
+
+        async def on_end(self, game_result: Result):
+            self.results.append(game_result)
+
+    ws = GameOverWebSocket()
+    bot = StopWorkerBot()
+    result = asyncio.run(
+        _play_game_ai(Client(ws), 1, bot, realtime=False, step_time_limit=None, game_time_limit=None)
+    )
+    # The game over error of the pipelined action request is handled like the error of a request that is sent on its own
+    assert ("send", "action") in ws.events
+    assert result == Result.Victory
+    assert bot.results == [Result.Victory]